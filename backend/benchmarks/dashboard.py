@@ -0,0 +1,171 @@
+"""/dashboard vs the pages' current pattern of one request per section.
+
+Seeds a SQLite copy of the schema, then loads the player pages both ways
+in-process over ASGI: six sequential requests (/users/me, /player-stats,
+/most_played_agent, /pro_lookalike, /most_played_map, /matches), each
+authenticating on its own, against one /dashboard request. Every statement
+sleeps --rtt-ms on its connection's thread to stand in for the round trip
+to MySQL; the statement count per page load is reported too.
+
+rye run python benchmarks/dashboard.py --players 500 --pages 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DIRECTORY = Path(tempfile.mkdtemp())
+PATH = DIRECTORY / "bench.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HENRIK_API_KEY", "bench")
+os.environ["HENRIK_CACHE_DIR"] = str(DIRECTORY / "henrik_cache")
+os.environ["JOB_QUEUE_PATH"] = str(DIRECTORY / "jobs.db")
+os.chdir(Path(__file__).parents[1])  # for model.pkl
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import aggregates  # noqa: E402
+import httpx  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from database import engine  # noqa: E402
+from main import app  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+SCHEMA = Path(__file__).parents[1] / "tests" / "schema.sql"
+SEPARATE = [
+    "/users/me",
+    "/player-stats",
+    "/most_played_agent",
+    "/pro_lookalike",
+    "/most_played_map",
+    "/matches",
+]
+
+
+def seed(players: int, games_per_player: int):
+    with sqlite3.connect(PATH) as connection:
+        connection.executescript(SCHEMA.read_text())
+        connection.executemany(
+            "insert into Maps values (?, ?)",
+            enumerate(["Ascent", "Bind", "Haven", "Split", "Lotus"], 1),
+        )
+        connection.executemany(
+            "insert into Agents values (?, ?)",
+            enumerate(["Jett", "Sova", "Omen", "Killjoy", "Raze"], 1),
+        )
+        connection.executemany(
+            "insert into User (username, player_id, password_hash) values (?, ?, 'x')",
+            ((f"user{p}", f"player{p}#na1") for p in range(players)),
+        )
+        games = players * games_per_player // 10
+        connection.executemany(
+            "insert into Game (game_id, map_id, date_info, played_at) values (?, ?, ?, ?)",
+            (
+                (game_id, random.randint(1, 5), "2024-07-01", "2024-07-01 12:00:00")
+                for game_id in range(games)
+            ),
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, average_combat_score, kills, deaths, assists, headshot_ratio, first_kills) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    random.randrange(games),
+                    f"player{p}#na1",
+                    random.randint(1, 5),
+                    random.choice([12, 21]),
+                    random.uniform(100, 350),
+                    random.randint(1, 30),
+                    random.randint(5, 25),
+                    random.randint(0, 12),
+                    random.uniform(0.1, 0.4),
+                    random.randint(0, 5),
+                )
+                for p in range(players)
+                for _ in range(games_per_player)
+            ),
+        )
+
+
+def add_rtt(rtt_ms: float):
+    statements = [0]
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, _):
+        # runs on the connection's own thread, like waiting on the network
+        dbapi_connection.driver_connection._conn.set_trace_callback(
+            lambda _: time.sleep(rtt_ms / 1000)
+        )
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+
+    return statements
+
+
+async def run(players: int, pages: int, statements):
+    transport = httpx.ASGITransport(app=app)
+    tokens = [create_access_token({"sub": f"user{p}"}) for p in range(players)]
+    results = {}
+    async with app.router.lifespan_context(app):
+        await app.state.pro_index.ready()
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+
+            async def get(url, token):
+                response = await client.get(
+                    url, headers={"Authorization": f"Bearer {token}"}
+                )
+                response.raise_for_status()
+
+            async def separate(token):
+                for url in SEPARATE:
+                    await get(url, token)
+
+            async def dashboard(token):
+                await get("/dashboard", token)
+
+            for name, load in (("separate", separate), ("dashboard", dashboard)):
+                await load(tokens[0])  # warm up
+                before = statements[0]
+                start = time.perf_counter()
+                for _ in range(pages):
+                    await load(random.choice(tokens))
+                elapsed = (time.perf_counter() - start) / pages
+                results[name] = (elapsed, (statements[0] - before) / pages)
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--games-per-player", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    seed(args.players, args.games_per_player)
+
+    async def rebuild():
+        async with engine.begin() as connection:
+            await aggregates.rebuild(connection)
+
+    asyncio.run(rebuild())
+    statements = add_rtt(args.rtt_ms)
+    results = asyncio.run(run(args.players, args.pages, statements))
+
+    print(f"{'pattern':<12}{'ms/page':>10}{'statements/page':>18}")
+    for name, (elapsed, count) in results.items():
+        print(f"{name:<12}{elapsed * 1000:>10.1f}{count:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Concurrent /token logins: bcrypt on the event loop vs on PasswordPool's threads.
+
+Seeds a SQLite copy of the schema with users, then runs --clients
+concurrent login loops in-process over ASGI for --seconds while a probe
+requests / every 10 ms. "inline" verifies passwords on the event loop (what
+authenticate_user used to do); "pool" is the current PasswordPool. Reports
+login throughput and latency, and how long the probe waited.
+
+rye run python benchmarks/login.py --clients 32 --seconds 5
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DIRECTORY = Path(tempfile.mkdtemp())
+PATH = DIRECTORY / "bench.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HENRIK_API_KEY", "bench")
+os.environ["HENRIK_CACHE_DIR"] = str(DIRECTORY / "henrik_cache")
+os.environ["JOB_QUEUE_PATH"] = str(DIRECTORY / "jobs.db")
+os.chdir(Path(__file__).parents[1])  # for model.pkl
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import auth  # noqa: E402
+import httpx  # noqa: E402
+from database import engine  # noqa: E402
+from main import app  # noqa: E402
+
+SCHEMA = Path(__file__).parents[1] / "tests" / "schema.sql"
+PASSWORD = "correct horse battery staple"
+
+
+def seed(users: int):
+    password_hash = auth.get_password_hash(PASSWORD)
+    with sqlite3.connect(PATH) as connection:
+        connection.executescript(SCHEMA.read_text())
+        connection.executemany(
+            "insert into User (username, player_id, password_hash) values (?, ?, ?)",
+            ((f"user{u}", f"user{u}#na1", password_hash) for u in range(users)),
+        )
+
+
+async def inline(self, fn, *args):
+    return fn(*args)
+
+
+async def run(clients: int, seconds: float, users: int):
+    transport = httpx.ASGITransport(app=app)
+    logins: list[float] = []
+    probes: list[float] = []
+    rejected = 0
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            deadline = time.perf_counter() + seconds
+
+            async def login_loop(i: int):
+                nonlocal rejected
+                n = 0
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/token",
+                        data={
+                            "username": f"user{(i + n) % users}",
+                            "password": PASSWORD,
+                        },
+                    )
+                    n += clients
+                    if response.status_code == 503:
+                        rejected += 1
+                        await asyncio.sleep(0.01)
+                        continue
+                    response.raise_for_status()
+                    logins.append(time.perf_counter() - start)
+
+            async def probe():
+                # latency from when each probe was due, so a blocked loop counts
+                due = time.perf_counter()
+                while due < deadline:
+                    await asyncio.sleep(max(0, due - time.perf_counter()))
+                    (await client.get("/")).raise_for_status()
+                    probes.append(time.perf_counter() - due)
+                    due = max(due + 0.01, time.perf_counter())
+
+            await asyncio.gather(probe(), *(login_loop(i) for i in range(clients)))
+    await engine.dispose()
+    return logins, probes, rejected
+
+
+def ms(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    seed(args.users)
+    print(
+        f"{'bcrypt':<8}{'logins/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'503s':>6}{'probe p99 ms':>14}"
+    )
+    pool_run = auth.PasswordPool.run
+    for name, run_password in (("inline", inline), ("pool", pool_run)):
+        auth.PasswordPool.run = run_password
+        logins, probes, rejected = asyncio.run(
+            run(args.clients, args.seconds, args.users)
+        )
+        print(
+            f"{name:<8}{len(logins) / args.seconds:>10.1f}{ms(logins, 50):>9.1f}"
+            f"{ms(logins, 99):>9.1f}{rejected:>6}{ms(probes, 99):>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""/player-monthly-stats: per-call GROUP BY over date_info vs the Player_Monthly rollup.
+
+Seeds a SQLite copy of the schema with a multi-year synthetic history, then
+times the old query (parsing date_info on every joined row, in SQLite's
+spelling) against reading the rollup rows.
+
+rye run python benchmarks/monthly_stats.py --players 2000 --years 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PATH = Path(tempfile.mkdtemp()) / "bench.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PATH}"
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import aggregates  # noqa: E402
+from database import engine  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+SCHEMA = Path(__file__).parents[1] / "tests" / "schema.sql"
+
+OLD_QUERY = text(
+    """
+    SELECT strftime('%Y-%m-01', g.date_info) AS month,
+        AVG(ps.kills), AVG(ps.deaths), AVG(ps.assists), AVG(ps.average_combat_score),
+        AVG(ps.headshot_ratio), AVG(ps.first_kills)
+    FROM Player_Stats ps JOIN Game g ON ps.game_id = g.game_id
+    WHERE ps.player_id = :player_id
+    GROUP BY month ORDER BY month
+    """
+)
+NEW_QUERY = text(
+    "SELECT * FROM Player_Monthly WHERE player_id = :player_id ORDER BY month"
+)
+
+
+def seed(players: int, years: int, games_per_day: int):
+    start = datetime(2024, 1, 1) - timedelta(days=365 * years)
+    days = 365 * years
+    with sqlite3.connect(PATH) as connection:
+        connection.executescript(SCHEMA.read_text())
+        connection.execute("create index idx_ps_player on Player_Stats (player_id)")
+        game_id = 0
+        games, stats = [], []
+        for day in range(days):
+            for _ in range(games_per_day):
+                game_id += 1
+                at = start + timedelta(days=day, seconds=random.randrange(86400))
+                at = at.strftime("%Y-%m-%d %H:%M:%S")
+                games.append((game_id, random.randint(1, 10), at, at))
+                for player in random.sample(range(players), 10):
+                    stats.append(
+                        (
+                            game_id,
+                            f"player{player}",
+                            random.randint(1, 20),
+                            random.randint(5, 30),
+                            random.randint(5, 25),
+                            random.randint(0, 12),
+                            random.uniform(100, 350),
+                            random.uniform(0.1, 0.4),
+                            random.randint(0, 5),
+                        )
+                    )
+        connection.executemany(
+            "insert into Game (game_id, map_id, date_info, played_at) values (?, ?, ?, ?)",
+            games,
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, kills, deaths, assists, average_combat_score, headshot_ratio, first_kills) values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            stats,
+        )
+    return len(games), len(stats)
+
+
+async def time_query(query, player_ids):
+    async with engine.connect() as connection:
+        start = time.perf_counter()
+        for player_id in player_ids:
+            (await connection.execute(query, {"player_id": player_id})).all()
+    return (time.perf_counter() - start) / len(player_ids)
+
+
+async def run(players: int, queries: int):
+    start = time.perf_counter()
+    async with engine.begin() as connection:
+        await aggregates.rebuild(connection)
+    rebuild = time.perf_counter() - start
+
+    player_ids = [f"player{random.randrange(players)}" for _ in range(queries)]
+    old = await time_query(OLD_QUERY, player_ids)
+    new = await time_query(NEW_QUERY, player_ids)
+    await engine.dispose()
+
+    print(f"rollup rebuild (once):  {rebuild * 1000:9.1f} ms")
+    print(f"GROUP BY over history:  {old * 1000:9.2f} ms/request")
+    print(f"Player_Monthly rows:    {new * 1000:9.2f} ms/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--games-per-day", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    games, rows = seed(args.players, args.years, args.games_per_day)
+    print(f"{games} games, {rows} Player_Stats rows, {rows // args.players} per player")
+    asyncio.run(run(args.players, args.queries))
+
+
+if __name__ == "__main__":
+    main()
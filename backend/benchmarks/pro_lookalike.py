@@ -0,0 +1,122 @@
+"""/pro_lookalike: per-request KD-tree build vs the prebuilt ProIndex.
+
+rye run python benchmarks/pro_lookalike.py --pros 300 --users 500
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import scipy as sp  # noqa: E402
+from lookalike import ProIndex, match_pros  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+AGENTS = 20
+
+
+def seed(path: Path, pros: int, users: int, games: int):
+    def rows(players, tier):
+        for i in range(players):
+            agent = random.randrange(AGENTS)
+            for g in range(games):
+                yield (
+                    g,
+                    f"{'pro' if tier == 21 else 'user'}{i}",
+                    agent if random.random() < 0.7 else random.randrange(AGENTS),
+                    tier,
+                    random.uniform(120, 320),
+                    random.randint(8, 22),
+                    random.randint(0, 12),
+                    random.uniform(0.5, 0.9),
+                    random.uniform(80, 200),
+                    random.uniform(0.1, 0.4),
+                    random.randint(0, 6),
+                    random.randint(0, 6),
+                )
+
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "create table Player_Stats (game_id integer, player_id varchar(50), agent_id integer, tier_id integer, average_combat_score real, deaths integer, assists integer, kill_assist_trade_survive_ratio real, average_damage_per_round real, headshot_ratio real, first_kills integer, first_deaths integer)"
+        )
+        for index in ("player_id", "agent_id", "tier_id"):
+            connection.execute(f"create index idx_{index} on Player_Stats ({index})")
+        insert = "insert into Player_Stats values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        connection.executemany(insert, rows(pros * AGENTS, 21))
+        connection.executemany(insert, rows(users, 12))
+
+
+async def per_request(db, player_id):
+    """The pre-index handler: three queries and a fresh KD-tree per call."""
+    query = text(
+        "select agent_id as agent from Player_Stats where player_id=:player_id group by agent_id order by count(agent_id) desc limit 1"
+    ).bindparams(player_id=player_id)
+    async with db.connect() as connection:
+        result = await connection.execute(query)
+    agent = result.fetchone().agent
+    pro_query = text(
+        "SELECT player_id, avg(average_combat_score), avg(deaths),avg(assists) ,avg(kill_assist_trade_survive_ratio),avg(average_damage_per_round),avg(headshot_ratio),avg(first_kills),avg(first_deaths) FROM Player_Stats where agent_id=:agent and tier_id = 21 group by player_id  order by count(agent_id) desc limit 100"
+    ).bindparams(agent=agent)
+    async with db.connect() as connection:
+        pros = list(await connection.execute(pro_query))
+    pro_tree = sp.spatial.KDTree([x[1:] for x in pros])
+    query = text(
+        "SELECT avg(average_combat_score), avg(deaths),avg(assists) ,avg(kill_assist_trade_survive_ratio),avg(average_damage_per_round),avg(headshot_ratio),avg(first_kills),avg(first_deaths) FROM Player_Stats where player_id=:player_id group by player_id"
+    ).bindparams(player_id=player_id)
+    async with db.connect() as connection:
+        user_stats = list(await connection.execute(query))
+    _, best_match = pro_tree.query(user_stats, k=1)
+    return pros[best_match[0]][0]
+
+
+async def run(path: Path, users: int):
+    db = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    player_ids = [f"user{i}" for i in range(users)]
+
+    start = time.perf_counter()
+    for player_id in player_ids:
+        await per_request(db, player_id)
+    before = (time.perf_counter() - start) / users
+
+    index = ProIndex(db)
+    start = time.perf_counter()
+    await index.build()
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for player_id in player_ids:
+        await match_pros(index, [player_id])
+    after = (time.perf_counter() - start) / users
+
+    start = time.perf_counter()
+    await match_pros(index, player_ids)
+    batch = (time.perf_counter() - start) / users
+
+    await db.dispose()
+    print(f"index build (once):          {build * 1000:8.1f} ms")
+    print(f"per-request tree build:      {before * 1000:8.2f} ms/user")
+    print(f"prebuilt index, one request: {after * 1000:8.2f} ms/user")
+    print(f"prebuilt index, batch:       {batch * 1000:8.3f} ms/user")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pros", type=int, default=300, help="pros per agent")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--games", type=int, default=20)
+    args = parser.parse_args()
+
+    path = Path(tempfile.mkdtemp()) / "bench.db"
+    seed(path, args.pros, args.users, args.games)
+    asyncio.run(run(path, args.users))
+
+
+if __name__ == "__main__":
+    main()
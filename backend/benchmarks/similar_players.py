@@ -0,0 +1,67 @@
+"""/similar_players: query latency of SimilarityIndex over a synthetic population.
+
+The index is filled directly with random player vectors, so this measures
+the search alone (tree walk vs brute force over the filtered rows), not the
+SQL aggregation behind build().
+
+rye run python benchmarks/similar_players.py --players 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import numpy as np  # noqa: E402
+from lookalike import FEATURES, SimilarityIndex  # noqa: E402
+from scipy.spatial import KDTree  # noqa: E402
+
+AGENTS = 25
+TIERS = 27
+
+
+def fill(index: SimilarityIndex, players: int, rng):
+    index.features = rng.standard_normal((players, len(FEATURES)), np.float32)
+    index.agents = rng.integers(1, AGENTS + 1, players, dtype=np.int32)
+    index.tiers = rng.integers(0, TIERS, players, dtype=np.int32)
+    index.games = rng.geometric(0.05, players).astype(np.int32)
+    index.player_ids = [f"player{i}" for i in range(players)]
+    index.positions = {player_id: i for i, player_id in enumerate(index.player_ids)}
+    start = time.perf_counter()
+    index.tree = KDTree(index.features)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = SimilarityIndex(None)
+    build = fill(index, args.players, rng)
+    print(f"players: {args.players}, matrix: {index.features.nbytes / 2**20:.1f} MiB")
+    print(f"KD-tree build: {build * 1000:8.1f} ms")
+
+    cases = {
+        "no filter": {},
+        "min_games=20": {"min_games": 20},
+        "agent": {"agent_id": 3},
+        "agent + tier": {"agent_id": 3, "tier": 20},
+        "page 5": {"page": 5},
+    }
+    targets = rng.choice(index.player_ids, args.queries)
+    for name, filters in cases.items():
+        start = time.perf_counter()
+        for player_id in targets:
+            index.neighbours(player_id, k=args.k, **filters)
+        per_query = (time.perf_counter() - start) / args.queries
+        print(f"{name:<14} {per_query * 1000:8.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cold start of the API: the pickled pipeline vs the compiled model.json.
+
+Each run is a fresh interpreter that imports main and loads the model the
+way lifespan does. "pickle" is the old path: main imported pandas and scipy
+at module load and unpickled model.pkl, which pulls in sklearn. "artifact"
+is the current one: WinModel.load("model.json"), with scipy left until the
+lookalike indexes first build. Reports import and model load time, peak
+RSS, and which of the heavy modules ended up loaded.
+
+rye run python benchmarks/startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).parents[1]
+HEAVY = ["pandas", "scipy", "sklearn"]
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{preload}
+import main
+imported = time.perf_counter()
+{load}
+loaded = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "load": loaded - imported,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+PATHS = {
+    "pickle": (
+        "import pandas, scipy.spatial",
+        "from scoring import WinModel, load_pipeline\n"
+        "WinModel.from_pipeline(load_pipeline('model.pkl'))",
+    ),
+    "artifact": ("", "from scoring import WinModel\nWinModel.load('model.json')"),
+}
+
+
+def probe(preload: str, load: str):
+    directory = Path(tempfile.mkdtemp())
+    env = os.environ | {
+        "DATABASE_URL": f"sqlite+aiosqlite:///{directory / 'bench.db'}",
+        "SECRET_KEY": "bench",
+        "HENRIK_API_KEY": "bench",
+        "HENRIK_CACHE_DIR": str(directory / "henrik_cache"),
+        "JOB_QUEUE_PATH": str(directory / "jobs.db"),
+        "PYTHONPATH": str(BACKEND / "src"),
+    }
+    code = PROBE.format(preload=preload, load=load, heavy=HEAVY)
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'path':<10}{'import ms':>10}{'load ms':>9}{'RSS MB':>8}  heavy modules")
+    for name, (preload, load) in PATHS.items():
+        probe(preload, load)  # warm the filesystem cache
+        runs = [probe(preload, load) for _ in range(args.runs)]
+        median = {
+            key: statistics.median(run[key] for run in runs)
+            for key in ("import", "load", "rss")
+        }
+        print(
+            f"{name:<10}{median['import'] * 1000:>10.0f}{median['load'] * 1000:>9.1f}"
+            f"{median['rss']:>8.0f}  {', '.join(runs[0]['heavy']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Win-probability scoring: the old /model_matches path vs WinModel.
+
+"pipeline" is what /model_matches did per request: a dict per row with the
+ratios turned into strings, a DataFrame, and the pickled pipeline's
+predict_proba. "vectorized" is WinModel.predict on numeric columns, with
+per-feature contributions. Both score random stat lines in batches of
+--batch rows; reported in rows/s.
+
+rye run python benchmarks/win_scoring.py --rows 20000
+"""
+
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+os.chdir(Path(__file__).parents[1])  # for model.pkl
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from scoring import WinModel, feature_columns  # noqa: E402
+
+AGENTS = ["Jett", "Sova", "Omen", "Killjoy", "Raze", "Sage", "Reyna"]
+
+
+def replace_percentage(df, column):
+    # the pickle refers to __main__.replace_percentage, as in main.py
+    df[column] = df[column].str.replace("%", "").astype(float)
+    return df
+
+
+def stat_lines(n: int):
+    return [
+        {
+            "agent": random.choice(AGENTS),
+            "side": random.choice(["t", "ct"]),
+            "tier": random.randint(3, 27),
+            "kills": random.randint(0, 30),
+            "deaths": random.randint(0, 25),
+            "assists": random.randint(0, 12),
+            "average_damage_per_round": random.uniform(50, 220),
+            "first_kills": random.randint(0, 6),
+            "first_deaths": random.randint(0, 6),
+            "kill_assist_trade_survive_ratio": random.uniform(30, 100),
+            "headshot_ratio": random.uniform(5, 45),
+        }
+        for _ in range(n)
+    ]
+
+
+def pipeline_scores(pipeline, lines):
+    matches = [
+        {
+            "side": line["side"],
+            "kill_assist_trade_survive_ratio": str(
+                line["kill_assist_trade_survive_ratio"]
+            ),
+            "tier": line["tier"],
+            "kills_deaths": line["kills"] - line["deaths"],
+            "agent": line["agent"],
+            "average_damage_per_round": line["average_damage_per_round"],
+            "kills": line["kills"],
+            "deaths": line["deaths"],
+            "assists": line["assists"],
+            "headshot_ratio": str(line["headshot_ratio"]),
+            "first_kills": line["first_kills"],
+            "first_deaths": line["first_deaths"],
+        }
+        for line in lines
+    ]
+    return [p[1] for p in pipeline.predict_proba(pd.DataFrame(matches))]
+
+
+def vectorized_scores(model, lines):
+    probabilities, contributions = model.predict(feature_columns(lines, model))
+    return probabilities.tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[5, 100, 1000])
+    args = parser.parse_args()
+
+    pipeline = pickle.load(open("model.pkl", "rb"))
+    model = WinModel.from_pipeline(pipeline)
+    lines = stat_lines(args.rows)
+    assert np.allclose(
+        pipeline_scores(pipeline, lines[:1000]), vectorized_scores(model, lines[:1000])
+    )
+
+    print(f"{'batch':>6}{'pipeline rows/s':>17}{'vectorized rows/s':>19}{'speedup':>9}")
+    for batch in args.batch:
+        rates = []
+        for score in (
+            lambda chunk: pipeline_scores(pipeline, chunk),
+            lambda chunk: vectorized_scores(model, chunk),
+        ):
+            start = time.perf_counter()
+            for i in range(0, args.rows, batch):
+                score(lines[i : i + batch])
+            rates.append(args.rows / (time.perf_counter() - start))
+        print(
+            f"{batch:>6}{rates[0]:>17,.0f}{rates[1]:>19,.0f}{rates[1] / rates[0]:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
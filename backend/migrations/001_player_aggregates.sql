@@ -0,0 +1,27 @@
+-- Running sums per player, per (player, agent) and per (player, map); see src/aggregates.py.
+-- Backfill afterwards with `rye run python src/aggregates.py rebuild`.
+CREATE TABLE Player_Aggregates (
+    player_id VARCHAR(50) NOT NULL,
+    agent_id INTEGER NOT NULL DEFAULT 0,
+    map_id INTEGER NOT NULL DEFAULT 0,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills DOUBLE NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists DOUBLE NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score DOUBLE NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round DOUBLE NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills DOUBLE NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, agent_id, map_id)
+);
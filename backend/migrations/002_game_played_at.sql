@@ -0,0 +1,40 @@
+-- Game.played_at replaces parsing date_info on every read. date_info holds either
+-- vlr.gg's 'YYYY-MM-DD HH:MM:SS' (UTC) or, for games ingested before this change,
+-- the Henrik API's game_start epoch seconds.
+SET time_zone = '+00:00';
+
+ALTER TABLE Game ADD COLUMN played_at DATETIME NULL, ADD INDEX idx_game_played_at (played_at);
+
+UPDATE Game
+SET played_at = CASE
+    WHEN date_info REGEXP '^[0-9]+$' THEN FROM_UNIXTIME(date_info)
+    ELSE STR_TO_DATE(date_info, '%Y-%m-%d %H:%i:%s')
+END
+WHERE played_at IS NULL;
+
+-- Per-player monthly sums for /player-monthly-stats; see src/aggregates.py.
+-- Backfill afterwards with `rye run python src/aggregates.py rebuild`.
+CREATE TABLE Player_Monthly (
+    player_id VARCHAR(50) NOT NULL,
+    month DATE NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills DOUBLE NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists DOUBLE NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score DOUBLE NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round DOUBLE NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills DOUBLE NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, month)
+);
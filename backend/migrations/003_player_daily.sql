@@ -0,0 +1,29 @@
+-- Cumulative per-player totals by day, for /player-stats?timespan=; see src/aggregates.py.
+-- Backfill afterwards with `rye run python src/aggregates.py rebuild`.
+CREATE TABLE Player_Daily (
+    player_id VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills DOUBLE NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists DOUBLE NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score DOUBLE NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round DOUBLE NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills DOUBLE NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, day)
+);
+
+-- last-n-games windows read a player's newest rows straight off this index
+CREATE INDEX idx_player_stats_player_game ON Player_Stats (player_id, game_id);
@@ -0,0 +1,39 @@
+-- Whether the player's team won, so the rollups can carry win rates. Not backfilled:
+-- games loaded before this have no team result, so their win rates come from
+-- Agent_Stats.win_rate instead (see win_rate() in src/main.py).
+ALTER TABLE Player_Stats ADD COLUMN won BOOLEAN NULL;
+
+ALTER TABLE Player_Aggregates ADD COLUMN sum_won DOUBLE NOT NULL DEFAULT 0, ADD COLUMN n_won INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE Player_Monthly ADD COLUMN sum_won DOUBLE NOT NULL DEFAULT 0, ADD COLUMN n_won INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE Player_Daily ADD COLUMN sum_won DOUBLE NOT NULL DEFAULT 0, ADD COLUMN n_won INTEGER NOT NULL DEFAULT 0;
+
+-- Picks (games), wins and ACS per (map, agent, tier) for /agent_recommendations,
+-- /top_agent_map and /maps/{map_name}/cube; see src/aggregates.py.
+-- Backfill afterwards with `rye run python src/aggregates.py rebuild`.
+CREATE TABLE Map_Agent_Tier (
+    map_id INTEGER NOT NULL,
+    agent_id INTEGER NOT NULL,
+    tier_id INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills DOUBLE NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists DOUBLE NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score DOUBLE NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round DOUBLE NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio DOUBLE NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills DOUBLE NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths DOUBLE NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_won DOUBLE NOT NULL DEFAULT 0,
+    n_won INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (map_id, agent_id, tier_id)
+);
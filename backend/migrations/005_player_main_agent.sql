@@ -0,0 +1,10 @@
+-- Each player's most-played agent, for /most_played_agent, /player_most_played_agent,
+-- /agent_synergies and /pro_lookalike; see src/aggregates.py.
+-- Backfill afterwards with `rye run python src/aggregates.py rebuild`.
+CREATE TABLE Player_Main_Agent (
+    player_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    agent_id INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_player_main_agent_agent ON Player_Main_Agent (agent_id, games);
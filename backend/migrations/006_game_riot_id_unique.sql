@@ -0,0 +1,14 @@
+-- One Game row per Riot match: ingest inserts with INSERT IGNORE on this index, so
+-- two refreshes of the same match (one per player in it) cannot both write it.
+-- Matches already ingested twice keep their first Game and its Player_Stats.
+DELETE p FROM Player_Stats p
+JOIN Game g ON g.game_id = p.game_id
+JOIN (SELECT riot_id, MIN(game_id) AS game_id FROM Game WHERE riot_id IS NOT NULL GROUP BY riot_id) first
+    ON first.riot_id = g.riot_id AND first.game_id <> g.game_id;
+
+DELETE g FROM Game g
+JOIN (SELECT riot_id, MIN(game_id) AS game_id FROM Game WHERE riot_id IS NOT NULL GROUP BY riot_id) first
+    ON first.riot_id = g.riot_id AND first.game_id <> g.game_id;
+
+CREATE UNIQUE INDEX uq_game_riot_id ON Game (riot_id);
+-- The rollups counted those duplicates; rebuild with `rye run python src/aggregates.py rebuild`.
@@ -0,0 +1,8 @@
+-- One User row per username: register_user inserts with INSERT IGNORE on this index,
+-- so two concurrent signups for the same name cannot both create a user.
+-- Names already registered twice keep their first row, and with it its password.
+DELETE FROM User
+WHERE username IS NOT NULL
+  AND user_id NOT IN (SELECT user_id FROM (SELECT MIN(user_id) AS user_id FROM User GROUP BY username) kept);
+
+CREATE UNIQUE INDEX uq_user_username ON User (username);
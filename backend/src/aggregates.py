@@ -0,0 +1,409 @@
+"""Running per-player sums behind the stats endpoints.
+
+Player_Aggregates has one row per (player_id, agent_id, map_id), where 0
+stands for "all": (p, 0, 0) is the player's whole history, (p, a, 0) their
+games on agent a and (p, 0, m) their games on map m. Player_Monthly has one
+row per (player_id, month). Each row carries the game count plus
+sum_<column> and n_<column> (non-NULL count) per stat, so an average is
+sum / n exactly as AVG() over the raw rows would give.
+
+Player_Daily has the same columns per (player_id, day), but cumulative: each
+row totals every game up to the end of that day, so the games between two
+days are one row minus another.
+
+Map_Agent_Tier is not per player: one row per (map_id, agent_id, tier_id),
+so picks, win rate and ACS of any agent on any map are a lookup.
+
+Player_Main_Agent holds each player's most-played agent (ties go to the
+lowest agent_id) and their games on it, indexed by agent.
+
+    rye run python src/aggregates.py rebuild   # backfill from Player_Stats
+    rye run python src/aggregates.py check     # compare against Player_Stats
+"""
+
+import argparse
+import asyncio
+import math
+import re
+from datetime import date, timedelta
+
+from database import engine, insert_ignore, upsert
+from sqlalchemy import bindparam, text
+
+COLUMNS = [
+    "kills",
+    "deaths",
+    "assists",
+    "average_combat_score",
+    "kill_assist_trade_survive_ratio",
+    "average_damage_per_round",
+    "headshot_ratio",
+    "first_kills",
+    "first_deaths",
+    "won",
+]
+
+# Player_Stats column -> key in the rows ingest_matches writes
+INGEST_KEYS = {
+    "kills": "k",
+    "deaths": "d",
+    "assists": "a",
+    "average_combat_score": "acs",
+    "average_damage_per_round": "adr",
+    "headshot_ratio": "hr",
+    "won": "won",
+}
+
+VALUES = ["games"] + [f"{p}_{c}" for c in COLUMNS for p in ("sum", "n")]
+SUMS = ", ".join(
+    f"coalesce(sum({c}), 0) as sum_{c}, count({c}) as n_{c}" for c in COLUMNS
+)
+
+# SQL for the date keys, per dialect
+DATES = {
+    "mysql": {
+        "month": "cast(date_format(g.played_at, '%Y-%m-01') as date)",
+        "day": "cast(g.played_at as date)",
+    },
+    "sqlite": {
+        "month": "strftime('%Y-%m-01', g.played_at)",
+        "day": "date(g.played_at)",
+    },
+}
+
+
+def month(played_at: str) -> str:
+    return f"{played_at[:7]}-01"
+
+
+# table -> key columns and its scopes. A scope is the SQL for its key values
+# over Player_Stats p (joined to Game g when it mentions g.) and the same key
+# computed from a row written by ingest_matches.
+ROLLUPS = {
+    "Player_Aggregates": (
+        ["player_id", "agent_id", "map_id"],
+        [
+            (["p.player_id", "0", "0"], lambda row: (row["pid"], 0, 0)),
+            (
+                ["p.player_id", "p.agent_id", "0"],
+                lambda row: (row["pid"], row["aid"], 0),
+            ),
+            (["p.player_id", "0", "g.map_id"], lambda row: (row["pid"], 0, row["mid"])),
+        ],
+    ),
+    "Player_Monthly": (
+        ["player_id", "month"],
+        [(["p.player_id", "{month}"], lambda row: (row["pid"], month(row["at"])))],
+    ),
+    # picks (games), wins and ACS of every agent on every map, per tier
+    "Map_Agent_Tier": (
+        ["map_id", "agent_id", "tier_id"],
+        [
+            (
+                ["g.map_id", "p.agent_id", "p.tier_id"],
+                lambda row: (row["mid"], row["aid"], row["tid"]),
+            )
+        ],
+    ),
+}
+
+
+def deltas(rows, keys, scopes):
+    """Fold ingested Player_Stats rows into one delta per rollup key."""
+    folded: dict[tuple, dict] = {}
+    for row in rows:
+        for _, key_of in scopes:
+            key = key_of(row)
+            delta = folded.get(key)
+            if delta is None:
+                delta = folded[key] = dict(zip(keys, key)) | dict.fromkeys(VALUES, 0)
+            delta["games"] += 1
+            for column in COLUMNS:
+                value = row.get(INGEST_KEYS.get(column))
+                if value is not None:
+                    delta[f"sum_{column}"] += value
+                    delta[f"n_{column}"] += 1
+    return list(folded.values())
+
+
+async def add_rows(connection, rows):
+    """Add freshly ingested rows to every rollup, in the caller's transaction."""
+    for table, (keys, scopes) in ROLLUPS.items():
+        folded = deltas(rows, keys, scopes)
+        if folded:
+            await connection.execute(
+                upsert(connection, table, keys, VALUES, add=True), folded
+            )
+    await add_daily(connection, rows)
+    await refresh_main_agents(connection, {row["pid"] for row in rows})
+
+
+DAILY_KEYS = ["player_id", "day"]
+
+# A (player_id, day) row starts from the previous day's totals. Inserted with
+# INSERT IGNORE on the primary key, so two ingests for the same day cannot
+# both create it.
+PREVIOUS_DAY = (
+    f"select :player_id, :day, {', '.join(f'coalesce(max({v}), 0)' for v in VALUES)}"
+    " from Player_Daily where player_id = :player_id and day = ("
+    "select max(day) from Player_Daily where player_id = :player_id and day < :day)"
+)
+# ...then that day's games are added to it and to every later day
+ADD_FROM_DAY = text(
+    f"update Player_Daily set {', '.join(f'{v} = {v} + :{v}' for v in VALUES)}"
+    " where player_id = :player_id and day >= :day"
+)
+
+
+async def add_daily(connection, rows):
+    folded = deltas(
+        rows, DAILY_KEYS, [(None, lambda row: (row["pid"], row["at"][:10]))]
+    )
+    if folded:
+        # in key order, so concurrent ingests lock shared rows in the same order
+        folded.sort(key=lambda delta: (delta["player_id"], delta["day"]))
+        await connection.execute(
+            insert_ignore(
+                connection, "Player_Daily", DAILY_KEYS + VALUES, PREVIOUS_DAY
+            ),
+            folded,
+        )
+        await connection.execute(ADD_FROM_DAY, folded)
+
+
+MAIN_AGENT_KEYS = ["player_id"]
+MAIN_AGENT_VALUES = ["agent_id", "games"]
+
+PLAYER_AGENTS = text(
+    "select player_id, agent_id, games from Player_Aggregates"
+    " where player_id in :player_ids and agent_id <> 0 and map_id = 0"
+).bindparams(bindparam("player_ids", expanding=True))
+
+
+async def refresh_main_agents(connection, player_ids):
+    """Recompute Player_Main_Agent for `player_ids` from their Player_Aggregates rows."""
+    if not player_ids:
+        return
+    result = await connection.execute(PLAYER_AGENTS, {"player_ids": list(player_ids)})
+    main: dict[str, dict] = {}
+    for player_id, agent_id, games in result:
+        best = main.get(player_id)
+        if best is None or (games, -agent_id) > (best["games"], -best["agent_id"]):
+            main[player_id] = {
+                "player_id": player_id,
+                "agent_id": agent_id,
+                "games": games,
+            }
+    if main:
+        await connection.execute(
+            upsert(connection, "Player_Main_Agent", MAIN_AGENT_KEYS, MAIN_AGENT_VALUES),
+            list(main.values()),
+        )
+
+
+def raw_query(dialect: str, keys: list[str], key_sql: list[str], players=False) -> str:
+    """The GROUP BY over Player_Stats that a scope's rollup rows stand for."""
+    key_sql = [sql.format(**DATES[dialect]) for sql in key_sql]
+    keyed = ", ".join(f"{sql} as {key}" for key, sql in zip(keys, key_sql))
+    query = f"select {keyed}, count(*) as games, {SUMS} from Player_Stats p"
+    grouped = [sql for sql in key_sql if not sql.isdigit()]
+    conditions = ["p.player_id in :player_ids"] if players else []
+    conditions += [f"{sql} is not null" for sql in grouped]
+    if any("g." in sql for sql in key_sql):
+        query += " join Game g on p.game_id = g.game_id"
+    query += " where " + " and ".join(conditions)
+    return f"{query} group by {', '.join(grouped)}"
+
+
+def sources(dialect: str, players=False):
+    """(table, key columns, value columns, queries over Player_Stats giving its rows).
+
+    With players=True only the per-player tables, restricted to :player_ids.
+    """
+    for table, (keys, scopes) in ROLLUPS.items():
+        if players and keys[0] != "player_id":
+            continue
+        yield (
+            table,
+            keys,
+            VALUES,
+            [raw_query(dialect, keys, key_sql, players) for key_sql, _ in scopes],
+        )
+    daily = raw_query(dialect, DAILY_KEYS, ["p.player_id", "{day}"], players)
+    running = ", ".join(f"sum({v}) over w as {v}" for v in VALUES)
+    yield (
+        "Player_Daily",
+        DAILY_KEYS,
+        VALUES,
+        [
+            f"select player_id, day, {running} from ({daily}) d"
+            " window w as (partition by player_id order by day)"
+        ],
+    )
+    per_agent = raw_query(
+        dialect, ["player_id", "agent_id"], ["p.player_id", "p.agent_id"], players
+    )
+    yield (
+        "Player_Main_Agent",
+        MAIN_AGENT_KEYS,
+        MAIN_AGENT_VALUES,
+        [
+            "select player_id, agent_id, games from ("
+            "select player_id, agent_id, games, row_number() over"
+            " (partition by player_id order by games desc, agent_id) as place"
+            f" from ({per_agent}) a) r where place = 1"
+        ],
+    )
+
+
+async def rebuild(connection):
+    """Recompute every rollup table from Player_Stats."""
+    for table, keys, values, queries in sources(connection.dialect.name):
+        await connection.execute(text(f"delete from {table}"))
+        columns = ", ".join(keys + values)
+        for query in queries:
+            await connection.execute(text(f"insert into {table} ({columns}) {query}"))
+
+
+async def check(connection, player_ids=None):
+    """Rows of any rollup that disagree with Player_Stats, with both versions.
+
+    Checks every player, or only `player_ids` when given.
+    """
+    players = player_ids is not None
+
+    async def execute(query):
+        query = text(query)
+        if not players:
+            return await connection.execute(query)
+        query = query.bindparams(bindparam("player_ids", expanding=True))
+        return await connection.execute(query, {"player_ids": player_ids})
+
+    mismatches = []
+    for table, keys, values, queries in sources(connection.dialect.name, players):
+        query = f"select {', '.join(keys + values)} from {table}"
+        if players:
+            query += " where player_id in :player_ids"
+        width = len(keys)
+        stored = {
+            tuple(row[:width]): tuple(row[width:]) for row in await execute(query)
+        }
+
+        for query in queries:
+            for row in await execute(query):
+                key, expected = tuple(row[:width]), tuple(row[width:])
+                actual = stored.pop(key, None)
+                if actual is None or not all(
+                    math.isclose(a, e, rel_tol=1e-9, abs_tol=1e-6)
+                    for a, e in zip(actual, expected)
+                ):
+                    mismatches.append(
+                        {
+                            "table": table,
+                            "key": key,
+                            "expected": expected,
+                            "actual": actual,
+                        }
+                    )
+        for key, actual in stored.items():
+            # a rollup row with no raw rows behind it at all
+            mismatches.append(
+                {"table": table, "key": key, "expected": None, "actual": actual}
+            )
+    return mismatches
+
+
+# the frontend's names for day windows
+NAMED_SPANS = {"3months": 90, "6months": 180, "1year": 365}
+
+LATEST_DAY = text(
+    f"select {', '.join(VALUES)} from Player_Daily"
+    " where player_id = :player_id and day <= :day order by day desc limit 1"
+)
+LAST_GAMES = text(
+    f"select count(*) as games, {SUMS} from ("
+    "select * from Player_Stats where player_id = :player_id order by game_id desc limit :n"
+    ") p"
+)
+
+
+def parse_timespan(timespan: str):
+    """("overall" | "season", None), ("days", n) or ("games", n).
+
+    Accepts overall, season, <n>d (last n days), <n>g (last n games) and the
+    frontend's 3months / 6months / 1year.
+    """
+    if timespan in ("overall", "season"):
+        return timespan, None
+    if timespan in NAMED_SPANS:
+        return "days", NAMED_SPANS[timespan]
+    match = re.fullmatch(r"([1-9]\d{0,4})([dg])", timespan)
+    if match is None:
+        raise ValueError(f"Unknown timespan {timespan!r}")
+    return ("days" if match[2] == "d" else "games"), int(match[1])
+
+
+async def window_totals(
+    connection, player_id: str, timespans: list[str], today: date, season_start: date
+):
+    """Games, sums and counts over each timespan for one player.
+
+    Day windows and the season are two Player_Daily lookups: the cumulative
+    row as of today minus the one from the day before the window starts. The
+    last n games are read directly, n rows off the (player_id, game_id) index.
+    """
+    parsed = {timespan: parse_timespan(timespan) for timespan in timespans}
+
+    async def as_of(day: date):
+        result = await connection.execute(
+            LATEST_DAY, {"player_id": player_id, "day": day.isoformat()}
+        )
+        return result.mappings().first() or dict.fromkeys(VALUES, 0)
+
+    total = await as_of(today)
+    totals = {}
+    for timespan, (kind, n) in parsed.items():
+        if kind == "overall":
+            totals[timespan] = dict(total)
+        elif kind == "games":
+            result = await connection.execute(
+                LAST_GAMES, {"player_id": player_id, "n": n}
+            )
+            totals[timespan] = dict(result.mappings().one())
+        else:
+            start = season_start if kind == "season" else today - timedelta(n - 1)
+            before = await as_of(start - timedelta(1))
+            totals[timespan] = {v: total[v] - before[v] for v in VALUES}
+    return totals
+
+
+def average(row, column: str, digits: int | None = None):
+    n = row[f"n_{column}"]
+    if not n:
+        return None
+    value = row[f"sum_{column}"] / n
+    return round(value, digits) if digits is not None else value
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        async with engine.begin() as connection:
+            await rebuild(connection)
+        print(f"rebuilt {', '.join(ROLLUPS)}, Player_Daily, Player_Main_Agent")
+    else:
+        async with engine.connect() as connection:
+            mismatches = await check(connection)
+        for mismatch in mismatches[:20]:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatched rows")
+        if mismatches:
+            raise SystemExit(1)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,12 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import jwt
 from config import get_settings
+from database import insert_ignore
 from models import User
 from passlib.context import CryptContext
 from sqlalchemy import text
@@ -23,12 +28,45 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def get_user(db, username: str):
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordPool:
+    """bcrypt hashing and verification on a bounded thread pool, off the event loop.
+
+    bcrypt releases the GIL, so `workers` hashes run in parallel. At most
+    `queue` more may wait for a worker; past that PasswordPoolBusy is raised
+    so callers can shed load instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int = 4, queue: int = 64):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+        self.slots = asyncio.Semaphore(workers + queue)
+
+    async def run(self, fn, *args):
+        if self.slots.locked():
+            raise PasswordPoolBusy
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def verify(self, plain_password, password_hash) -> bool:
+        return await self.run(verify_password, plain_password, password_hash)
+
+    async def hash(self, password) -> str:
+        return await self.run(get_password_hash, password)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def get_user(db, username: str):
     statement = text("select * from User where username=:username").bindparams(
         username=username
     )
-    with db.connect() as connection:
-        user_data = connection.execute(statement).fetchone()
+    async with db.connect() as connection:
+        user_data = (await connection.execute(statement)).fetchone()
     if not user_data:
         return None
 
@@ -41,50 +79,100 @@ def get_user(db, username: str):
     )
 
 
-def register_user(db, username: str, password: str):
-    statement = text("select * from Player where player_id=:player_id").bindparams(
-        player_id=username
-    )
-    with db.connect() as connection:
-        player_data = connection.execute(statement).fetchone()
-
-        connection.execute(text("START TRANSACTION"))
-
-        if not player_data:
-
-            connection.execute(text("LOCK TABLES Player WRITE"))
-            
-            statement = text(
-                "insert into Player (player_id, current_tier_id) values (:player_id, :current_tier_id)"
-            ).bindparams(player_id=username, current_tier_id=3)
-            connection.execute(statement)
-            connection.commit()
-
-        connection.execute(text("LOCK TABLES User WRITE"))
-
-        statement = text(
-            "insert into User (username, player_id, password_hash) values (:username, :player_id, :password_hash)"
-        ).bindparams(
-            username=username,
-            player_id=username,
-            password_hash=get_password_hash(password),
+class UserCache:
+    """Users loaded by get_current_user, keyed by username and token `iat`.
+
+    Entries expire after `ttl` seconds; the least recently used are dropped
+    beyond `max_size`. `invalidate(username)` drops a user's entries and
+    stops trusting the `pid` claim of their tokens issued before it. Both
+    are per process: other workers reload the user within `ttl`, but keep
+    trusting the claims of tokens issued before the change until they
+    expire (Settings.auth_player_claim_expire_minutes).
+    """
+
+    def __init__(
+        self, max_size: int = 10_000, ttl: float = 60.0, token_lifetime: float = 1800.0
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.token_lifetime = token_lifetime
+        self.entries: OrderedDict[tuple[str, int | None], tuple[float, User]] = (
+            OrderedDict()
         )
-        connection.execute(statement)
-        
+        self.changed_at: dict[str, float] = {}
+        self.stats = {"hits": 0, "misses": 0, "claims": 0}
+
+    def get(self, username: str, iat: int | None) -> User | None:
+        key = (username, iat)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            del self.entries[key]
+        self.stats["misses"] += 1
+        return None
 
-        connection.execute(text("UNLOCK TABLES"))
-        connection.execute(text("COMMIT"))
-        connection.commit()
+    def put(self, username: str, iat: int | None, user: User):
+        self.entries[(username, iat)] = (time.monotonic() + self.ttl, user)
+        self.entries.move_to_end((username, iat))
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def trusts(self, username: str, iat: int | None) -> bool:
+        """Whether a token issued at `iat` postdates the user's last change."""
+        changed = self.changed_at.get(username)
+        return changed is None or (iat is not None and iat > changed)
+
+    def invalidate(self, username: str):
+        """Forget a user after they are deleted or their password or player changes."""
+        now = time.time()
+        self.changed_at[username] = now
+        for key in [key for key in self.entries if key[0] == username]:
+            del self.entries[key]
+        # tokens older than this have expired anyway
+        for name, changed in list(self.changed_at.items()):
+            if changed < now - self.token_lifetime:
+                del self.changed_at[name]
+
+
+async def register_user(db, username: str, password_hash: str):
+    """Create the player and user rows in one transaction, without table locks.
+
+    Both inserts skip rows that already exist (User.username is unique, see
+    migrations/007), so concurrent signups for the same name cannot fail; the
+    first one's password wins.
+    """
+    async with db.begin() as connection:
+        await connection.execute(
+            insert_ignore(connection, "Player", ["player_id", "current_tier_id"]),
+            {"player_id": username, "current_tier_id": 3},
+        )
+        await connection.execute(
+            insert_ignore(
+                connection, "User", ["username", "player_id", "password_hash"]
+            ),
+            {
+                "username": username,
+                "player_id": username,
+                "password_hash": password_hash,
+            },
+        )
 
 
-def authenticate_user(db, username: str, password: str):
-    user = get_user(db, username)
+async def authenticate_user(db, username: str, password: str, passwords: PasswordPool):
+    user = await get_user(db, username)
     if not user:
-        register_user(db, username, password)
-        user = get_user(db, username)
+        password_hash = await passwords.hash(password)
+        await register_user(db, username, password_hash)
+        user = await get_user(db, username)
         if not user:
             raise ValueError("Failed to create user")
-    if not verify_password(password, user.password_hash):
+        if user.password_hash == password_hash:
+            # our own signup: no need to verify the hash we just made
+            return user
+    if not await passwords.verify(password, user.password_hash):
         return False
     return user
 
@@ -95,7 +183,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
     encoded_jwt = jwt.encode(
         to_encode,
         settings.secret_key.get_secret_value(),  # type: ignore
@@ -105,8 +193,8 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 
 
-def delete_user(db, username: str, password: str):
-    user = get_user(db, username)
+async def delete_user(db, username: str, password: str):
+    user = await get_user(db, username)
     
     if not user:
         raise ValueError("user not found")
@@ -114,5 +202,8 @@ def delete_user(db, username: str, password: str):
     if not verify_password(password, user.password_hash):
         raise ValueError("Incorrect Password") 
 
-    db.connect.execute(text("DELETE FROM User WHERE username = :uname").bindparams(uname = username))
-        
\ No newline at end of file
+    async with db.connect() as connection:
+        await connection.execute(
+            text("DELETE FROM User WHERE username = :uname").bindparams(uname=username)
+        )
+        await connection.commit()
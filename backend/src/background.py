@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+
+class BackgroundIndex:
+    """An in-memory structure derived from the database, rebuilt off the request path.
+
+    Subclasses implement `build()`. Rebuild requests that arrive while a build
+    is running are coalesced into one more build once it finishes.
+    """
+
+    def __init__(self, db, min_interval: float = 0.0):
+        self.db = db
+        self.min_interval = min_interval
+        self.built = False
+        self.built_at = 0.0
+        self.rebuild_task: asyncio.Task | None = None
+        self.refresh_task: asyncio.Task | None = None
+        self.stale = False
+
+    async def build(self):
+        raise NotImplementedError
+
+    def schedule_rebuild(self):
+        if self.rebuild_task is not None and not self.rebuild_task.done():
+            self.stale = True
+            return
+        self.rebuild_task = asyncio.create_task(self._rebuild())
+
+    async def _rebuild(self):
+        self.stale = True
+        while self.stale:
+            # bound how often an expensive index is rebuilt under steady ingest
+            wait = self.built_at + self.min_interval - time.monotonic()
+            if self.built and wait > 0:
+                await asyncio.sleep(wait)
+            self.stale = False
+            await self.build()
+            self.built_at = time.monotonic()
+            self.built = True
+
+    async def ready(self, max_age: float | None = None):
+        """Wait for a build, or for a rebuild if the last one is older than max_age."""
+        if self.built and (
+            max_age is None or time.monotonic() - self.built_at <= max_age
+        ):
+            return
+        if self.rebuild_task is None or self.rebuild_task.done():
+            # first use, a failed build, or too stale: (re)build now
+            self.schedule_rebuild()
+        await asyncio.shield(self.rebuild_task)  # type: ignore
+
+    def refresh_every(self, seconds: float):
+        async def refresh():
+            while True:
+                await asyncio.sleep(seconds)
+                self.schedule_rebuild()
+
+        self.refresh_task = asyncio.create_task(refresh())
+
+    async def stop(self):
+        for task in (self.refresh_task, self.rebuild_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(
+            *(t for t in (self.refresh_task, self.rebuild_task) if t),
+            return_exceptions=True,
+        )
@@ -1,3 +1,4 @@
+from datetime import date
 from functools import lru_cache
 
 from pydantic import SecretStr
@@ -9,12 +10,53 @@ class Settings(BaseSettings):
     database_password: SecretStr | None = None
     database_host: str | None = None
     database_dbname: str = "chonk"
+    # full SQLAlchemy URL, e.g. sqlite+aiosqlite:///chonk.db for local runs and tests
+    database_url: str | None = None
 
     secret_key: SecretStr | None = None
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # bcrypt runs on this many threads, with at most password_queue logins waiting
+    password_workers: int = 4
+    password_queue: int = 64
+    # authenticated users are cached per token for this long
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 60.0
+    # sign uid/pid claims into tokens so requests can skip the User lookup. An
+    # instance that did not handle a user's deletion trusts their claims until
+    # the token expires, so tokens carrying claims expire after this instead
+    auth_player_claim: bool = False
+    auth_player_claim_expire_minutes: int = 10
 
     henrik_api_key: SecretStr | None = None
+    henrik_base_url: str = "https://api.henrikdev.xyz"
+    henrik_cache_dir: str = "henrik_cache"
+    henrik_requests_per_minute: int = 30
+    henrik_history_ttl: float = 120.0
+
+    # usernames allowed to call the /admin endpoints, e.g. ADMIN_USERNAMES='["dwang"]'
+    admin_usernames: set[str] = set()
+
+    job_queue_path: str = "jobs.db"
+    job_workers: int = 4
+    # finished and failed jobs are kept this long for /jobs/{job_id}, then deleted
+    job_retention: float = 86400.0
+
+    # /performance_breakdown entries outlive another instance's ingest by at most this
+    performance_cache_ttl: float = 60.0
+
+    # /homepage-stats is rebuilt this often, and never served older than the bound
+    homepage_refresh_interval: float = 300.0
+    homepage_max_staleness: float = 900.0
+
+    # first day of the current competitive act, for /player-stats?timespan=season
+    season_start: date = date(2024, 6, 25)
+
+    # compiled by `python src/scoring.py export` from the trained model.pkl
+    win_model_path: str = "model.json"
+    # versions published with `python src/registry.py publish`, served once active
+    win_model_registry: str = "models"
+    win_model_poll_interval: float = 30.0
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,26 +1,68 @@
 from config import get_settings
-from sqlalchemy import URL, create_engine
+from sqlalchemy import URL, make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine
 
 settings = get_settings()
 
-if settings.database_username is None:
-    raise ValueError("database_username is required")
+if settings.database_url is not None:
+    database_url = make_url(settings.database_url)
+else:
+    if settings.database_username is None:
+        raise ValueError("database_username is required")
 
-if settings.database_dbname is None:
-    raise ValueError("database_dbname is required")
+    if settings.database_dbname is None:
+        raise ValueError("database_dbname is required")
 
-if settings.database_host is None:
-    raise ValueError("database_host is required")
+    if settings.database_host is None:
+        raise ValueError("database_host is required")
 
-if settings.database_password is None:
-    raise ValueError("database_password is required")
+    if settings.database_password is None:
+        raise ValueError("database_password is required")
 
-database_url = URL.create(
-    "mysql+pymysql",
-    username=settings.database_username,
-    password=settings.database_password.get_secret_value(),
-    host=settings.database_host,
-    database=settings.database_dbname,
-)
+    database_url = URL.create(
+        "mysql+aiomysql",
+        username=settings.database_username,
+        password=settings.database_password.get_secret_value(),
+        host=settings.database_host,
+        database=settings.database_dbname,
+    )
 
-engine = create_engine(database_url, pool_size=20, max_overflow=0, pool_pre_ping=True)
+if database_url.get_backend_name() == "sqlite":
+    engine = create_async_engine(database_url)
+else:
+    engine = create_async_engine(
+        database_url, pool_size=20, max_overflow=0, pool_pre_ping=True
+    )
+
+
+def upsert(connection, table: str, keys: list[str], values: list[str], add=False):
+    """INSERT that updates `values` when a row with the same `keys` exists.
+
+    With add=True the new values are added onto the stored ones, for tables
+    of running sums. Spelled per dialect: MySQL in production, SQLite in tests.
+    """
+    columns = keys + values
+    statement = f"insert into {table} ({', '.join(columns)}) values ({', '.join(':' + c for c in columns)})"
+    if connection.dialect.name == "mysql":
+        statement += " on duplicate key update "
+        new = "values({})"
+    else:
+        statement += f" on conflict ({', '.join(keys)}) do update set "
+        new = "excluded.{}"
+    statement += ", ".join(
+        f"{c} = {c} + {new.format(c)}" if add else f"{c} = {new.format(c)}"
+        for c in values
+    )
+    return text(statement)
+
+
+def insert_ignore(
+    connection, table: str, columns: list[str], select: str | None = None
+):
+    """INSERT that skips rows whose unique keys already exist.
+
+    `select`, if given, is a query producing the rows instead of a VALUES list.
+    """
+    verb = "insert ignore" if connection.dialect.name == "mysql" else "insert or ignore"
+    source = select or f"values ({', '.join(':' + c for c in columns)})"
+    return text(f"{verb} into {table} ({', '.join(columns)}) {source}")
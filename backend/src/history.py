@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+
+from sqlalchemy import bindparam, text
+
+# what /matches, /model_matches and the export read per Player_Stats row
+COLUMNS = {
+    "game_id": "p.game_id",
+    "date_info": "g.date_info",
+    "map_name": "m.map_name",
+    "agent_id": "p.agent_id",
+    "agent_name": "a.agent_name",
+    "tier_id": "p.tier_id",
+    "team_side": "p.team_side",
+    "kills": "p.kills",
+    "deaths": "p.deaths",
+    "assists": "p.assists",
+    "average_combat_score": "p.average_combat_score",
+    "kill_assist_trade_survive_ratio": "p.kill_assist_trade_survive_ratio",
+    "average_damage_per_round": "p.average_damage_per_round",
+    "headshot_ratio": "p.headshot_ratio",
+    "first_kills": "p.first_kills",
+    "first_deaths": "p.first_deaths",
+    "won": "p.won",
+    # set on games ingested from the Henrik API, see scoring.percentages
+    "riot_id": "g.riot_id",
+}
+SELECT = ", ".join(f"{sql} as {name}" for name, sql in COLUMNS.items())
+JOINS = (
+    " join Game g on g.game_id = p.game_id"
+    " join Maps m on m.map_id = g.map_id"
+    " join Agents a on a.agent_id = p.agent_id"
+)
+
+
+def page_query(cursor: int | None, descending: bool):
+    """One page of a player's games, oldest (or newest) first after `cursor`.
+
+    The game ids are picked from the (player_id, game_id) index alone, then
+    only those rows are joined, so a page costs the same however deep it is.
+    """
+    direction = "desc" if descending else "asc"
+    after = ""
+    if cursor is not None:
+        after = f" and game_id {'<' if descending else '>'} :cursor"
+    return text(
+        f"select {SELECT} from ("
+        f"select distinct game_id from Player_Stats where player_id = :player_id{after}"
+        f" order by game_id {direction} limit :limit) page"
+        " join Player_Stats p on p.player_id = :player_id and p.game_id = page.game_id"
+        f"{JOINS} order by p.game_id {direction}"
+    )
+
+
+async def match_page(
+    connection,
+    player_id: str,
+    cursor: int | None = None,
+    limit: int = 5,
+    descending: bool = False,
+):
+    """Up to `limit` games as row mappings, and the cursor for the next page or None."""
+    result = await connection.execute(
+        page_query(cursor, descending),
+        {"player_id": player_id, "cursor": cursor, "limit": limit},
+    )
+    rows = result.mappings().all()
+    games = {row["game_id"] for row in rows}
+    return rows, (rows[-1]["game_id"] if len(games) == limit else None)
+
+
+GAMES_QUERY = text(
+    f"select {SELECT} from Player_Stats p{JOINS}"
+    " where p.player_id = :player_id and p.game_id in :game_ids order by p.game_id"
+).bindparams(bindparam("game_ids", expanding=True))
+
+EXPORT_QUERY = text(
+    f"select {SELECT} from Player_Stats p{JOINS}"
+    " where p.player_id = :player_id order by p.game_id"
+)
+
+
+async def export_rows(db, player_id: str, batch: int = 1000):
+    """Every row of a player's history in batches, read through a server-side cursor."""
+    async with db.connect() as connection:
+        result = await connection.stream(EXPORT_QUERY, {"player_id": player_id})
+        async for rows in result.mappings().partitions(batch):
+            yield rows
+
+
+async def ndjson_lines(batches):
+    async for rows in batches:
+        yield "".join(json.dumps(dict(row), default=str) + "\n" for row in rows)
+
+
+async def csv_lines(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(COLUMNS))
+    writer.writeheader()
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
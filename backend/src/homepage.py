@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+from background import BackgroundIndex
+from sqlalchemy import text
+
+AGENT_QUERY = text(
+    "select agent_name, AVG(kd) as avg_kd from Agent_Stats natural join Agents group by agent_id order by avg_kd desc limit 1"
+)
+WEAPON_QUERY = text(
+    "select weapon_name, count(*) as game_count from Weapon_Stats natural join Weapons group by weapon_id order by game_count desc limit 1"
+)
+MAP_QUERY = text(
+    "select map_name, count(*) as game_count from Map_Stats natural join Maps group by map_id order by game_count desc limit 1"
+)
+TOP_AGENTS_QUERY = text(
+    "select agent_name, AVG(win_rate) as avg_win_rate, AVG(pick_rate) as avg_pick_rate, AVG(kd) as avg_kd, AVG(acs) as average_acs, SUM(num_matches) as match_count from Agent_Stats natural join Agents group by agent_id order by avg_win_rate desc limit 5"
+)
+
+
+class HomepageSnapshot(BackgroundIndex):
+    """The /homepage-stats response, computed in the background and served from memory.
+
+    Rebuilt every `refresh_every` seconds and whenever ingest bumps
+    `data_version`; `computed_at` and `data_version` record what it reflects.
+    """
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.data_version = 0
+        self.snapshot: dict = {}
+
+    async def build(self):
+        version = self.data_version
+        async with self.db.connect() as connection:
+            best_agent = (await connection.execute(AGENT_QUERY)).fetchone()
+            best_weapon = (await connection.execute(WEAPON_QUERY)).fetchone()
+            best_map = (await connection.execute(MAP_QUERY)).fetchone()
+            top_agents = (await connection.execute(TOP_AGENTS_QUERY)).fetchall()
+
+        self.snapshot = {
+            "best_agent": best_agent
+            and {"agent_name": best_agent.agent_name, "kd": best_agent.avg_kd},
+            "best_weapon": best_weapon
+            and {
+                "weapon_name": best_weapon.weapon_name,
+                "game_count": best_weapon.game_count,
+            },
+            "best_map": best_map
+            and {"map_name": best_map.map_name, "game_count": best_map.game_count},
+            "top_agents": [
+                {
+                    "agent_name": agent.agent_name,
+                    "avg_win_rate": agent.avg_win_rate,
+                    "avg_pick_rate": agent.avg_pick_rate,
+                    "avg_kd": agent.avg_kd,
+                    "average_acs": agent.average_acs,
+                    "match_count": agent.match_count,
+                }
+                for agent in top_agents
+            ],
+            "computed_at": datetime.now(timezone.utc).isoformat(),
+            "data_version": version,
+        }
+
+    def on_ingest(self, rows):
+        if rows:
+            self.data_version += 1
+            self.schedule_rebuild()
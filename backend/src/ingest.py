@@ -0,0 +1,215 @@
+import asyncio
+from datetime import datetime, timezone
+
+import aggregates
+from database import insert_ignore
+from sqlalchemy import bindparam, text
+
+
+class DimensionCache:
+    """In-memory name -> id lookups for the Maps and Agents tables."""
+
+    def __init__(self):
+        self.maps: dict[str, int] = {}
+        self.agents: dict[str, int] = {}
+
+    async def load(self, connection):
+        result = await connection.execute(text("select map_id, map_name from Maps"))
+        self.maps = {map_name: map_id for map_id, map_name in result}
+        result = await connection.execute(
+            text("select agent_id, agent_name from Agents")
+        )
+        self.agents = {agent_name: agent_id for agent_id, agent_name in result}
+
+    async def resolve(self, connection, map_names, agent_names):
+        # reload only when the API hands us a name we have not seen (new map/agent)
+        if not (
+            set(map_names) <= self.maps.keys()
+            and set(agent_names) <= self.agents.keys()
+        ):
+            await self.load(connection)
+
+
+def played_at(match) -> str:
+    """UTC start time in Game.date_info's format, also used for Game.played_at."""
+    start = datetime.fromtimestamp(match.metadata.game_start, timezone.utc)
+    return start.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def player_stats_row(game_id, player, matchrounds, agent_id, map_id, at, won):
+    shots = player.stats.bodyshots + player.stats.headshots + player.stats.legshots
+    return {
+        "gid": game_id,
+        "pid": f"{player.name}#{player.tag}",
+        "aid": agent_id,
+        "acs": player.stats.score / matchrounds,
+        "k": player.stats.kills,
+        "d": player.stats.deaths,
+        "a": player.stats.assists,
+        "adr": player.damage_made / matchrounds,
+        "hr": player.stats.headshots / shots if shots else 0,
+        "tid": player.currenttier,
+        "mid": map_id,
+        "at": at,
+        "won": won,
+    }
+
+
+async def ingest_matches(connection, dimensions: DimensionCache, matches):
+    """Insert every new competitive match and its player rows.
+
+    Player_Aggregates is updated alongside, so it never drifts from the raw rows.
+
+    Game rows are written one INSERT IGNORE per new match against the unique
+    Game.riot_id, so when another refresh inserts the same match first, only
+    one of them writes its player rows and rollups. Everything else is a
+    fixed number of statements; the caller owns the transaction. Returns one
+    report entry per match (status and Player_Stats rows written) and the
+    inserted rows.
+    """
+    competitive = {}
+    report = []
+    for match in matches:
+        if match.metadata.mode != "Competitive":
+            report.append({"matchid": match.metadata.matchid, "status": "skipped"})
+        else:
+            competitive.setdefault(match.metadata.matchid, match)
+    if not competitive:
+        return report, []
+
+    query = text("select riot_id from Game where riot_id in :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    existing = set(
+        (await connection.execute(query, {"ids": list(competitive)})).scalars()
+    )
+
+    new_matches = [m for matchid, m in competitive.items() if matchid not in existing]
+    await dimensions.resolve(
+        connection,
+        [m.metadata.map for m in new_matches],
+        [p.character for m in new_matches for p in m.players.all_players],
+    )
+
+    games = []
+    for matchid in existing:
+        report.append({"matchid": matchid, "status": "exists", "player_stats": 0})
+    for match in new_matches:
+        metadata = match.metadata
+        if metadata.map not in dimensions.maps or any(
+            p.character not in dimensions.agents for p in match.players.all_players
+        ):
+            report.append({"matchid": metadata.matchid, "status": "unknown_dimension"})
+            continue
+        games.append(match)
+    if not games:
+        return report, []
+
+    insert_game = insert_ignore(
+        connection, "Game", ["map_id", "date_info", "played_at", "riot_id"]
+    )
+    game_ids = {}
+    for match in games:
+        result = await connection.execute(
+            insert_game,
+            {
+                "map_id": dimensions.maps[match.metadata.map],
+                "date_info": played_at(match),
+                "played_at": played_at(match),
+                "riot_id": match.metadata.matchid,
+            },
+        )
+        if result.rowcount:
+            game_ids[match.metadata.matchid] = result.lastrowid
+        else:
+            # a concurrent refresh wrote it after the check above
+            report.append(
+                {
+                    "matchid": match.metadata.matchid,
+                    "status": "exists",
+                    "player_stats": 0,
+                }
+            )
+    games = [m for m in games if m.metadata.matchid in game_ids]
+    if not games:
+        return report, []
+
+    rows = []
+    for match in games:
+        match_rows = [
+            player_stats_row(
+                game_ids[match.metadata.matchid],
+                player,
+                match.metadata.rounds_played,
+                dimensions.agents[player.character],
+                dimensions.maps[match.metadata.map],
+                played_at(match),
+                getattr(match.teams, player.team.lower()).has_won,
+            )
+            for player in match.players.all_players
+        ]
+        rows.extend(match_rows)
+        report.append(
+            {
+                "matchid": match.metadata.matchid,
+                "status": "inserted",
+                "player_stats": len(match_rows),
+            }
+        )
+
+    await connection.execute(
+        text(
+            "insert into Player_Stats (game_id, player_id,agent_id, average_combat_score,kills,deaths,assists,average_damage_per_round,headshot_ratio, tier_id, won) values(:gid, :pid, :aid, :acs, :k, :d,:a,:adr,:hr,:tid, :won)"
+        ),
+        rows,
+    )
+    await aggregates.add_rows(connection, rows)
+    return report, rows
+
+
+async def bulk_refresh(henrik, ingest, player_ids, region="na"):
+    """Refresh several players at once, writing each shared match only once.
+
+    Histories are fetched concurrently; matches that appear in more than one
+    history are collapsed by matchid before a single `await ingest(matches)`.
+    """
+    requests_before = henrik.stats["requests"]
+    cache_hits_before = henrik.stats["cache_hits"]
+
+    async def fetch(player_id):
+        name, tag = player_id.split("#", 1)
+        return await henrik.get_match_history(
+            region, name, tag, game_mode="competitive"
+        )
+
+    histories = await asyncio.gather(
+        *(fetch(player_id) for player_id in player_ids), return_exceptions=True
+    )
+
+    unique = {}
+    fetched = 0
+    errors = {}
+    for player_id, history in zip(player_ids, histories):
+        if isinstance(history, Exception):
+            errors[player_id] = str(history)
+            continue
+        fetched += len(history)
+        for match in history:
+            unique.setdefault(match.metadata.matchid, match)
+
+    report = await ingest(list(unique.values()))
+
+    statuses = [entry["status"] for entry in report]
+    return {
+        "players": len(player_ids),
+        "errors": errors,
+        "api_requests": henrik.stats["requests"] - requests_before,
+        "cache_hits": henrik.stats["cache_hits"] - cache_hits_before,
+        "fetched": fetched,
+        "unique": len(unique),
+        "deduplicated": fetched - len(unique),
+        "skipped": statuses.count("skipped") + statuses.count("unknown_dimension"),
+        "existing": statuses.count("exists"),
+        "inserted": statuses.count("inserted"),
+        "player_stats": sum(entry.get("player_stats", 0) for entry in report),
+    }
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Persistent FIFO of match-history refreshes, drained by asyncio workers.
+
+    Jobs live in a local SQLite file so a restart picks up where it left off.
+    A refresh for a player who already has a pending job is merged into it.
+    Finished and failed jobs are deleted `retention` seconds after they end.
+    """
+
+    def __init__(self, path: str, retention: float = 86400.0, retry_delay: float = 1.0):
+        self.path = path
+        self.retention = retention
+        self.retry_delay = retry_delay
+        self.pruned_at = 0.0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.workers: list[asyncio.Task] = []
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists jobs (
+                    job_id integer primary key autoincrement,
+                    player_id text not null,
+                    status text not null,
+                    stage text,
+                    created_at real not null,
+                    started_at real,
+                    finished_at real,
+                    result text,
+                    error text
+                )
+                """
+            )
+            self.connection.execute(
+                "create index if not exists idx_jobs_status on jobs (status, job_id)"
+            )
+            # anything left running belonged to a worker that died with the process
+            self.connection.execute(
+                "update jobs set status = 'pending', stage = null where status = 'running'"
+            )
+
+    async def _execute(self, statement: str, parameters=()):
+        async with self.lock:
+            return await asyncio.to_thread(self._execute_sync, statement, parameters)
+
+    def _execute_sync(self, statement, parameters):
+        with self.connection:
+            return self.connection.execute(statement, parameters).fetchall()
+
+    async def enqueue(self, player_id: str) -> int:
+        async with self.lock:
+            job_id = await asyncio.to_thread(self._enqueue_sync, player_id)
+        self.wakeup.set()
+        return job_id
+
+    def _enqueue_sync(self, player_id):
+        with self.connection:
+            row = self.connection.execute(
+                "select job_id from jobs where player_id = ? and status = 'pending'",
+                (player_id,),
+            ).fetchone()
+            if row is None:
+                row = self.connection.execute(
+                    "insert into jobs (player_id, status, created_at) values (?, 'pending', ?) returning job_id",
+                    (player_id, time.time()),
+                ).fetchone()
+        return row["job_id"]
+
+    async def claim(self):
+        rows = await self._execute(
+            """
+            update jobs set status = 'running', started_at = ?
+            where job_id = (select job_id from jobs where status = 'pending' order by job_id limit 1)
+            returning job_id, player_id
+            """,
+            (time.time(),),
+        )
+        return rows[0] if rows else None
+
+    async def progress(self, job_id: int, stage: str):
+        await self._execute(
+            "update jobs set stage = ? where job_id = ?", (stage, job_id)
+        )
+
+    async def finish(self, job_id: int, result):
+        await self._execute(
+            "update jobs set status = 'done', stage = null, finished_at = ?, result = ? where job_id = ?",
+            (time.time(), json.dumps(result), job_id),
+        )
+
+    async def fail(self, job_id: int, error: str):
+        await self._execute(
+            "update jobs set status = 'failed', stage = null, finished_at = ?, error = ? where job_id = ?",
+            (time.time(), error, job_id),
+        )
+
+    async def prune(self):
+        """Delete jobs that ended more than `retention` seconds ago."""
+        self.pruned_at = time.monotonic()
+        await self._execute(
+            "delete from jobs where status in ('done', 'failed') and finished_at < ?",
+            (time.time() - self.retention,),
+        )
+
+    async def get(self, job_id: int):
+        rows = await self._execute("select * from jobs where job_id = ?", (job_id,))
+        if not rows:
+            return None
+        job = dict(rows[0])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def stats(self, window: float = 60.0):
+        rows = await self._execute(
+            """
+            select
+                sum(status = 'pending') as queue_depth,
+                sum(status = 'running') as running,
+                sum(status = 'done') as done,
+                sum(status = 'failed') as failed,
+                sum(status = 'done' and finished_at >= ?) as recent
+            from jobs
+            """,
+            (time.time() - window,),
+        )
+        stats = {key: rows[0][key] or 0 for key in rows[0].keys()}
+        stats["throughput_per_minute"] = stats.pop("recent") * 60 / window
+        stats["workers"] = sum(not worker.done() for worker in self.workers)
+        return stats
+
+    async def _work(self, handler):
+        while True:
+            self.wakeup.clear()
+            try:
+                job = await self.claim()
+                if job is None:
+                    if time.monotonic() - self.pruned_at > 60:
+                        await self.prune()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=5)
+                    except TimeoutError:
+                        pass
+                    continue
+                await self._run(handler, job)
+            except Exception:
+                # e.g. "database is locked": the worker backs off and carries on
+                logger.exception("job worker error, retrying")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _run(self, handler, job):
+        try:
+            result = await handler(
+                job["player_id"],
+                lambda stage, job_id=job["job_id"]: self.progress(job_id, stage),
+            )
+        except Exception as e:
+            await self.fail(job["job_id"], str(e))
+        else:
+            await self.finish(job["job_id"], result)
+
+    def start(self, handler, workers: int):
+        """Spawn `workers` tasks that call `await handler(player_id, progress)`."""
+        self.workers = [
+            asyncio.create_task(self._work(handler)) for _ in range(workers)
+        ]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.connection.close()
@@ -0,0 +1,270 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+import numpy as np
+from background import BackgroundIndex
+from sqlalchemy import bindparam, text
+
+if TYPE_CHECKING:
+    from scipy.spatial import KDTree
+
+PRO_TIER = 21
+
+FEATURES = [
+    "average_combat_score",
+    "deaths",
+    "assists",
+    "kill_assist_trade_survive_ratio",
+    "average_damage_per_round",
+    "headshot_ratio",
+    "first_kills",
+    "first_deaths",
+]
+
+# sum(x) and count(x) per feature, so averages over several groups can be
+# recombined exactly even when some rows have NULLs (ingested games have no KAST)
+SUMS = ", ".join(f"sum({f}) as sum_{f}, count({f}) as n_{f}" for f in FEATURES)
+# the same columns, as stored in Player_Aggregates
+STORED = ", ".join(f"sum_{f}, n_{f}" for f in FEATURES)
+
+
+def averages(rows, axis: int | None = 0):
+    """Per-feature means from grouped rows carrying the SUMS columns.
+
+    axis=0 pools all rows into one vector; axis=None gives one vector per row.
+    """
+    sums = np.array(
+        [[row[f"sum_{f}"] or 0 for f in FEATURES] for row in rows], float
+    ).reshape(-1, len(FEATURES))
+    counts = np.array(
+        [[row[f"n_{f}"] for f in FEATURES] for row in rows], float
+    ).reshape(-1, len(FEATURES))
+    if axis is not None:
+        sums, counts = sums.sum(axis=axis), counts.sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+class AgentIndex:
+    def __init__(self, names: list[str], features: np.ndarray):
+        self.names = names
+        present = ~np.isnan(features)
+        n = np.maximum(present.sum(axis=0), 1)
+        self.mean = np.nansum(features, axis=0) / n
+        std = np.sqrt(np.nansum((features - self.mean) ** 2, axis=0) / n)
+        self.std = np.where(std > 0, std, 1)
+        # scipy is imported on the first build, not at startup
+        from scipy.spatial import KDTree
+
+        self.tree = KDTree(self.standardize(features))
+
+    def standardize(self, features: np.ndarray) -> np.ndarray:
+        # a missing feature sits at the pro mean, so it adds nothing to the distance
+        return np.nan_to_num((features - self.mean) / self.std)
+
+
+class ProIndex(BackgroundIndex):
+    """KD-trees of tier-21 players' stat averages, one per agent.
+
+    Features are z-scored per agent so ACS (hundreds) does not drown out
+    first kills (single digits). Built once, then rebuilt in the background
+    whenever ingest writes new pro rows.
+    """
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.agents: dict[int, AgentIndex] = {}
+
+    async def build(self):
+        query = text(
+            f"select agent_id, player_id, {SUMS} from Player_Stats where tier_id = :tier group by agent_id, player_id"
+        ).bindparams(tier=PRO_TIER)
+        async with self.db.connect() as connection:
+            rows = (await connection.execute(query)).mappings().all()
+        # z-scoring and a tree per agent, off the event loop
+        self.agents = await asyncio.to_thread(self._build_sync, rows)
+
+    @staticmethod
+    def _build_sync(rows) -> dict[int, AgentIndex]:
+        agent_ids = np.array([row["agent_id"] for row in rows])
+        names = [row["player_id"] for row in rows]
+        features = averages(rows, axis=None)
+        agents = {}
+        for agent_id in np.unique(agent_ids):
+            members = np.flatnonzero(agent_ids == agent_id)
+            agents[int(agent_id)] = AgentIndex(
+                [names[i] for i in members], features[members]
+            )
+        return agents
+
+    def on_ingest(self, rows):
+        if any(row["tid"] == PRO_TIER for row in rows):
+            self.schedule_rebuild()
+
+    def query(self, agent_id: int, features: np.ndarray) -> list[str | None]:
+        """Closest pro for each row of `features`, in one vectorized tree query."""
+        index = self.agents.get(agent_id)
+        if index is None:
+            return [None] * len(features)
+        _, nearest = index.tree.query(index.standardize(features), k=1)
+        return [index.names[i] for i in np.atleast_1d(nearest)]
+
+
+class SimilarityIndex(BackgroundIndex):
+    """Every player's stat averages as one standardized float32 matrix plus a KD-tree.
+
+    Each row also carries the player's most-played agent, the tier of their
+    latest game and their game count for filtering. Averages, agent and games
+    come from the Player_Aggregates and Player_Main_Agent rollups, so a
+    rebuild does not re-aggregate Player_Stats. Narrow filters are answered
+    by brute force over the matching rows; wide ones walk the tree with a
+    growing k until enough neighbours pass the filters.
+    """
+
+    BRUTE_FORCE_LIMIT = 50_000
+
+    PROFILES = text(
+        f"select a.player_id, m.agent_id, a.games, {STORED} from Player_Aggregates a join Player_Main_Agent m on m.player_id = a.player_id where a.agent_id = 0 and a.map_id = 0 order by a.player_id"
+    )
+    # both sides read off the (player_id, game_id) index
+    LATEST_TIERS = text(
+        "select p.player_id, p.tier_id from Player_Stats p join (select player_id, max(game_id) as game_id from Player_Stats group by player_id) latest on latest.player_id = p.player_id and latest.game_id = p.game_id"
+    )
+
+    def __init__(self, db, min_interval: float = 60.0):
+        super().__init__(db, min_interval)
+        self.player_ids: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.features = np.empty((0, len(FEATURES)), np.float32)
+        self.agents = np.empty(0, np.int32)
+        self.tiers = np.empty(0, np.int32)
+        self.games = np.empty(0, np.int32)
+        self.tree: "KDTree | None" = None
+
+    async def build(self):
+        async with self.db.connect() as connection:
+            rows = (await connection.execute(self.PROFILES)).mappings().all()
+            tiers = dict((await connection.execute(self.LATEST_TIERS)).all())
+
+        # standardizing and the tree take seconds over the whole population;
+        # requests keep being served from the old arrays meanwhile
+        (
+            self.player_ids,
+            self.positions,
+            self.features,
+            self.agents,
+            self.tiers,
+            self.games,
+            self.tree,
+        ) = await asyncio.to_thread(self._build_sync, rows, tiers)
+
+    @staticmethod
+    def _build_sync(rows, tiers: dict):
+        if not rows:
+            empty = np.empty(0, np.int32)
+            features = np.empty((0, len(FEATURES)), np.float32)
+            return [], {}, features, empty, empty, empty, None
+
+        features = averages(rows, axis=None)
+        present = ~np.isnan(features)
+        total = np.maximum(present.sum(axis=0), 1)
+        mean = np.nansum(features, axis=0) / total
+        std = np.sqrt(np.nansum((features - mean) ** 2, axis=0) / total)
+        features = np.nan_to_num((features - mean) / np.where(std > 0, std, 1))
+        features = features.astype(np.float32)
+
+        player_ids = [row["player_id"] for row in rows]
+        agents = np.array([row["agent_id"] for row in rows], np.int32)
+        player_tiers = np.array(
+            [tiers.get(player_id) or 0 for player_id in player_ids], np.int32
+        )
+        games = np.array([row["games"] for row in rows], np.int32)
+        positions = {player_id: i for i, player_id in enumerate(player_ids)}
+        from scipy.spatial import KDTree
+
+        tree = KDTree(features)
+        return player_ids, positions, features, agents, player_tiers, games, tree
+
+    def on_ingest(self, rows):
+        if rows:
+            self.schedule_rebuild()
+
+    def neighbours(
+        self,
+        player_id: str,
+        k: int = 10,
+        page: int = 0,
+        agent_id: int | None = None,
+        tier: int | None = None,
+        min_games: int = 1,
+    ):
+        """Page `page` of the nearest players passing the filters, or None if unknown."""
+        position = self.positions.get(player_id)
+        if position is None:
+            return None
+        mask = self.games >= min_games
+        if agent_id is not None:
+            mask &= self.agents == agent_id
+        if tier is not None:
+            mask &= self.tiers == tier
+        mask[position] = False
+        candidates = np.flatnonzero(mask)
+        need = min(k * (page + 1), len(candidates))
+        point = self.features[position]
+
+        if need == 0:
+            chosen, distances = candidates[:0], np.empty(0)
+        elif len(candidates) <= self.BRUTE_FORCE_LIMIT:
+            distances = np.linalg.norm(self.features[candidates] - point, axis=1)
+            top = np.argpartition(distances, need - 1)[:need]
+            top = top[np.argsort(distances[top], kind="stable")]
+            chosen, distances = candidates[top], distances[top]
+        else:
+            total = len(self.player_ids)
+            width = need * 2
+            while True:
+                distances, found = self.tree.query(point, k=min(width, total))  # type: ignore
+                keep = mask[found]
+                if keep.sum() >= need or width >= total:
+                    break
+                width *= 4
+            chosen, distances = found[keep][:need], distances[keep][:need]
+
+        return {
+            "total": len(candidates),
+            "results": [
+                {
+                    "player_id": self.player_ids[i],
+                    "distance": round(float(d), 4),
+                    "agent_id": int(self.agents[i]),
+                    "tier": int(self.tiers[i]),
+                    "games": int(self.games[i]),
+                }
+                for i, d in zip(chosen[page * k :], distances[page * k :])
+            ],
+        }
+
+
+async def player_profiles(connection, player_ids: list[str]):
+    """Main agent and overall stat averages for each player, in one query."""
+    query = text(
+        f"select m.player_id, m.agent_id, {STORED} from Player_Main_Agent m join Player_Aggregates a on a.player_id = m.player_id and a.agent_id = 0 and a.map_id = 0 where m.player_id in :player_ids"
+    ).bindparams(bindparam("player_ids", expanding=True))
+    rows = (await connection.execute(query, {"player_ids": player_ids})).mappings()
+    return {row["player_id"]: (row["agent_id"], averages([row])) for row in rows}
+
+
+async def match_pros(index: ProIndex, player_ids: list[str]):
+    await index.ready()
+    async with index.db.connect() as connection:
+        profiles = await player_profiles(connection, player_ids)
+
+    by_agent: dict[int, list[str]] = {}
+    for player_id, (agent_id, _) in profiles.items():
+        by_agent.setdefault(agent_id, []).append(player_id)
+
+    matches: dict[str, str | None] = {player_id: None for player_id in player_ids}
+    for agent_id, players in by_agent.items():
+        features = np.array([profiles[player_id][1] for player_id in players])
+        matches.update(zip(players, index.query(agent_id, features)))
+    return matches
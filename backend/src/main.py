@@ -1,45 +1,92 @@
-import pickle
+import asyncio
 from contextlib import asynccontextmanager
-from datetime import timedelta
-from typing import Annotated, Union
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Literal, Union
 
 import config
 import jwt
-import pandas as pd
-import scipy as sp
-import valo_api
+from aggregates import average, parse_timespan, window_totals
 from auth import (
+    PasswordPool,
+    PasswordPoolBusy,
+    UserCache,
     authenticate_user,
     create_access_token,
     get_user,
 )
 from config import get_settings
 from database import engine
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from models import Map, Token, TokenData, User
+from history import GAMES_QUERY, csv_lines, export_rows, match_page, ndjson_lines
+from homepage import HomepageSnapshot
+from ingest import DimensionCache, bulk_refresh, ingest_matches
+from jobs import JobQueue
+from lookalike import ProIndex, SimilarityIndex, match_pros
+from models import Map, PlayerIdsRequest, ScoreRequest, Token, TokenData, User
+from performance import BreakdownCache
+from registry import ModelRegistry
+from riot_api import HenrikClient
+from scoring import feature_columns, from_stored
 from sqlalchemy import text
+from synergy import SynergyIndex
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def replace_percentage(df, column):
-    df[column] = df[column].str.replace("%", "").astype(float)
-    return df
-
-
-import __main__  # noqa: E402
-
-__main__.replace_percentage = replace_percentage  # type: ignore
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.db = engine
-    app.state.model = pickle.load(open("model.pkl", "rb"))
+    app.state.dimensions = DimensionCache()
+    app.state.pro_index = ProIndex(engine)
+    app.state.pro_index.schedule_rebuild()
+    app.state.similarity_index = SimilarityIndex(engine)
+    app.state.similarity_index.schedule_rebuild()
+    app.state.synergy_index = SynergyIndex(engine)
+    app.state.synergy_index.schedule_rebuild()
+    settings = get_settings()
+    app.state.performance = BreakdownCache(engine, ttl=settings.performance_cache_ttl)
+    app.state.passwords = PasswordPool(
+        settings.password_workers, settings.password_queue
+    )
+    app.state.user_cache = UserCache(
+        settings.user_cache_size,
+        settings.user_cache_ttl,
+        settings.access_token_expire_minutes * 60,
+    )
+    app.state.homepage = HomepageSnapshot(engine)
+    app.state.homepage.schedule_rebuild()
+    app.state.homepage.refresh_every(settings.homepage_refresh_interval)
+    app.state.ingest_listeners = [
+        app.state.pro_index.on_ingest,
+        app.state.similarity_index.on_ingest,
+        app.state.synergy_index.on_ingest,
+        app.state.homepage.on_ingest,
+        app.state.performance.on_ingest,
+    ]
+    app.state.models = ModelRegistry(
+        settings.win_model_registry, settings.win_model_path
+    )
+    await app.state.models.ready()
+    app.state.models.refresh_every(settings.win_model_poll_interval)
+    app.state.henrik = HenrikClient(
+        settings.henrik_api_key.get_secret_value(),  # type: ignore
+        base_url=settings.henrik_base_url,
+        cache_dir=settings.henrik_cache_dir,
+        requests_per_minute=settings.henrik_requests_per_minute,
+        history_ttl=settings.henrik_history_ttl,
+    )
+    app.state.jobs = JobQueue(settings.job_queue_path, settings.job_retention)
+    app.state.jobs.start(refresh_player, settings.job_workers)
     yield
-    engine.dispose()
+    await app.state.jobs.stop()
+    await app.state.homepage.stop()
+    await app.state.models.stop()
+    await app.state.henrik.aclose()
+    app.state.passwords.shutdown()
+    await engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -76,12 +123,42 @@ async def get_current_user(
     except jwt.InvalidTokenError:
         raise credentials_exception
     token_data = TokenData(username=username)
-    user = get_user(request.app.state.db, username=token_data.username)  # type: ignore
+    cache = request.app.state.user_cache
+    iat = payload.get("iat")
+    user = cache.get(username, iat)
+    if (
+        user is None
+        and settings.auth_player_claim
+        and "pid" in payload
+        and cache.trusts(username, iat)
+    ):
+        # signed into the token at login, so no database lookup is needed
+        cache.stats["claims"] += 1
+        return User(
+            user_id=payload["uid"],
+            username=username,
+            player_id=payload["pid"],
+            pro_lookalike=payload.get("plk"),
+        )
     if user is None:
-        raise credentials_exception
+        user = await get_user(request.app.state.db, username=token_data.username)  # type: ignore
+        if user is None:
+            raise credentials_exception
+        cache.put(username, iat, user)
     return user
 
 
+async def get_admin_user(
+    current_user: Annotated[User, Depends(get_current_user)],
+    settings: Annotated[config.Settings, Depends(get_settings)],
+):
+    if current_user.username not in settings.admin_usernames:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return current_user
+
+
 @app.get("/")
 async def read_root():
     return {"Hello": "World"}
@@ -93,64 +170,23 @@ async def read_item(item_id: int, q: Union[str, None] = None):
 
 
 @app.get("/maps")
-def get_maps(request: Request):
+async def get_maps(request: Request):
     query = text("SELECT * FROM Maps")
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
     map_data = result.fetchall()
     maps = [Map(map_id=map_id, name=map_name) for map_id, map_name in map_data]
     return maps
 
 
 @app.get("/homepage-stats")
-def get_homepage_stats(request: Request):
-    agent_query = text(
-        "select agent_name, AVG(kd) as avg_kd from Agent_Stats natural join Agents group by agent_id order by avg_kd desc limit 1"
-    )
-    weapon_query = text(
-        "select weapon_name, count(*) as game_count from Weapon_Stats natural join Weapons group by weapon_id order by game_count desc limit 1"
-    )
-    map_query = text(
-        "select map_name, count(*) as game_count from Map_Stats natural join Maps group by map_id order by game_count desc limit 1"
-    )
-
-    top_agents_query = text(
-        "select agent_name, AVG(win_rate) as avg_win_rate, AVG(pick_rate) as avg_pick_rate, AVG(kd) as avg_kd, AVG(acs) as average_acs, SUM(num_matches) as match_count from Agent_Stats natural join Agents group by agent_id order by avg_win_rate desc limit 5"
-    )
-    with request.app.state.db.connect() as connection:
-        agent_result = connection.execute(agent_query)
-        best_agent = agent_result.fetchone()
-
-        weapon_result = connection.execute(weapon_query)
-        best_weapon = weapon_result.fetchone()
-
-        map_result = connection.execute(map_query)
-        best_map = map_result.fetchone()
-
-        top_agents_result = connection.execute(top_agents_query)
-        top_agents = top_agents_result.fetchall()
-
-        top_agents_formatted = [
-            {
-                "agent_name": agent.agent_name,
-                "avg_win_rate": agent.avg_win_rate,
-                "avg_pick_rate": agent.avg_pick_rate,
-                "avg_kd": agent.avg_kd,
-                "average_acs": agent.average_acs,
-                "match_count": agent.match_count,
-            }
-            for agent in top_agents
-        ]
-
-    return {
-        "best_agent": {"agent_name": best_agent.agent_name, "kd": best_agent.avg_kd},
-        "best_weapon": {
-            "weapon_name": best_weapon.weapon_name,
-            "game_count": best_weapon.game_count,
-        },
-        "best_map": {"map_name": best_map.map_name, "game_count": best_map.game_count},
-        "top_agents": top_agents_formatted,
-    }
+async def get_homepage_stats(
+    request: Request,
+    settings: Annotated[config.Settings, Depends(get_settings)],
+):
+    homepage = request.app.state.homepage
+    await homepage.ready(max_age=settings.homepage_max_staleness)
+    return homepage.snapshot
 
 
 @app.post("/token")
@@ -159,52 +195,95 @@ async def login_for_access_token(
     settings: Annotated[config.Settings, Depends(get_settings)],
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
-    user = authenticate_user(
-        request.app.state.db, form_data.username, form_data.password
-    )
+    try:
+        user = await authenticate_user(
+            request.app.state.db,
+            form_data.username,
+            form_data.password,
+            request.app.state.passwords,
+        )
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    expire_minutes = settings.access_token_expire_minutes
+    claims = {"sub": user.username}
+    if settings.auth_player_claim:
+        claims |= {
+            "uid": user.user_id,
+            "pid": user.player_id,
+            "plk": user.pro_lookalike,
+        }
+        # only the instance that handles a deletion stops trusting these
+        expire_minutes = min(expire_minutes, settings.auth_player_claim_expire_minutes)
+    access_token_expires = timedelta(minutes=expire_minutes)
+    access_token = create_access_token(data=claims, expires_delta=access_token_expires)
     return Token(access_token=access_token, token_type="bearer")
 
 
-@app.get("/users/me", response_model=User)
+# the same fields whether the user came from the database or from token claims
+@app.get("/users/me", response_model=User, response_model_exclude={"password_hash"})
 async def read_users_me(
     current_user: Annotated[User, Depends(get_current_user)],
 ):
     return current_user
 
 
+def stats_summary(row):
+    return {
+        "games": row["games"],
+        "avgKillsPerGame": average(row, "kills"),
+        "avgDeathsPerGame": average(row, "deaths"),
+        "avgAssistsPerGame": average(row, "assists"),
+        "avgCombatScorePerGame": average(row, "average_combat_score"),
+        "avgHeadShotRatio": average(row, "headshot_ratio"),
+        "avgFirstBloodsPerGame": average(row, "first_kills"),
+    }
+
+
 @app.get("/player-stats")
 async def player_stats(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
+    settings: Annotated[config.Settings, Depends(get_settings)],
+    timespan: str = "overall",
 ):
+    """Averages over one or more comma-separated windows.
+
+    A window is overall, season, <n>d (last n days), <n>g (last n games) or
+    3months / 6months / 1year. A single window keeps the flat response shape;
+    several come back keyed by window under "windows".
+    """
     player_id = current_user.player_id
-    query = text(
-        "SELECT AVG(kills) as avgKillsPerGame, AVG(deaths) as avgDeathsPerGame, AVG(assists) as avgAssistsPerGame, AVG(average_combat_score) as avgCombatScorePerGame, AVG(headshot_ratio) as avgHeadShotRatio, AVG(first_kills) as avgFirstBloodsPerGame FROM Player_Stats where player_id=:player_id group by player_id"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    player_stats_data = result.fetchone()
-    if player_stats_data is None:
+    timespans = list(dict.fromkeys(timespan.split(",")))
+    try:
+        for span in timespans:
+            parse_timespan(span)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async with request.app.state.db.connect() as connection:
+        totals = await window_totals(
+            connection,
+            player_id,
+            timespans,
+            datetime.now(timezone.utc).date(),
+            settings.season_start,
+        )
+    windows = {span: stats_summary(row) for span, row in totals.items()}
+    if len(windows) > 1:
+        return {"playerID": player_id, "windows": windows}
+    if not windows[timespans[0]]["games"]:
         return {"playerID": player_id}
-    return {
-        "playerID": player_id,
-        "avgKillsPerGame": player_stats_data.avgKillsPerGame,
-        "avgDeathsPerGame": player_stats_data.avgDeathsPerGame,
-        "avgAssistsPerGame": player_stats_data.avgAssistsPerGame,
-        "avgCombatScorePerGame": player_stats_data.avgCombatScorePerGame,
-        "avgHeadShotRatio": player_stats_data.avgHeadShotRatio,
-        "avgFirstBloodsPerGame": player_stats_data.avgFirstBloodsPerGame,
-    }
+    return {"playerID": player_id, **windows[timespans[0]]}
 
 @app.get("/player-monthly-stats")
 async def player_monthly_stats(
@@ -213,47 +292,50 @@ async def player_monthly_stats(
 ):
     player_id = current_user.player_id
     query = text(
-        """
-            SELECT 
-                DATE_FORMAT(STR_TO_DATE(g.date_info, '%Y-%m-%d %H:%i:%s'), '%Y-%m-01') AS month,
-                AVG(ps.kills) as avgKillsPerGame,
-                AVG(ps.deaths) as avgDeathsPerGame,
-                AVG(ps.assists) as avgAssistsPerGame,
-                AVG(ps.average_combat_score) as avgCombatScorePerGame,
-                AVG(ps.headshot_ratio) as avgHeadShotRatio,
-                AVG(ps.first_kills) as avgFirstBloodsPerGame
-            FROM 
-                Player_Stats ps
-            JOIN 
-                Game g ON ps.game_id = g.game_id
-            WHERE 
-                ps.player_id = :player_id
-            GROUP BY 
-                month
-            ORDER BY 
-                month
-        """
+        "SELECT * FROM Player_Monthly WHERE player_id = :player_id ORDER BY month"
     ).bindparams(player_id=player_id)
 
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
     
-    player_stats_data = result.fetchall()
+    player_stats_data = result.mappings().all()
     
     return [
         {
-            "month": row.month,
-            "avgKillsPerGame": round(row.avgKillsPerGame, 2) if row.avgKillsPerGame is not None else None,
-            "avgDeathsPerGame": round(row.avgDeathsPerGame, 2) if row.avgDeathsPerGame is not None else None,
-            "avgAssistsPerGame": round(row.avgAssistsPerGame, 2) if row.avgAssistsPerGame is not None else None,
-            "avgCombatScorePerGame": round(row.avgCombatScorePerGame, 2) if row.avgCombatScorePerGame is not None else None,
-            "avgHeadShotRatio": round(row.avgHeadShotRatio, 2) if row.avgHeadShotRatio is not None else None,
-            "avgFirstBloodsPerGame": round(row.avgFirstBloodsPerGame, 2) if row.avgFirstBloodsPerGame is not None else None,
+            "month": str(row["month"]),
+            "avgKillsPerGame": average(row, "kills", digits=2),
+            "avgDeathsPerGame": average(row, "deaths", digits=2),
+            "avgAssistsPerGame": average(row, "assists", digits=2),
+            "avgCombatScorePerGame": average(row, "average_combat_score", digits=2),
+            "avgHeadShotRatio": average(row, "headshot_ratio", digits=2),
+            "avgFirstBloodsPerGame": average(row, "first_kills", digits=2),
         }
         for row in player_stats_data
     ]
 
-@app.post("/update_user_data")
+async def ingest(matches):
+    async with app.state.db.begin() as connection:
+        report, rows = await ingest_matches(connection, app.state.dimensions, matches)
+    for listener in app.state.ingest_listeners:
+        listener(rows)
+    return report
+
+
+async def refresh_player(player_id: str, progress):
+    ign_tag = player_id.split("#")
+    playerign = ign_tag[0]
+    playertag = ign_tag[1]
+
+    await progress("fetching")
+    matches = await app.state.henrik.get_match_history(
+        "na", playerign, playertag, game_mode="competitive"
+    )
+
+    await progress("ingesting")
+    return {"matches": await ingest(matches)}
+
+
+@app.post("/update_user_data", status_code=status.HTTP_202_ACCEPTED)
 async def update_user_data(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
@@ -266,107 +348,90 @@ async def update_user_data(
 
     if "#" not in player_id:
         return {"success": False}
-    ign_tag = player_id.split("#")
-    playerign = ign_tag[0]
-    playertag = ign_tag[1]
 
-    settings = get_settings()
-    valo_api.set_api_key(settings.henrik_api_key.get_secret_value())
-    matches = await valo_api.get_match_history_by_name_v3_async(  # type: ignore
-        "na", playerign, playertag, game_mode="competitive"
+    job_id = await request.app.state.jobs.enqueue(player_id)
+    return {"success": True, "job_id": job_id}
+
+
+@app.post("/admin/bulk_refresh")
+async def admin_bulk_refresh(
+    body: PlayerIdsRequest,
+    request: Request,
+    admin: Annotated[User, Depends(get_admin_user)],
+):
+    invalid = [player_id for player_id in body.player_ids if "#" not in player_id]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Expected name#tag: {invalid}")
+    return await bulk_refresh(
+        request.app.state.henrik, ingest, list(dict.fromkeys(body.player_ids))
     )
-    
-    with request.app.state.db.connect() as connection:
-        for match in matches:
-            metadata = match.metadata
-            #print(match.metadata)
-            query = text("select game_id from Game where riot_id =:id").bindparams(
-                id=metadata.matchid
-            )  
-            if connection.execute(query).first() == None and metadata.mode == "Competitive":
-                query = text("select map_id from Maps where map_name = :map").bindparams(
-                    map=metadata.map
-                )
-                #print(metadata.map)
-                mapp = connection.execute(query).first()[0]
 
-                stmst = text(
-                    "insert into Game(map_id, date_info, riot_id) values(:map, :game_start, :matchid)"
-                ).bindparams(map=mapp, game_start=metadata.game_start, matchid=metadata.matchid)
-                connection.execute(stmst)
-                connection.commit()
 
-                winteam = "Blue"
-                if match.teams.red.has_won:
-                    winteam = "Red"
+@app.get("/jobs/stats")
+async def job_stats(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    return await request.app.state.jobs.stats()
+
+
+@app.get("/admin/user_cache")
+async def user_cache_stats(
+    request: Request,
+    admin: Annotated[User, Depends(get_admin_user)],
+):
+    cache = request.app.state.user_cache
+    return {**cache.stats, "size": len(cache.entries), "max_size": cache.max_size}
+
+
+@app.get("/admin/models")
+async def list_models(
+    request: Request,
+    admin: Annotated[User, Depends(get_admin_user)],
+):
+    return request.app.state.models.versions()
+
+
+@app.post("/admin/models/{version}/activate")
+async def activate_model(
+    version: str,
+    request: Request,
+    admin: Annotated[User, Depends(get_admin_user)],
+):
+    """Serve `version` now, and make it the active one for every instance."""
+    models = request.app.state.models
+    try:
+        await models.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version {version}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return models.versions()
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(
+    job_id: int,
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    job = await request.app.state.jobs.get(job_id)
+    if job is None or job["player_id"] != current_user.player_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-                query = text("select game_id from Game where riot_id =:id").bindparams(
-                id=metadata.matchid
-                )
-                game_id = connection.execute(query).first()[0]
-               
-                query = text("select game_id from Game where riot_id =:id").bindparams(
-                    id=metadata.matchid
-                )  
-                result = connection.execute(query)
-                game_id = result.first()[0]
-                
-                query = text(
-                "select game_id, player_id from Player_Stats where game_id = :game_id"
-                ).bindparams(game_id=game_id)
-                beforeupdate = list(connection.execute(query))
-
-                matchrounds = metadata.rounds_played
-                player_data = match.players.all_players
-                for player in player_data:
-                    player_id = f"{player.name}#{player.tag}"
-                    didwin = False
-                    if player.team == winteam:
-                        didwin = True
-                    shots = (
-                        player.stats.bodyshots
-                        + player.stats.headshots
-                        + player.stats.legshots
-                    )
-                    query = text(
-                        "select agent_id from Agents where agent_name = :agent"
-                    ).bindparams(agent=player.character)
-                    agent = connection.execute(query).first()[0]
-                    stmst = text(
-                        "insert into Player_Stats (game_id, player_id,agent_id, average_combat_score,kills,deaths,assists,average_damage_per_round,headshot_ratio, tier_id) values(:gid, :pid, :aid, :acs, :k, :d,:a,:adr,:hr,:tid)"
-                    ).bindparams(
-                        gid=game_id,
-                        pid=player_id,
-                        aid=agent,
-                        acs=player.stats.score / matchrounds,
-                        k=player.stats.kills,
-                        d=player.stats.deaths,
-                        a=player.stats.assists,
-                        adr=player.damage_made / matchrounds,
-                        hr=player.stats.headshots / shots,
-                        tid=player.currenttier,
-                    )
-                    connection.execute(stmst)
-                    connection.commit()
-                query = text("select game_id, player_id from Player_Stats where game_id = :game_id").bindparams(game_id=game_id)
-                after = list(connection.execute(query))
-                print("-------------before-------------")
-                print(beforeupdate)
-                print("-------------after-------------")
-                print(after)
-    return {"ok"}
 
 @app.get("/most_played_agent")
-def most_played_agent(
+async def most_played_agent(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
 ):
     player_id = current_user.player_id
     query = text(
-        "select agent_name as agent from Player_Stats p left join Agents a on p.agent_id = a.agent_id where player_id=:player_id group by p.agent_id order by count(p.agent_id) desc limit 1"
+        "select agent_name as agent from Player_Main_Agent p left join Agents a on p.agent_id = a.agent_id where player_id=:player_id"
     ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
     most_played_user = result.fetchone()
     if not most_played_user:
         return {"most_played_agent": None}
@@ -377,162 +442,279 @@ def most_played_agent(
 
 
 @app.get("/most_played_map")
-def most_played_map(
+async def most_played_map(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
 ):
     player_id = current_user.player_id
     query = text(
-        "SELECT map_name as map FROM Player_Stats p JOIN Game g ON p.game_id = g.game_id JOIN Maps m ON g.map_id = m.map_id WHERE player_id=:player_id GROUP BY m.map_id ORDER BY COUNT(m.map_id) DESC LIMIT 1"
+        "SELECT map_name as map FROM Player_Aggregates p JOIN Maps m ON p.map_id = m.map_id WHERE player_id=:player_id AND p.agent_id = 0 ORDER BY games DESC LIMIT 1"
     ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
     most_played_map = result.fetchone()
+    if not most_played_map:
+        return {"most_played_map": None}
     map_name = most_played_map.map
     return {"most_played_map": f"{map_name}"}
 
 
 @app.get("/pro_lookalike")
-def get_pro_lookalike(
+async def get_pro_lookalike(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
 ):
     player_id = current_user.player_id
 
-    query = text(
-        "select agent_id as agent from Player_Stats where player_id=:player_id group by agent_id order by count(agent_id) desc limit 1"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    most_played_user = result.fetchone()
-    agent = most_played_user.agent
-    pro_query = text(
-        "SELECT player_id, avg(average_combat_score), avg(deaths),avg(assists) ,avg(kill_assist_trade_survive_ratio),avg(average_damage_per_round),avg(headshot_ratio),avg(first_kills),avg(first_deaths) FROM Player_Stats where agent_id=:agent and tier_id = 21 group by player_id  order by count(agent_id) desc limit 100"
-    ).bindparams(agent=agent)
-    with request.app.state.db.connect() as connection:
-        pros = list(connection.execute(pro_query))
-    pro_tree = sp.spatial.KDTree([x[1:] for x in pros])
-    query = text(
-        "SELECT avg(average_combat_score), avg(deaths),avg(assists) ,avg(kill_assist_trade_survive_ratio),avg(average_damage_per_round),avg(headshot_ratio),avg(first_kills),avg(first_deaths) FROM Player_Stats where player_id=:player_id group by player_id"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        user_stats = list(connection.execute(query))
-    _, best_match = pro_tree.query(user_stats, k=1)
-    return {"best_match": f"{pros[best_match[0]][0]}"}
+    matches = await match_pros(request.app.state.pro_index, [player_id])
+    return {"best_match": f"{matches[player_id]}"}
+
+
+@app.post("/admin/pro_lookalike")
+async def admin_pro_lookalike(
+    body: PlayerIdsRequest,
+    request: Request,
+    admin: Annotated[User, Depends(get_admin_user)],
+):
+    return await match_pros(request.app.state.pro_index, body.player_ids)
+
+
+@app.get("/similar_players")
+async def similar_players(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    k: Annotated[int, Query(ge=1, le=100)] = 10,
+    page: Annotated[int, Query(ge=0)] = 0,
+    agent: str | None = None,
+    tier: int | None = None,
+    min_games: Annotated[int, Query(ge=1)] = 1,
+):
+    index = request.app.state.similarity_index
+    dimensions = request.app.state.dimensions
+    agent_id = None
+    if agent is not None:
+        async with request.app.state.db.connect() as connection:
+            await dimensions.resolve(connection, [], [agent])
+        agent_id = dimensions.agents.get(agent)
+        if agent_id is None:
+            raise HTTPException(status_code=404, detail=f"Unknown agent {agent}")
+
+    await index.ready()
+    found = index.neighbours(current_user.player_id, k, page, agent_id, tier, min_games)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No games recorded for player")
+
+    agent_names = {agent_id: name for name, agent_id in dimensions.agents.items()}
+    for neighbour in found["results"]:
+        neighbour["agent"] = agent_names.get(neighbour.pop("agent_id"))
+    return {"page": page, "k": k, **found}
 
 
 @app.get("/agent_synergies")
-def agent_synergies(
+async def agent_synergies(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
+    agent_name: str | None = None,
+    tier: int | None = None,
+    limit: int = Query(default=15, ge=1, le=50),
 ):
-    player_id = current_user.player_id
-    agent_query = text(
-        "select agent_id as agent from Player_Stats p where player_id=:player_id group by p.agent_id order by count(p.agent_id) desc limit 1"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(agent_query)
-    most_played_user = result.fetchone()
-    agent = most_played_user.agent
+    """Agents most often in the same game as `agent_name` at `tier`, with win rates.
 
-    query = text(
-        "SELECT agent_name AS synergies FROM Player_Stats p JOIN Player ON p.player_id = Player.player_id LEFT JOIN Agents a ON p.agent_id = a.agent_id WHERE game_id IN (SELECT game_id FROM Player_Stats p WHERE agent_id=:agent) AND p.tier_id = Player.current_tier_id GROUP BY agent_name ORDER BY COUNT(agent_name) DESC LIMIT 15"
-    ).bindparams(agent=agent)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    agent_synergies = result.fetchall()
+    Defaults to the player's most-played agent and current tier.
+    """
+    player_id = current_user.player_id
+    dimensions = request.app.state.dimensions
+    async with request.app.state.db.connect() as connection:
+        if agent_name is None:
+            query = text(
+                "select agent_id from Player_Main_Agent where player_id=:player_id"
+            ).bindparams(player_id=player_id)
+            agent_id = (await connection.execute(query)).scalar()
+        else:
+            await dimensions.resolve(connection, [], [agent_name])
+            agent_id = dimensions.agents.get(agent_name)
+            if agent_id is None:
+                raise HTTPException(
+                    status_code=404, detail=f"Unknown agent {agent_name}"
+                )
+        if tier is None:
+            query = text(
+                "select current_tier_id from Player where player_id=:player_id"
+            ).bindparams(player_id=player_id)
+            tier = (await connection.execute(query)).scalar() or 0
+    if agent_id is None:
+        return {"agent_synergies": None}
 
-    return {"agent_synergies": f"{agent_synergies}"}
+    synergy_index = request.app.state.synergy_index
+    await synergy_index.ready()
+    return {"agent_synergies": synergy_index.synergies(agent_id, tier, limit)}
 
 
 @app.get("/player_most_played_agent")
-def player_most_played_agent(
+async def player_most_played_agent(
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
 ):
     player_id = current_user.player_id
-    agent_query = text(
-        "select agent_id as agent from Player_Stats p where player_id=:player_id group by p.agent_id order by count(p.agent_id) desc limit 1"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(agent_query)
-    most_played_user = result.fetchone()
-    agent = most_played_user.agent
-
+    # players who share this player's main agent, most games on it first
     query = text(
-        "SELECT DISTINCT p1.player_id FROM Player_Stats p1 WHERE :agent=(SELECT agent_id AS games_played FROM Player_Stats p2 WHERE p2.player_id = p1.player_id GROUP BY agent_id ORDER BY COUNT(agent_id) DESC LIMIT 1) GROUP BY p1.player_id ORDER BY COUNT(p1.agent_id) DESC LIMIT 15"
-    ).bindparams(agent=agent)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
+        "SELECT p.player_id FROM Player_Main_Agent p JOIN Player_Main_Agent me ON p.agent_id = me.agent_id WHERE me.player_id = :player_id ORDER BY p.games DESC LIMIT 15"
+    ).bindparams(player_id=player_id)
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
     player = result.fetchall()
 
     return {"player_most_played_agent": f"{[row for row in player]}"}
 
 
+def win_rate(row):
+    """Win percentage from the cube's won sums, else the row's Agent_Stats win_rate.
+
+    Player_Stats.won is only recorded for games ingested since migration 004;
+    older games count as picks but their win rate is the stored one.
+    """
+    rate = average(row, "won")
+    if rate is None:
+        return row["stored_win_rate"]
+    return round(rate * 100, 2)
+
+
 @app.get("/agent_recommendations")
-def agent_recommendations(
+async def agent_recommendations(
     map_name: str,
     tier_id: int,
     request: Request,
 ):
+    # the five most-picked agents on the map, by their win rate at this tier
     query = text(
-        "SELECT z.agent_name, z.win_rate FROM"
-        " (SELECT p.agent_id FROM Player_Stats p JOIN Game g ON p.game_id = g.game_id JOIN Maps m ON m.map_id = g.map_id WHERE m.map_name = :map_name GROUP BY agent_id ORDER BY COUNT(agent_id) DESC LIMIT 5)"
-        " AS y LEFT JOIN"
-        " (SELECT a.win_rate, a.agent_id, ag.agent_name FROM Agent_Stats a JOIN Maps m ON m.map_id = a.map_id left join Agents ag on ag.agent_id = a.agent_id WHERE m.map_name = :map_name AND a.tier_id = :tier_id)"
-        " AS z ON y.agent_id = z.agent_id JOIN Agents a ON a.agent_id = y.agent_id ORDER BY z.win_rate DESC"
+        "SELECT a.agent_name, SUM(c.games) AS picks,"
+        " SUM(CASE WHEN c.tier_id = :tier_id THEN c.sum_won END) AS sum_won,"
+        " SUM(CASE WHEN c.tier_id = :tier_id THEN c.n_won END) AS n_won,"
+        " (SELECT s.win_rate FROM Agent_Stats s WHERE s.agent_id = c.agent_id AND s.map_id = c.map_id AND s.tier_id = :tier_id) AS stored_win_rate"
+        " FROM Map_Agent_Tier c JOIN Maps m ON m.map_id = c.map_id JOIN Agents a ON a.agent_id = c.agent_id"
+        " WHERE m.map_name = :map_name GROUP BY c.map_id, c.agent_id, a.agent_name ORDER BY picks DESC LIMIT 5"
     ).bindparams(map_name=map_name, tier_id=tier_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    recommendations = result.fetchall()
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
+    recommendations = sorted(
+        ((row["agent_name"], win_rate(row)) for row in result.mappings()),
+        key=lambda agent: (agent[1] is None, -(agent[1] or 0)),
+    )
 
     return {"agent_recommendations": f"{recommendations}"}
 
 
 @app.get("/top_agent_map")
-def top_agent_map(
+async def top_agent_map(
     request: Request,
+    min_games: int = 1,
 ):
-    query = text("""
-        SELECT m.map_name, a.agent_name, astats.acs AS MaxACS
-        FROM Agent_Stats astats JOIN Agents a ON astats.agent_id = a.agent_id JOIN Map_Stats mstats ON astats.map_id = mstats.map_id AND astats.tier_id = mstats.tier_id JOIN Maps m ON mstats.map_id = m.map_id
-         WHERE (astats.map_id, astats.acs) IN (
-            SELECT map_id, MAX(acs) FROM Agent_Stats GROUP BY map_id
-        )
-         ORDER BY m.map_name, MaxACS DESC
-    """)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    top_agent_map = result.fetchall()
-
-    results = {
-        map_name: [
-            {"agent_name": agent_name, "max_acs": max_acs}
-            for _, agent_name, max_acs in top_agent_map
-        ]
-        for map_name in set([map_name for map_name, _, _ in top_agent_map])
-    }
+    # ACS over every game in Player_Stats, through the cube; Agent_Stats.acs
+    # is a one-off load and does not move as games are ingested
+    query = text(
+        "SELECT m.map_name, a.agent_name, SUM(c.sum_average_combat_score) / SUM(c.n_average_combat_score) AS acs"
+        " FROM Map_Agent_Tier c JOIN Maps m ON m.map_id = c.map_id JOIN Agents a ON a.agent_id = c.agent_id"
+        " GROUP BY c.map_id, c.agent_id, m.map_name, a.agent_name"
+        " HAVING SUM(c.games) >= :min_games AND SUM(c.n_average_combat_score) > 0"
+    ).bindparams(min_games=min_games)
+    async with request.app.state.db.connect() as connection:
+        result = await connection.execute(query)
+
+    # highest-ACS agent(s) per map, in one pass
+    results: dict[str, list] = {}
+    best: dict[str, float] = {}
+    for map_name, agent_name, acs in result:
+        if map_name not in best or acs > best[map_name]:
+            best[map_name] = acs
+            results[map_name] = []
+        if acs == best[map_name]:
+            results[map_name].append({"agent_name": agent_name, "max_acs": acs})
 
     return results
 
 
+@app.get("/maps/{map_name}/cube")
+async def map_cube(
+    map_name: str,
+    request: Request,
+):
+    """Picks, win rate (%) and ACS of every agent at every tier on one map."""
+    dimensions = request.app.state.dimensions
+    async with request.app.state.db.connect() as connection:
+        await dimensions.resolve(connection, [map_name], [])
+        map_id = dimensions.maps.get(map_name)
+        if map_id is None:
+            raise HTTPException(status_code=404, detail=f"Unknown map {map_name}")
+        query = text(
+            "SELECT a.agent_name, s.win_rate AS stored_win_rate, c.* FROM Map_Agent_Tier c JOIN Agents a ON a.agent_id = c.agent_id"
+            " LEFT JOIN Agent_Stats s ON s.agent_id = c.agent_id AND s.map_id = c.map_id AND s.tier_id = c.tier_id"
+            " WHERE c.map_id = :map_id ORDER BY a.agent_name, c.tier_id"
+        ).bindparams(map_id=map_id)
+        result = await connection.execute(query)
+
+    return {
+        "map_name": map_name,
+        "cells": [
+            {
+                "agent_name": row["agent_name"],
+                "tier_id": row["tier_id"],
+                "picks": row["games"],
+                "win_rate": win_rate(row),
+                "acs": average(row, "average_combat_score"),
+            }
+            for row in result.mappings()
+        ],
+    }
+
+
 @app.get("/analyze_performance")
-def analyze_performance(
+async def analyze_performance(
     map_name: str,
     request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
 ):
     player_id = current_user.player_id
 
-    call_procedure = text("CALL AnalyzePlayerPerformance(:player_id, :map_name)")
+    # what the AnalyzePlayerPerformance procedure below computed, for one map
+    breakdown = await request.app.state.performance.get(player_id)
+    overall = breakdown["overall"]
+    on_map = breakdown["maps"].get(map_name) or dict.fromkeys(overall, 0)
+    map_acs, map_kills, map_deaths, map_assists = (
+        on_map[stat] for stat in ("acs", "kills", "deaths", "assists")
+    )
+    acs, kills, deaths, assists = (
+        overall[stat] for stat in ("acs", "kills", "deaths", "assists")
+    )
+    map_matches, matches = on_map["matches"], overall["matches"]
+    analysis = (
+        player_id,
+        map_name,
+        map_acs,
+        map_kills,
+        map_deaths,
+        map_assists,
+        map_matches,
+        acs,
+        kills,
+        deaths,
+        assists,
+        matches,
+        "↑" if map_acs > acs else "↓",
+        "↑" if map_kills > kills else "↓",
+        "↑" if map_deaths < deaths else "↓",
+        "↑" if map_assists > assists else "↓",
+    )
 
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(
-            call_procedure, {"player_id": player_id, "map_name": map_name}
-        )
-    analysis = result.fetchall()
+    return {"kowalski_analysis": f"{[analysis]}"}
 
-    return {"kowalski_analysis": f"{analysis}"}
+
+@app.get("/performance_breakdown")
+async def performance_breakdown(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """Per-game ACS/K/D/A overall and on every map, with up/down trends per map."""
+    return await request.app.state.performance.get(current_user.player_id)
 
 
 @app.post("/delete_user")
@@ -544,15 +726,14 @@ async def delete_user(
     username = current_user.username
 
     try:
-        with request.app.state.db.connect() as connection:
-            print("test")
-            result = connection.execute(text("DELETE FROM User WHERE username = :uname").bindparams(uname=username))
-            connection.commit()
-            print(result.rowcount)
+        async with request.app.state.db.connect() as connection:
+            result = await connection.execute(text("DELETE FROM User WHERE username = :uname").bindparams(uname=username))
+            await connection.commit()
             if result.rowcount == 0:
                 raise HTTPException(status_code=404, detail="User not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    request.app.state.user_cache.invalidate(username)
     
     return {"status": "success", "message": "User deleted successfully"}
 
@@ -560,28 +741,37 @@ async def delete_user(
 @app.get("/matches")
 async def matches(
     request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 5,
+    order: Literal["asc", "desc"] = "asc",
 ):
-    player_id = current_user.player_id
-    query = text(
-        "SELECT * from Player_Stats natural join Game natural join Maps natural join Agents where player_id=:player_id  order by game_id limit 5"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    match_data = result.fetchall()
+    """A page of the player's games after the `after` game id.
+
+    The next page's cursor is in the X-Next-Cursor header, absent on the
+    last page.
+    """
+    async with request.app.state.db.connect() as connection:
+        match_data, cursor = await match_page(
+            connection, current_user.player_id, after, limit, order == "desc"
+        )
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = str(cursor)
 
     matches = [
         {
-            "date_info": match.date_info,
-            "agent_name": match.agent_name,
-            "map_name": match.map_name,
-            "kills": match.kills,
-            "deaths": match.deaths,
-            "assists": match.assists,
-            "average_combat_score": match.average_combat_score,
-            "headshot_ratio": match.headshot_ratio,
-            "first_kills": match.first_kills,
-            "first_deaths": match.first_deaths,
+            "game_id": match["game_id"],
+            "date_info": match["date_info"],
+            "agent_name": match["agent_name"],
+            "map_name": match["map_name"],
+            "kills": match["kills"],
+            "deaths": match["deaths"],
+            "assists": match["assists"],
+            "average_combat_score": match["average_combat_score"],
+            "headshot_ratio": match["headshot_ratio"],
+            "first_kills": match["first_kills"],
+            "first_deaths": match["first_deaths"],
         }
         for match in match_data
     ]
@@ -589,43 +779,135 @@ async def matches(
     return matches
 
 
+@app.get("/matches/export")
+async def export_matches(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: Literal["ndjson", "csv"] = "ndjson",
+):
+    """The player's whole history, streamed as NDJSON or CSV."""
+    batches = export_rows(request.app.state.db, current_user.player_id)
+    if format == "csv":
+        return StreamingResponse(
+            csv_lines(batches),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="matches.csv"'},
+        )
+    return StreamingResponse(ndjson_lines(batches), media_type="application/x-ndjson")
+
+
+DASHBOARD_SECTIONS = [
+    "user",
+    "player_stats",
+    "most_played_agent",
+    "most_played_map",
+    "pro_lookalike",
+    "matches",
+]
+
+
+@app.get("/dashboard")
+async def dashboard(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    settings: Annotated[config.Settings, Depends(get_settings)],
+    fields: str | None = None,
+    timespan: str = "overall",
+):
+    """Several of the player's pages' sections in one response, authenticated once.
+
+    `fields` picks sections (comma-separated, default all). Each section is
+    what the endpoint of the same name returns (`user` is /users/me without
+    the password hash, `player_stats` takes `timespan`); they run
+    concurrently, each on its own pooled connection.
+    """
+    wanted = DASHBOARD_SECTIONS if fields is None else fields.split(",")
+    unknown = set(wanted) - set(DASHBOARD_SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+
+    async def user():
+        return current_user.model_dump(exclude={"password_hash"})
+
+    sections = {
+        "user": user,
+        "player_stats": lambda: player_stats(request, current_user, settings, timespan),
+        "most_played_agent": lambda: most_played_agent(request, current_user),
+        "most_played_map": lambda: most_played_map(request, current_user),
+        "pro_lookalike": lambda: get_pro_lookalike(request, current_user),
+        "matches": lambda: matches(request, Response(), current_user),
+    }
+    names = list(dict.fromkeys(wanted))
+    results = await asyncio.gather(*(sections[name]() for name in names))
+    return dict(zip(names, results))
+
+
 @app.get("/model_matches")
 async def model_matches(
     request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 5,
+    order: Literal["asc", "desc"] = "asc",
 ):
-    player_id = current_user.player_id
-    query = text(
-        "SELECT * from Player_Stats natural join Game natural join Maps natural join Agents where player_id=:player_id  order by game_id limit 5"
-    ).bindparams(player_id=player_id)
-    with request.app.state.db.connect() as connection:
-        result = connection.execute(query)
-    match_data = result.fetchall()
+    """Win probability per game for the same page /matches returns."""
+    async with request.app.state.db.connect() as connection:
+        match_data, cursor = await match_page(
+            connection, current_user.player_id, after, limit, order == "desc"
+        )
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = str(cursor)
+    if not match_data:
+        return []
 
-    matches = [
-        {
-            "side": match.team_side,
-            "kill_assist_trade_survive_ratio": str(
-                match.kill_assist_trade_survive_ratio
-            ),
-            "tier": match.tier_id,
-            "kills_deaths": match.kills - match.deaths,
-            "agent": match.agent_id,
-            "average_damage_per_round": match.average_damage_per_round,
-            "kills": match.kills,
-            "deaths": match.deaths,
-            "assists": match.assists,
-            "average_combat_score": match.average_combat_score,
-            "headshot_ratio": str(match.headshot_ratio),
-            "first_kills": match.first_kills,
-            "first_deaths": match.first_deaths,
-        }
-        for match in match_data
-    ]
+    model = request.app.state.models.model
+    rows = [from_stored(match) for match in match_data]
+    probabilities, _ = model.predict(feature_columns(rows, model))
+    response.headers["X-Model-Version"] = model.version
+    return probabilities.tolist()
 
-    X = pd.DataFrame(matches)
-    predictions = request.app.state.model.predict_proba(X)
-    return [prediction[1] for prediction in predictions]
+
+@app.post("/score_matches")
+async def score_matches(
+    body: ScoreRequest,
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """Win probabilities for `matches`, then for the player's lines in `game_ids`.
+
+    All of them are scored in one vectorized call. `contributions` lists
+    each feature's term in the row's logit, in the order of `features`;
+    with `intercept` they add up to the logit. `model_version` is the
+    registry version that scored them.
+    """
+    rows = [line.model_dump() for line in body.matches]
+    game_ids = [None] * len(rows)
+    if body.game_ids:
+        async with request.app.state.db.connect() as connection:
+            result = await connection.execute(
+                GAMES_QUERY,
+                {"player_id": current_user.player_id, "game_ids": body.game_ids},
+            )
+        for match in result.mappings():
+            rows.append(from_stored(match))
+            game_ids.append(match["game_id"])
+
+    model = request.app.state.models.model
+    probabilities, contributions = model.predict(feature_columns(rows, model))
+    return {
+        "model_version": model.version,
+        "features": model.features,
+        "intercept": model.intercept,
+        "scores": [
+            {"game_id": game_id, "win_probability": p, "contributions": terms}
+            for game_id, p, terms in zip(
+                game_ids, probabilities.tolist(), contributions.tolist()
+            )
+        ],
+    }
 
 
 # stored_procedure = """
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Map(BaseModel):
@@ -11,7 +11,8 @@ class User(BaseModel):
     username: str
     player_id: str | None
     pro_lookalike: str | None
-    password_hash: str
+    # None when the user comes from token claims rather than the database
+    password_hash: str | None = None
 
 
 class Token(BaseModel):
@@ -21,3 +22,28 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+
+
+class PlayerIdsRequest(BaseModel):
+    player_ids: list[str]
+
+
+class StatLine(BaseModel):
+    agent: str | None = None
+    side: str | None = None
+    tier: int | None = None
+    kills: int | None = None
+    deaths: int | None = None
+    assists: int | None = None
+    kills_deaths: int | None = None
+    average_damage_per_round: float | None = None
+    first_kills: int | None = None
+    first_deaths: int | None = None
+    kill_assist_trade_survive_ratio: float | None = None
+    headshot_ratio: float | None = None
+
+
+class ScoreRequest(BaseModel):
+    matches: list[StatLine] = Field(default=[], max_length=1000)
+    # the current player's lines in these games
+    game_ids: list[int] = Field(default=[], max_length=1000)
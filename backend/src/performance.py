@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+# response key -> Player_Aggregates column
+STATS = {
+    "acs": "average_combat_score",
+    "kills": "kills",
+    "deaths": "deaths",
+    "assists": "assists",
+}
+
+BREAKDOWN_QUERY = text(
+    f"select p.map_id, m.map_name, p.games, {', '.join(f'p.sum_{c}' for c in STATS.values())}"
+    " from Player_Aggregates p left join Maps m on m.map_id = p.map_id"
+    " where p.player_id = :player_id and p.agent_id = 0"
+)
+
+
+def trend(stat: str, on_map: float, overall: float) -> str:
+    # fewer deaths is the improvement
+    better = on_map < overall if stat == "deaths" else on_map > overall
+    return "↑" if better else "↓"
+
+
+async def map_breakdown(connection, player_id: str):
+    """Per-game ACS/K/D/A overall and on every map played, in one query.
+
+    Each map carries "↑"/"↓" per stat against the overall numbers, as the
+    AnalyzePlayerPerformance procedure did for a single map.
+    """
+    result = await connection.execute(BREAKDOWN_QUERY, {"player_id": player_id})
+    rows = {row.map_id: row for row in result}
+
+    def ratios(row):
+        if row is None or not row.games:
+            return {"matches": 0} | dict.fromkeys(STATS, 0)
+        sums = row[3:]
+        return {"matches": row.games} | {
+            stat: value / row.games for stat, value in zip(STATS, sums)
+        }
+
+    overall = ratios(rows.pop(0, None))
+    maps = {}
+    for row in sorted(rows.values(), key=lambda row: -row.games):
+        on_map = ratios(row)
+        on_map["trend"] = {
+            stat: trend(stat, on_map[stat], overall[stat]) for stat in STATS
+        }
+        maps[row.map_name] = on_map
+    return {"player_id": player_id, "overall": overall, "maps": maps}
+
+
+class BreakdownCache:
+    """map_breakdown results per player, kept until that player's next ingest.
+
+    Ingest only reaches the cache of the process that ran it, so entries
+    also expire after `ttl` seconds, which bounds how long other instances
+    serve a breakdown from before someone else's ingest. Least recently
+    used players are dropped beyond `max_players`.
+    """
+
+    def __init__(self, db, max_players: int = 10_000, ttl: float = 60.0):
+        self.db = db
+        self.max_players = max_players
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def get(self, player_id: str):
+        cached = self.entries.get(player_id)
+        if cached is not None and cached[0] > time.monotonic():
+            self.entries.move_to_end(player_id)
+            self.stats["hits"] += 1
+            return cached[1]
+        self.stats["misses"] += 1
+        generation = self.generation
+        async with self.db.connect() as connection:
+            entry = await map_breakdown(connection, player_id)
+        # an ingest that finished meanwhile may have made this stale already
+        if generation == self.generation:
+            self.entries[player_id] = (time.monotonic() + self.ttl, entry)
+            self.entries.move_to_end(player_id)
+            if len(self.entries) > self.max_players:
+                self.entries.popitem(last=False)
+        return entry
+
+    def on_ingest(self, rows):
+        if rows:
+            self.generation += 1
+        for player_id in {row["pid"] for row in rows}:
+            self.entries.pop(player_id, None)
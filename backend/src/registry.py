@@ -0,0 +1,160 @@
+"""Versioned win models, swapped in without a restart.
+
+A registry directory holds compiled artifacts (see scoring.py) and a
+manifest naming each version, its checksum and the active one:
+
+    models/registry.json   {"active": "v2", "versions": {"v1": {...}, "v2": {...}}}
+    models/v1.json
+    models/v2.json
+
+The API polls the manifest and loads a newly activated version off the
+request path. With no active version it serves the built-in model.json.
+
+    rye run python src/registry.py publish model.json --version v2
+    rye run python src/registry.py list
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+from background import BackgroundIndex
+from scoring import WinModel
+
+MANIFEST = "registry.json"
+# the model.json shipped with the image
+BUILTIN = "builtin"
+
+
+def sha256(path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def read_manifest(directory: Path) -> dict:
+    try:
+        with open(directory / MANIFEST) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"active": None, "versions": {}}
+
+
+def write_manifest(directory: Path, manifest: dict):
+    # readers see the old manifest or the new one, never half of it
+    temporary = directory / f".{MANIFEST}.{os.getpid()}"
+    with open(temporary, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temporary, directory / MANIFEST)
+
+
+def publish(directory: Path, artifact, version: str | None = None, activate=True):
+    """Copy a compiled artifact into the registry as `version` and return the version."""
+    WinModel.load(artifact)  # refuse anything the API could not load
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    manifest = read_manifest(directory)
+    if version == BUILTIN or version in manifest["versions"]:
+        raise ValueError(f"version {version} already exists")
+    directory.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(artifact, directory / f".{version}.json")
+    os.replace(directory / f".{version}.json", directory / f"{version}.json")
+    manifest["versions"][version] = {
+        "sha256": sha256(directory / f"{version}.json"),
+        "published_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if activate:
+        manifest["active"] = version
+    write_manifest(directory, manifest)
+    return version
+
+
+class ModelRegistry(BackgroundIndex):
+    """The win model being served, reloaded when the registry's active version changes.
+
+    `model` is replaced in one assignment once the new version has loaded
+    and matched its checksum, so a request that read it keeps one version
+    throughout. A version that fails to load leaves the current one serving
+    and is reported in `error`.
+    """
+
+    def __init__(self, directory, builtin_path):
+        super().__init__(None)
+        self.directory = Path(directory)
+        self.builtin_path = builtin_path
+        self.model = WinModel.load(builtin_path, BUILTIN)
+        self.error: str | None = None
+        # a poll and an activation must not swap in each other's stale choice
+        self.swap_lock = asyncio.Lock()
+
+    def load(self, version: str, manifest: dict) -> WinModel:
+        if version == BUILTIN:
+            return WinModel.load(self.builtin_path, BUILTIN)
+        path = self.directory / f"{version}.json"
+        if sha256(path) != manifest["versions"][version]["sha256"]:
+            raise ValueError(f"{path} does not match its checksum")
+        return WinModel.load(path, version)
+
+    async def build(self):
+        async with self.swap_lock:
+            try:
+                manifest = await asyncio.to_thread(read_manifest, self.directory)
+                version = manifest["active"] or BUILTIN
+                if version != self.model.version:
+                    self.model = await asyncio.to_thread(self.load, version, manifest)
+                self.error = None
+            except (OSError, KeyError, ValueError) as e:
+                self.error = repr(e)
+
+    async def activate(self, version: str):
+        """Load `version` and make it the registry's active one, e.g. to roll back.
+
+        Raises KeyError for an unknown version and ValueError if its file
+        does not match its checksum.
+        """
+        async with self.swap_lock:
+            manifest = await asyncio.to_thread(read_manifest, self.directory)
+            if version != BUILTIN and version not in manifest["versions"]:
+                raise KeyError(version)
+            model = await asyncio.to_thread(self.load, version, manifest)
+            manifest["active"] = None if version == BUILTIN else version
+            await asyncio.to_thread(write_manifest, self.directory, manifest)
+            self.model, self.error = model, None
+
+    def versions(self):
+        manifest = read_manifest(self.directory)
+        active = manifest["active"] or BUILTIN
+        versions = {BUILTIN: {"sha256": sha256(self.builtin_path)}}
+        versions |= manifest["versions"]
+        return {
+            "loaded": self.model.version,
+            "error": self.error,
+            "versions": [
+                {"version": version, "active": version == active, **entry}
+                for version, entry in versions.items()
+            ],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["publish", "list"])
+    parser.add_argument("artifact", nargs="?", default="model.json")
+    parser.add_argument("--version")
+    parser.add_argument("--directory", default="models")
+    parser.add_argument("--no-activate", action="store_true")
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    if args.command == "publish":
+        version = publish(directory, args.artifact, args.version, not args.no_activate)
+        print(f"published {version}")
+    else:
+        print(json.dumps(read_manifest(directory), indent=1))
+
+
+if __name__ == "__main__":
+    main()
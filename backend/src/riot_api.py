@@ -1,5 +1,17 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import httpx
+import msgspec
 import valo_api
 from config import get_settings
+from valo_api.config import Config
 
 settings = get_settings()
 
@@ -7,3 +19,317 @@ if settings.henrik_api_key is None:
     raise ValueError("henrik_api_key is required")
 
 valo_api.set_api_key(settings.henrik_api_key.get_secret_value())
+
+
+# Only the parts of valo_api's MatchHistoryPointV3 that ingest reads. Decoding
+# into these skips the per-round kill/damage events, which are most of the
+# payload; the full payload is still what goes into the disk cache.
+class PlayerStats(msgspec.Struct):
+    score: int
+    kills: int
+    deaths: int
+    assists: int
+    bodyshots: int = 0
+    headshots: int = 0
+    legshots: int = 0
+
+
+class MatchPlayer(msgspec.Struct):
+    name: str
+    tag: str
+    team: str
+    character: str
+    currenttier: int
+    stats: PlayerStats
+    damage_made: int = 0
+
+
+class MatchPlayers(msgspec.Struct):
+    all_players: list[MatchPlayer]
+
+
+class MatchTeam(msgspec.Struct):
+    has_won: bool | None = None
+
+
+class MatchTeams(msgspec.Struct):
+    red: MatchTeam
+    blue: MatchTeam
+
+
+class MatchMetadata(msgspec.Struct):
+    matchid: str
+    map: str
+    mode: str
+    game_start: int
+    rounds_played: int
+
+
+class Match(msgspec.Struct):
+    metadata: MatchMetadata
+    players: MatchPlayers
+    teams: MatchTeams
+
+
+class RawList(msgspec.Struct):
+    data: list[msgspec.Raw]
+
+
+class RawItem(msgspec.Struct):
+    data: msgspec.Raw
+
+
+class HenrikAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Henrik API error {status}: {message}")
+        self.status = status
+
+
+class CircuitOpenError(HenrikAPIError):
+    def __init__(self, retry_in: float):
+        super().__init__(503, f"circuit open, retry in {retry_in:.0f}s")
+
+
+class TokenBucket:
+    """Allows `rate` requests per `per` seconds with bursts of up to `rate`."""
+
+    def __init__(self, rate: int, per: float = 60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.fill_rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    def drain(self, seconds: float):
+        """Empty the bucket for `seconds`, e.g. when the server reports 0 remaining."""
+        self.tokens = -seconds * self.fill_rate
+
+
+class CircuitBreaker:
+    """Fails fast after `threshold` consecutive failures, for `cooldown` seconds.
+
+    After the cooldown one trial request is let through (half-open); its
+    outcome closes the circuit again or restarts the cooldown.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_running = False
+
+    def before_request(self):
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0 or self.trial_running:
+            raise CircuitOpenError(max(remaining, 0))
+        self.trial_running = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Let another trial through when this one ended without an outcome."""
+        self.trial_running = False
+
+
+def retry_after(header: str | None, default: float) -> float:
+    """Seconds to wait per a Retry-After header, given as seconds or as an HTTP-date."""
+    if header is None:
+        return default
+    try:
+        return max(float(header), 0.0)
+    except ValueError:
+        pass
+    try:
+        at = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return default
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return max((at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class DiskCache:
+    """Content-addressed store for raw match payloads plus short-lived history lists.
+
+    objects/ab/abcdef...  payload bytes, named by their sha256
+    matches/<matchid>     sha256 of that match's payload
+    histories/<key>.json  {"expires": ..., "objects": [sha256, ...]}
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        for directory in ("objects", "matches", "histories"):
+            (self.root / directory).mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def _write(self, path: Path, content: bytes):
+        # write-then-rename so a concurrent reader never sees a partial file
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{random.getrandbits(32):08x}")
+        tmp.write_bytes(content)
+        tmp.replace(path)
+
+    def put_match(self, matchid: str, payload: bytes) -> str:
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            self._write(path, payload)
+        self._write(self.root / "matches" / matchid, digest.encode())
+        return digest
+
+    def get_match(self, matchid: str) -> bytes | None:
+        try:
+            digest = (self.root / "matches" / matchid).read_text()
+            return self._object_path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put_history(self, key: str, digests: list[str], ttl: float):
+        entry = {"expires": time.time() + ttl, "objects": digests}
+        self._write(self._history_path(key), json.dumps(entry).encode())
+
+    def get_history(self, key: str) -> list[bytes] | None:
+        try:
+            entry = json.loads(self._history_path(key).read_bytes())
+            if entry["expires"] < time.time():
+                return None
+            return [self._object_path(d).read_bytes() for d in entry["objects"]]
+        except FileNotFoundError:
+            return None
+
+    def _history_path(self, key: str) -> Path:
+        return (
+            self.root / "histories" / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+        )
+
+
+class HenrikClient:
+    """Cached, rate-limited access to the Henrik Valorant API endpoints we use."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = Config.BASE_URL,
+        cache_dir: str = "henrik_cache",
+        requests_per_minute: int = 30,
+        history_ttl: float = 120.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "Authorization": api_key,
+                "User-Agent": Config.USER_AGENT,
+                "Accept": "application/json",
+            },
+            timeout=30.0,
+        )
+        self.cache = DiskCache(cache_dir)
+        self.bucket = TokenBucket(requests_per_minute)
+        self.breaker = breaker or CircuitBreaker()
+        self.history_ttl = history_ttl
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {"requests": 0, "cache_hits": 0, "retries": 0}
+
+    async def _get(self, path: str, params=None) -> bytes:
+        for attempt in range(self.retries + 1):
+            self.breaker.before_request()
+            try:
+                await self.bucket.acquire()
+                self.stats["requests"] += 1
+                response = await self.http.get(path, params=params)
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                error = HenrikAPIError(0, str(e))
+                delay = self.backoff * 2**attempt
+            except BaseException:
+                # cancelled while waiting: a half-open trial must not stay taken
+                self.breaker.release()
+                raise
+            else:
+                if response.headers.get("x-ratelimit-remaining") == "0":
+                    self.bucket.drain(
+                        float(response.headers.get("x-ratelimit-reset", 60))
+                    )
+                if response.is_success:
+                    self.breaker.record_success()
+                    return response.content
+                error = HenrikAPIError(response.status_code, response.text)
+                if response.status_code != 429 and response.status_code < 500:
+                    # the request itself is wrong (unknown player etc.), retrying won't help
+                    self.breaker.record_success()
+                    raise error
+                self.breaker.record_failure()
+                delay = retry_after(
+                    response.headers.get("retry-after"), self.backoff * 2**attempt
+                )
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay * random.uniform(1, 1.5))
+        raise error
+
+    async def get_match_history(
+        self, region: str, name: str, tag: str, game_mode: str = "competitive"
+    ) -> list[Match]:
+        key = f"{region}/{name}/{tag}/{game_mode}".lower()
+        payloads = self.cache.get_history(key)
+        if payloads is not None:
+            self.stats["cache_hits"] += 1
+            return [msgspec.json.decode(p, type=Match) for p in payloads]
+
+        content = await self._get(
+            f"/valorant/v3/matches/{region}/{name}/{tag}", params={"filter": game_mode}
+        )
+        payloads = [
+            bytes(raw) for raw in msgspec.json.decode(content, type=RawList).data
+        ]
+        matches = [msgspec.json.decode(p, type=Match) for p in payloads]
+        digests = [
+            self.cache.put_match(match.metadata.matchid, payload)
+            for match, payload in zip(matches, payloads)
+        ]
+        self.cache.put_history(key, digests, self.history_ttl)
+        return matches
+
+    async def get_match(self, matchid: str) -> Match:
+        payload = self.cache.get_match(matchid)
+        if payload is not None:
+            self.stats["cache_hits"] += 1
+        else:
+            content = await self._get(f"/valorant/v2/match/{matchid}")
+            payload = bytes(msgspec.json.decode(content, type=RawItem).data)
+            self.cache.put_match(matchid, payload)
+        return msgspec.json.decode(payload, type=Match)
+
+    async def aclose(self):
+        await self.http.aclose()
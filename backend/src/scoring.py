@@ -0,0 +1,208 @@
+"""Win probability from a player's stat line.
+
+The trained sklearn pipeline (model.pkl) is compiled into model.json:
+imputer medians, one-hot vocabularies and logistic coefficients, which is
+all WinModel needs to serve, without sklearn, pandas or the pickle.
+
+    rye run python src/scoring.py export model.pkl model.json
+"""
+
+import argparse
+import json
+import pickle
+
+import numpy as np
+
+# model input -> the history.COLUMNS key it is read from for a stored game
+STORED = {
+    "kill_assist_trade_survive_ratio": "kill_assist_trade_survive_ratio",
+    "headshot_ratio": "headshot_ratio",
+    "kills": "kills",
+    "deaths": "deaths",
+    "assists": "assists",
+    "average_damage_per_round": "average_damage_per_round",
+    "first_kills": "first_kills",
+    "first_deaths": "first_deaths",
+    "tier": "tier_id",
+    "agent": "agent_name",
+    "side": "team_side",
+}
+# Player_Stats keeps ratios as percentages, as the model was trained on them
+# (the scraper's "83%" is loaded as 83); only headshot_ratio on games ingested
+# from the Henrik API (Game.riot_id set) is stored as a fraction.
+FRACTIONS = ["headshot_ratio"]
+
+
+class WinModel:
+    """The trained win pipeline's predict_proba as NumPy arithmetic.
+
+    A logistic model's logit is the intercept plus one term per input (the
+    one-hot columns of a categorical input add up to the weight of its
+    category), so scoring a batch is a few array operations and those terms
+    are the per-feature contributions.
+    """
+
+    def __init__(
+        self, numeric, fill, weights, categorical, vocabularies, intercept, version=None
+    ):
+        self.numeric = list(numeric)
+        self.fill = np.asarray(fill, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.categorical = list(categorical)
+        # category -> weight of its one-hot column
+        self.vocabularies = [dict(vocabulary) for vocabulary in vocabularies]
+        self.intercept = float(intercept)
+        self.features = self.numeric + self.categorical
+        # the registry version it was loaded as, reported with its scores
+        self.version = version
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Read medians, vocabularies and coefficients off the fitted pipeline."""
+        preprocessor, classifier = pipeline.steps[0][1], pipeline.steps[-1][1]
+        coef = classifier.coef_[0]
+        numeric, fill, weights, categorical, vocabularies = [], [], [], [], []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer in ("drop", "passthrough") or not columns:
+                continue
+            start = preprocessor.output_indices_[name].start
+            steps = getattr(transformer, "steps", [])
+            encoder = steps[-1][1] if steps else None
+            if hasattr(encoder, "categories_"):
+                for column, categories in zip(columns, encoder.categories_):
+                    column_weights = coef[start : start + len(categories)]
+                    categorical.append(column)
+                    vocabularies.append(
+                        zip(categories.tolist(), column_weights.tolist())
+                    )
+                    start += len(categories)
+                continue
+            numeric += columns
+            weights += coef[start : start + len(columns)].tolist()
+            if steps and hasattr(steps[0][1], "statistics_"):
+                fill += steps[0][1].statistics_.tolist()
+            else:
+                # the "%"-stripping ratios had no imputer; missing ones count as 0
+                fill += [0.0] * len(columns)
+        return cls(
+            numeric, fill, weights, categorical, vocabularies, classifier.intercept_[0]
+        )
+
+    def save(self, path):
+        artifact = {
+            "intercept": self.intercept,
+            "numeric": [
+                {"name": name, "fill": fill, "weight": weight}
+                for name, fill, weight in zip(
+                    self.numeric, self.fill.tolist(), self.weights.tolist()
+                )
+            ],
+            "categorical": [
+                {"name": name, "weights": vocabulary}
+                for name, vocabulary in zip(self.categorical, self.vocabularies)
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(artifact, f, indent=1)
+
+    @classmethod
+    def load(cls, path, version=None):
+        with open(path) as f:
+            artifact = json.load(f)
+        numeric, categorical = artifact["numeric"], artifact["categorical"]
+        return cls(
+            [feature["name"] for feature in numeric],
+            [feature["fill"] for feature in numeric],
+            [feature["weight"] for feature in numeric],
+            [feature["name"] for feature in categorical],
+            [feature["weights"] for feature in categorical],
+            artifact["intercept"],
+            version,
+        )
+
+    def contributions(self, columns: dict[str, list]):
+        """Each row's logit term per feature, as an (n_rows, n_features) array.
+
+        `columns` maps every feature name to a list of values, None where missing.
+        """
+        n = len(columns[self.features[0]])
+        terms = np.empty((n, len(self.features)))
+        values = np.array([columns[name] for name in self.numeric], dtype=float).T
+        values = np.where(np.isnan(values), self.fill, values)
+        terms[:, : len(self.numeric)] = values * self.weights
+        for i, (name, vocabulary) in enumerate(
+            zip(self.categorical, self.vocabularies), len(self.numeric)
+        ):
+            # unknown categories get no weight, like handle_unknown="ignore";
+            # so do missing ones, which reach the modal imputer as None, not NaN
+            terms[:, i] = [vocabulary.get(value, 0.0) for value in columns[name]]
+        return terms
+
+    def predict(self, columns: dict[str, list]):
+        """Win probabilities and the contributions they came from."""
+        terms = self.contributions(columns)
+        logits = self.intercept + terms.sum(axis=1)
+        return 1 / (1 + np.exp(-logits)), terms
+
+
+def percentages(row, ingested):
+    """Ratios of a stored row, or a frame of them, as percentages.
+
+    `ingested` is whether the row's game came from the Henrik API.
+    """
+    scale = np.where(ingested, 100.0, 1.0)
+    for column in FRACTIONS:
+        if row[column] is not None:
+            row[column] = row[column] * scale
+    return row
+
+
+def from_stored(row):
+    """Model inputs from a history row."""
+    inputs = {name: row[key] for name, key in STORED.items()}
+    return percentages(inputs, row["riot_id"] is not None)
+
+
+def feature_columns(rows, model: WinModel):
+    """Columns for WinModel.predict from dicts of model inputs.
+
+    kills_deaths is derived from kills and deaths when a row lacks it.
+    """
+    columns = {name: [row.get(name) for row in rows] for name in model.features}
+    if "kills_deaths" in columns:
+        columns["kills_deaths"] = [
+            kd if kd is not None or k is None or d is None else k - d
+            for kd, k, d in zip(
+                columns["kills_deaths"], columns["kills"], columns["deaths"]
+            )
+        ]
+    return columns
+
+
+def replace_percentage(df, column):
+    df[column] = df[column].str.replace("%", "").astype(float)
+    return df
+
+
+def load_pipeline(path):
+    """Unpickle the trained pipeline, which refers to __main__.replace_percentage."""
+    import __main__
+
+    __main__.replace_percentage = replace_percentage  # type: ignore
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("pipeline", nargs="?", default="model.pkl")
+    parser.add_argument("artifact", nargs="?", default="model.json")
+    args = parser.parse_args()
+
+    WinModel.from_pipeline(load_pipeline(args.pipeline)).save(args.artifact)
+    print(f"wrote {args.artifact}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Typed Parquet snapshot of match data for training and analytics.
+
+Two Hive-partitioned datasets under the snapshot root:
+
+    game/month=2024-07/...                 game_id, map_name, date_info, played_at
+    player_stats/month=2024-07/tier=21/... one row per player per game
+
+from either source: the scraper's `{idx}games.csv`/`{idx}player.csv` pairs,
+with "83%" and "+5" parsed to numbers, or the Game and Player_Stats tables.
+Columns keep the scraper's names (agent, side, tier, ...); rating and
+rounds_won only exist in scraped data. Ratios are percentages whichever
+source wrote them (83 for the scraper's "83%"; the fractions ingest stores
+are scaled up by scoring.percentages), as train.py expects. Unknown tiers
+are partitioned as tier=0.
+
+Exports only append. A game already in the snapshot is skipped, whichever
+source wrote it, and the database export continues from the highest
+Game.game_id it exported last time (kept in _snapshot.json).
+
+    rye run python src/snapshot.py csv ../scrapedata --out snapshot
+    rye run python src/snapshot.py database --out snapshot
+
+Readers open only the columns and partitions they ask for, memory-mapped,
+e.g. read("snapshot", "player_stats", ["kills", "won"], ds.field("tier") == 21).
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+from scoring import percentages
+from sqlalchemy import text
+
+GAME = pa.schema(
+    [
+        ("game_id", pa.int64()),
+        ("map_name", pa.string()),
+        ("date_info", pa.string()),
+        ("played_at", pa.timestamp("s")),
+        ("month", pa.string()),
+    ]
+)
+PLAYER_STATS = pa.schema(
+    [
+        ("game_id", pa.int64()),
+        ("player_id", pa.string()),
+        ("agent", pa.string()),
+        ("side", pa.string()),
+        ("won", pa.bool_()),
+        ("rating", pa.float32()),
+        ("average_combat_score", pa.float32()),
+        ("kills", pa.int32()),
+        ("deaths", pa.int32()),
+        ("assists", pa.int32()),
+        ("kills_deaths", pa.int32()),
+        ("kill_assist_trade_survive_ratio", pa.float32()),
+        ("average_damage_per_round", pa.float32()),
+        ("headshot_ratio", pa.float32()),
+        ("first_kills", pa.int32()),
+        ("first_deaths", pa.int32()),
+        ("rounds_won", pa.int32()),
+        ("month", pa.string()),
+        ("tier", pa.int32()),
+    ]
+)
+# stored as percentages
+RATIOS = ["kill_assist_trade_survive_ratio", "headshot_ratio"]
+PARTITIONS = {"game": ["month"], "player_stats": ["month", "tier"]}
+SCHEMAS = {"game": GAME, "player_stats": PLAYER_STATS}
+STATE = "_snapshot.json"
+
+DATABASE_GAMES = text(
+    "select g.game_id, m.map_name, g.date_info, g.played_at"
+    " from Game g left join Maps m on m.map_id = g.map_id"
+    " where g.game_id > :after order by g.game_id"
+)
+DATABASE_PLAYER_STATS = text(
+    "select p.game_id, p.player_id, a.agent_name as agent, p.team_side as side,"
+    " p.won, p.average_combat_score, p.kills, p.deaths, p.assists,"
+    " p.kills - p.deaths as kills_deaths, p.kill_assist_trade_survive_ratio,"
+    " p.average_damage_per_round, p.headshot_ratio, p.first_kills, p.first_deaths,"
+    " p.tier_id as tier, g.played_at, g.riot_id"
+    " from Player_Stats p join Game g on g.game_id = p.game_id"
+    " left join Agents a on a.agent_id = p.agent_id"
+    " where p.game_id > :after and p.game_id <= :until order by p.game_id"
+)
+
+
+def read(root, table: str, columns=None, filter=None) -> pa.Table:
+    """Just `columns` of the rows matching `filter`, from memory-mapped files."""
+    dataset = ds.dataset(
+        Path(root) / table,
+        format="parquet",
+        partitioning="hive",
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def played_at(date_info: pd.Series) -> pd.Series:
+    """date_info is a unix timestamp or "YYYY-MM-DD HH:MM:SS", as in migration 002."""
+    date_info = date_info.astype("string")
+    epoch = date_info.str.fullmatch(r"\d+").fillna(False).astype(bool)
+    result = pd.to_datetime(date_info.where(~epoch), errors="coerce")
+    result[epoch] = pd.to_datetime(date_info[epoch].astype("int64"), unit="s")
+    return result
+
+
+def with_month(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["month"] = frame["played_at"].dt.strftime("%Y-%m")
+    return frame
+
+
+def percent(column: pd.Series) -> pd.Series:
+    return pd.to_numeric(column.astype("string").str.rstrip("%"), errors="coerce")
+
+
+class Snapshot:
+    """Appends to the snapshot at `root`; each instance writes uniquely named files."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.run = uuid.uuid4().hex[:12]
+        self.batches = 0
+        try:
+            self.state = json.loads((self.root / STATE).read_text())
+        except FileNotFoundError:
+            self.state = {"database_game_id": 0}
+        self.game_ids = self.existing_game_ids()
+
+    def existing_game_ids(self) -> np.ndarray:
+        if not (self.root / "game").exists():
+            return np.empty(0, np.int64)
+        return read(self.root, "game", ["game_id"])["game_id"].to_numpy()
+
+    def new_games(self, games: pd.DataFrame) -> pd.DataFrame:
+        games = games.drop_duplicates("game_id")
+        return games[~games["game_id"].isin(self.game_ids)].copy()
+
+    def append(self, table: str, frame: pd.DataFrame):
+        if frame.empty:
+            return
+        schema = SCHEMAS[table]
+        frame = frame.reindex(columns=schema.names)
+        if "tier" in frame:
+            frame["tier"] = pd.to_numeric(frame["tier"]).fillna(0)
+        self.batches += 1
+        ds.write_dataset(
+            pa.Table.from_pandas(frame, schema=schema, preserve_index=False),
+            self.root / table,
+            format="parquet",
+            partitioning=PARTITIONS[table],
+            partitioning_flavor="hive",
+            basename_template=f"{self.run}-{self.batches}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        if table == "game":
+            self.game_ids = np.concatenate([self.game_ids, frame["game_id"]])
+
+    def save_state(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / STATE).write_text(json.dumps(self.state))
+
+    def append_csvs(self, games_csv, player_csv, chunksize: int = 100_000):
+        """One scraper worker's output; returns (games, player rows) appended."""
+        games = pd.read_csv(games_csv, dtype={"date_info": "string"})
+        games = self.new_games(games)
+        games["played_at"] = played_at(games["date_info"])
+        games = with_month(games)
+        months = games.set_index("game_id")["month"]
+        rows = 0
+        for chunk in pd.read_csv(
+            player_csv,
+            dtype={"kill_assist_trade_survive_ratio": str, "headshot_ratio": str},
+            true_values=["True"],
+            false_values=["False"],
+            chunksize=chunksize,
+        ):
+            chunk = chunk[chunk["game_id"].isin(months.index)].copy()
+            chunk["month"] = chunk["game_id"].map(months)
+            for column in RATIOS:
+                chunk[column] = percent(chunk[column])
+            chunk["kills_deaths"] = pd.to_numeric(
+                chunk["kills_deaths"], errors="coerce"
+            )
+            self.append("player_stats", chunk)
+            rows += len(chunk)
+        self.append("game", games)
+        self.save_state()
+        return len(games), rows
+
+    async def append_database(self, db, batch: int = 100_000):
+        """Games (and their players) added since the last database export."""
+        after = self.state["database_game_id"]
+        # players are read on a second connection: a server-side cursor has
+        # to be drained before its connection can run anything else
+        async with db.connect() as games_connection, db.connect() as connection:
+            result = await games_connection.stream(DATABASE_GAMES, {"after": after})
+            async for rows in result.partitions(batch):
+                games = pd.DataFrame(rows, columns=list(result.keys()))
+                games["played_at"] = pd.to_datetime(games["played_at"])
+                games = with_month(self.new_games(games))
+                until = int(rows[-1].game_id)
+                players = await connection.stream(
+                    DATABASE_PLAYER_STATS, {"after": after, "until": until}
+                )
+                async for player_rows in players.partitions(batch):
+                    frame = pd.DataFrame(player_rows, columns=list(players.keys()))
+                    frame = frame[frame["game_id"].isin(games["game_id"])].copy()
+                    frame["won"] = frame["won"].astype("boolean")
+                    frame[RATIOS] = frame[RATIOS].astype(float)
+                    percentages(frame, frame["riot_id"].notna())
+                    frame["played_at"] = pd.to_datetime(frame["played_at"])
+                    self.append("player_stats", with_month(frame))
+                # games last, so a game in the snapshot has all its players
+                self.append("game", games)
+                after = self.state["database_game_id"] = until
+                self.save_state()
+
+
+def csv_pairs(directory: Path):
+    for player_csv in sorted(directory.glob("*player.csv")):
+        games_csv = player_csv.with_name(
+            player_csv.name.removesuffix("player.csv") + "games.csv"
+        )
+        if games_csv.exists():
+            yield games_csv, player_csv
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", choices=["csv", "database"])
+    parser.add_argument("directory", nargs="?", type=Path, default=Path("."))
+    parser.add_argument("--out", type=Path, default=Path("snapshot"))
+    args = parser.parse_args()
+
+    snapshot = Snapshot(args.out)
+    if args.source == "csv":
+        for games_csv, player_csv in csv_pairs(args.directory):
+            games, rows = snapshot.append_csvs(games_csv, player_csv)
+            print(f"{player_csv}: {games} new games, {rows} player rows")
+    else:
+        from database import engine
+
+        await snapshot.append_database(engine)
+        await engine.dispose()
+        print(f"exported games up to {snapshot.state['database_game_id']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+import asyncio
+
+import numpy as np
+from background import BackgroundIndex
+from sqlalchemy import text
+
+# one row per player per game; scraped games can have a row per half
+ROWS_QUERY = text(
+    "select game_id, agent_id, tier, won from ("
+    "select distinct game_id, player_id, agent_id, coalesce(tier_id, 0) as tier, coalesce(won, -1) as won"
+    " from Player_Stats where agent_id is not null) s order by game_id"
+)
+NAMES_QUERY = text("select agent_id, agent_name from Agents")
+
+
+def fold(game_ids, agents, tiers, won, shape):
+    """Per-agent and agent-pair counts for a batch of Player_Stats rows.
+
+    `won` is 1, 0 or -1 (unknown). Returns `solo[(picks, decided, wins), t, a]`
+    and `pairs[(games, teammates, wins), t, a, b]`, both int64 with
+    `shape = (tiers, agents)`. Every game in the batch must be complete.
+    """
+    n_tiers, n_agents = shape
+    cells = n_tiers * n_agents
+    if np.any(game_ids[1:] < game_ids[:-1]):
+        order = np.argsort(game_ids, kind="stable")
+        game_ids, agents, tiers, won = (
+            x[order] for x in (game_ids, agents, tiers, won)
+        )
+    cell = tiers * n_agents + agents
+    known = won >= 0
+
+    solo = np.stack(
+        [
+            np.bincount(cell, minlength=cells),
+            np.bincount(cell[known], minlength=cells),
+            np.bincount(cell[won == 1], minlength=cells),
+        ]
+    ).reshape(3, n_tiers, n_agents)
+
+    # rows are grouped by game, so every pair in a game is some offset apart
+    pairs = np.zeros((3, cells * n_agents), np.int64)
+    for offset in range(1, len(cell)):
+        same = game_ids[:-offset] == game_ids[offset:]
+        if not same.any():
+            break
+        # no team column: teammates are the players with the same result
+        team = same & known[offset:] & (won[:-offset] == won[offset:])
+        wins = team & (won[offset:] == 1)
+        for index in (
+            cell[:-offset] * n_agents + agents[offset:],
+            cell[offset:] * n_agents + agents[:-offset],
+        ):
+            for i, mask in enumerate((same, team, wins)):
+                pairs[i] += np.bincount(index[mask], minlength=cells * n_agents)
+    return solo, pairs.reshape(3, n_tiers, n_agents, n_agents)
+
+
+def accumulate(solo, pairs, game_ids, agents, tiers, won):
+    """`solo` and `pairs` plus the fold of more complete games, grown to fit them."""
+    shape = (
+        max(solo.shape[1], int(tiers.max(initial=0)) + 1),
+        max(solo.shape[2], int(agents.max(initial=0)) + 1),
+    )
+    batch_solo, batch_pairs = fold(game_ids, agents, tiers, won, shape)
+    grow = [(0, 0), (0, shape[0] - solo.shape[1]), (0, shape[1] - solo.shape[2])]
+    return (
+        np.pad(solo, grow) + batch_solo,
+        np.pad(pairs, grow + grow[-1:]) + batch_pairs,
+    )
+
+
+def fold_partition(solo, pairs, held, rows):
+    """accumulate() a streamed partition, holding back its last game.
+
+    Rows come ordered by game and the last game may continue in the next
+    partition, so it is returned to be prepended to that one.
+    """
+    batch = np.concatenate([held, np.array(rows, np.int64).T], axis=1)
+    last = np.searchsorted(batch[0], batch[0, -1])
+    solo, pairs = accumulate(solo, pairs, *batch[:, :last])
+    return solo, pairs, batch[:, last:]
+
+
+def columns(rows):
+    """(game_ids, agents, tiers, won) arrays from rows written by ingest_matches."""
+    return (
+        np.array([row["gid"] for row in rows], np.int64),
+        np.array([row["aid"] for row in rows], np.int64),
+        np.array([row["tid"] or 0 for row in rows], np.int64),
+        np.array([-1 if row["won"] is None else int(row["won"]) for row in rows]),
+    )
+
+
+class SynergyIndex(BackgroundIndex):
+    """How often each agent shared a game, or a team, with each other agent, per tier.
+
+    `pairs[:, t, a, b]` counts the games where a tier-t player on agent a
+    had agent b in the game, on their team, and on their team in a win;
+    `solo[:, t, a]` holds a's own picks, games with a known result and
+    wins. Built once from Player_Stats, then added to from every ingested
+    batch, so lookups are array slices.
+    """
+
+    def __init__(self, db, batch: int = 100_000):
+        super().__init__(db)
+        self.batch = batch
+        self.names: dict[int, str] = {}
+        self.solo = np.zeros((3, 0, 0), np.int64)
+        self.pairs = np.zeros((3, 0, 0, 0), np.int64)
+
+    async def build(self):
+        """Fold Player_Stats in streamed batches, never holding the whole table."""
+        async with self.db.connect() as connection:
+            names = dict((await connection.execute(NAMES_QUERY)).all())
+            n_agents = max(names, default=0) + 1
+            solo = np.zeros((3, 1, n_agents), np.int64)
+            pairs = np.zeros((3, 1, n_agents, n_agents), np.int64)
+            held = np.empty((4, 0), np.int64)
+            result = await connection.stream(ROWS_QUERY)
+            async for rows in result.partitions(self.batch):
+                # the fold is CPU-bound, so it runs off the event loop
+                solo, pairs, held = await asyncio.to_thread(
+                    fold_partition, solo, pairs, held, rows
+                )
+        self.solo, self.pairs = await asyncio.to_thread(accumulate, solo, pairs, *held)
+        self.names = names
+
+    def on_ingest(self, rows):
+        if not rows:
+            return
+        if not self.built or not self.rebuild_task.done():  # type: ignore
+            # a build in flight may or may not have read these rows
+            self.schedule_rebuild()
+            return
+        self.solo, self.pairs = accumulate(self.solo, self.pairs, *columns(rows))
+
+    def synergies(self, agent_id: int, tier: int, limit: int = 15):
+        """The agents seen most often alongside `agent_id` at `tier`, with win rates."""
+        _, n_tiers, n_agents = self.solo.shape
+        if not (0 <= tier < n_tiers and 0 <= agent_id < n_agents):
+            picks, decided, wins = 0, 0, 0
+            games, teammates, co_wins = [], [], []
+        else:
+            picks, decided, wins = self.solo[:, tier, agent_id].tolist()
+            games, teammates, co_wins = self.pairs[:, tier, agent_id].tolist()
+        ranked = sorted(
+            (other for other, n in enumerate(games) if n), key=lambda o: -games[o]
+        )
+        return {
+            "agent_name": self.names.get(agent_id),
+            "tier": tier,
+            "games": picks,
+            "win_rate": round(wins / decided, 4) if decided else None,
+            "synergies": [
+                {
+                    "agent_name": self.names.get(other),
+                    "games": games[other],
+                    "teammate_games": teammates[other],
+                    "wins": co_wins[other],
+                    "win_rate": round(co_wins[other] / teammates[other], 4)
+                    if teammates[other]
+                    else None,
+                }
+                for other in ranked[:limit]
+            ],
+        }
@@ -0,0 +1,244 @@
+"""Train the win model from scraped player CSVs (scrapedata/scrape.py's player.csv).
+
+Replaces cs411_ml/cs411.ipynb. The CSVs are read in chunks, only the
+columns the model uses, with the "%" ratios parsed per column rather than
+per row; a Parquet snapshot directory (snapshot.py) can be given instead.
+Cross-validated search over C runs folds and candidates across cores with
+joblib, then the best model is scored on a held-out split. Writes to
+--out-dir:
+
+    model.pkl     the fitted sklearn pipeline
+    model.json    the same model compiled for serving (see scoring.py)
+    metrics.json  held-out metrics, the search results, and wall-clock and
+                  peak-memory figures per stage
+
+    rye run python src/train.py ../cs411_ml/csv*.txt --out-dir trained
+    rye run python src/train.py snapshot --out-dir trained
+    rye run python src/registry.py publish trained/model.json
+"""
+
+import argparse
+import json
+import pickle
+import resource
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scoring import WinModel
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (
+    accuracy_score,
+    brier_score_loss,
+    classification_report,
+    log_loss,
+    roc_auc_score,
+)
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+PERCENT = ["kill_assist_trade_survive_ratio", "headshot_ratio"]
+NUMERIC = [
+    "kills",
+    "deaths",
+    "assists",
+    "kills_deaths",
+    "average_damage_per_round",
+    "first_kills",
+    "first_deaths",
+    "tier",
+    *PERCENT,
+]
+CATEGORICAL = ["agent", "side"]
+TARGET = "won"
+
+
+def prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Typed model inputs from raw CSV rows: "83%" -> 83.0, "+5" -> 5.0."""
+    chunk = chunk.dropna()
+    features = {
+        column: pd.to_numeric(
+            chunk[column].astype(str).str.rstrip("%")
+            if chunk[column].dtype == object
+            else chunk[column]
+        ).astype(np.float32)
+        for column in NUMERIC
+    }
+    features |= {column: chunk[column].astype(str) for column in CATEGORICAL}
+    features[TARGET] = chunk[TARGET].astype(bool)
+    return pd.DataFrame(features, index=chunk.index)
+
+
+def read_player_data(paths, chunksize: int = 100_000) -> pd.DataFrame:
+    """Model inputs from player CSVs, or from snapshot directories (see snapshot.py)."""
+    chunks = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            from snapshot import read
+
+            columns = NUMERIC + CATEGORICAL + [TARGET]
+            chunks.append(prepare(read(path, "player_stats", columns).to_pandas()))
+            continue
+        chunks += [
+            prepare(chunk)
+            for chunk in pd.read_csv(
+                path,
+                usecols=NUMERIC + CATEGORICAL + [TARGET],
+                dtype={column: str for column in PERCENT + ["kills_deaths"]},
+                true_values=["True"],
+                false_values=["False"],
+                chunksize=chunksize,
+            )
+        ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def pipeline(max_iter: int = 5000) -> Pipeline:
+    numeric = Pipeline(steps=[("Median Imputer", SimpleImputer(strategy="median"))])
+    categorical = Pipeline(
+        steps=[
+            ("Modal Imputer", SimpleImputer(strategy="most_frequent")),
+            ("One-Hot Encoder", OneHotEncoder(handle_unknown="ignore")),
+        ]
+    )
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("Numeric Transformer", numeric, NUMERIC),
+            ("Categorical Transformer", categorical, CATEGORICAL),
+        ]
+    )
+    return Pipeline(
+        steps=[
+            ("preprocessor", preprocessor),
+            ("classifier", LogisticRegression(max_iter=max_iter)),
+        ]
+    )
+
+
+class Stages:
+    """Wall-clock seconds and peak RSS per stage.
+
+    Peak RSS only grows, so a stage's figure is the peak so far; joblib's
+    worker processes are reported separately.
+    """
+
+    def __init__(self):
+        self.report = {}
+
+    @contextmanager
+    def __call__(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.report[name] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_SELF), 1),
+            "workers_peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        }
+
+
+def peak_rss_mb(who) -> float:
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def train(
+    paths,
+    out_dir: Path,
+    cs=(0.01, 0.1, 1.0, 10.0),
+    folds: int = 5,
+    jobs: int = -1,
+    test_size: float = 0.2,
+    chunksize: int = 100_000,
+    seed: int = 81,
+):
+    """Fit, evaluate and write the model; returns the metrics written."""
+    stage = Stages()
+    with stage("read"):
+        data = read_player_data(paths, chunksize)
+        X, y = data.drop(columns=TARGET), data[TARGET]
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=seed, stratify=y
+        )
+
+    with stage("search"):
+        search = GridSearchCV(
+            pipeline(),
+            {"classifier__C": list(cs)},
+            scoring="neg_log_loss",
+            cv=StratifiedKFold(folds, shuffle=True, random_state=seed),
+            n_jobs=jobs,
+        )
+        search.fit(X_train, y_train)
+        model = search.best_estimator_
+
+    with stage("evaluate"):
+        probabilities = model.predict_proba(X_test)[:, 1]
+        predictions = probabilities >= 0.5
+        metrics = {
+            "rows": {"train": len(X_train), "test": len(X_test)},
+            "accuracy": accuracy_score(y_test, predictions),
+            "log_loss": log_loss(y_test, probabilities),
+            # the notebook's "MSE"
+            "brier": brier_score_loss(y_test, probabilities),
+            "roc_auc": roc_auc_score(y_test, probabilities),
+            "report": classification_report(y_test, predictions, output_dict=True),
+            "search": {
+                "best_params": search.best_params_,
+                "best_log_loss": -search.best_score_,
+                "candidates": [
+                    {"params": params, "log_loss": -score}
+                    for params, score in zip(
+                        search.cv_results_["params"],
+                        search.cv_results_["mean_test_score"],
+                    )
+                ],
+            },
+        }
+
+    with stage("export"):
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with open(out_dir / "model.pkl", "wb") as f:
+            pickle.dump(model, f, protocol=5)
+        WinModel.from_pipeline(model).save(out_dir / "model.json")
+
+    metrics["stages"] = stage.report
+    with open(out_dir / "metrics.json", "w") as f:
+        json.dump(metrics, f, indent=1)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data", nargs="+", type=Path, help="player CSVs or snapshots")
+    parser.add_argument("--out-dir", type=Path, default=Path("trained"))
+    parser.add_argument("--C", type=float, nargs="+", default=[0.01, 0.1, 1.0, 10.0])
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="joblib workers")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    metrics = train(
+        args.data,
+        args.out_dir,
+        args.C,
+        args.folds,
+        args.jobs,
+        chunksize=args.chunksize,
+    )
+    print(
+        f"accuracy {metrics['accuracy']:.3f}  log loss {metrics['log_loss']:.3f}"
+        f"  C={metrics['search']['best_params']['classifier__C']}"
+    )
+    for name, figures in metrics["stages"].items():
+        print(
+            f"{name:<9}{figures['seconds']:>8.2f}s{figures['peak_rss_mb']:>8.0f} MB"
+            f"{figures['workers_peak_rss_mb']:>8.0f} MB in workers"
+        )
+
+
+if __name__ == "__main__":
+    main()
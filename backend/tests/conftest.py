@@ -1,5 +1,111 @@
+import asyncio
 import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
 
 os.environ["DATABASE_HOST"] = "localhost"
 os.environ["DATABASE_PASSWORD"] = "chonk"
 os.environ["SECRET_KEY"] = "chonk"
+os.environ["HENRIK_API_KEY"] = "chonk"
+os.environ["HENRIK_CACHE_DIR"] = str(Path(tempfile.mkdtemp()) / "henrik_cache")
+os.environ["DATABASE_URL"] = (
+    f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp()) / 'chonk.db'}"
+)
+os.environ["JOB_QUEUE_PATH"] = str(Path(tempfile.mkdtemp()) / "jobs.db")
+
+SCHEMA = (Path(__file__).parent / "schema.sql").read_text()
+
+
+@pytest.fixture
+def db():
+    path = os.environ["DATABASE_URL"].removeprefix("sqlite+aiosqlite:///")
+    with sqlite3.connect(path) as connection:
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "insert into Maps (map_id, map_name) values (?, ?)",
+            [(1, "Ascent"), (2, "Bind"), (3, "Haven")],
+        )
+        connection.executemany(
+            "insert into Agents (agent_id, agent_name) values (?, ?)",
+            [(1, "Jett"), (2, "Sova"), (3, "Omen"), (4, "Killjoy"), (5, "Raze")],
+        )
+    yield path
+
+
+@pytest.fixture
+def rebuild_aggregates(db):
+    """For tests that write Player_Stats directly instead of through ingest."""
+    import aggregates
+    from database import engine
+
+    async def rebuild():
+        async with engine.begin() as connection:
+            await aggregates.rebuild(connection)
+
+    return lambda: asyncio.run(rebuild())
+
+
+@pytest.fixture
+def auth_headers(db):
+    from auth import create_access_token
+
+    with sqlite3.connect(db) as connection:
+        connection.execute(
+            "insert into Player (player_id, current_tier_id) values ('chonk#na1', 21)"
+        )
+        connection.execute(
+            "insert into User (username, player_id, password_hash) values ('chonk', 'chonk#na1', 'x')"
+        )
+    token = create_access_token({"sub": "chonk"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def make_match():
+    """Build objects shaped like valo_api's v3 match history entries."""
+
+    def player(name, team, character="Jett", kills=15, tier=21):
+        return SimpleNamespace(
+            name=name,
+            tag="na1",
+            team=team,
+            character=character,
+            currenttier=tier,
+            damage_made=3000,
+            stats=SimpleNamespace(
+                score=4800,
+                kills=kills,
+                deaths=12,
+                assists=4,
+                bodyshots=40,
+                headshots=10,
+                legshots=0,
+            ),
+        )
+
+    def factory(matchid, map_name="Ascent", mode="Competitive", players=None):
+        if players is None:
+            agents = ["Jett", "Sova", "Omen", "Killjoy", "Raze"]
+            players = [player(f"red{i}", "Red", agents[i]) for i in range(5)] + [
+                player(f"blue{i}", "Blue", agents[i]) for i in range(5)
+            ]
+        return SimpleNamespace(
+            metadata=SimpleNamespace(
+                matchid=matchid,
+                map=map_name,
+                mode=mode,
+                game_start=1721000000,
+                rounds_played=24,
+            ),
+            teams=SimpleNamespace(
+                red=SimpleNamespace(has_won=True), blue=SimpleNamespace(has_won=False)
+            ),
+            players=SimpleNamespace(all_players=players),
+        )
+
+    factory.player = player
+    return factory
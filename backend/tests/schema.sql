@@ -0,0 +1,230 @@
+DROP TABLE IF EXISTS User;
+DROP TABLE IF EXISTS Player;
+DROP TABLE IF EXISTS Player_Stats;
+DROP TABLE IF EXISTS Game;
+DROP TABLE IF EXISTS Maps;
+DROP TABLE IF EXISTS Agents;
+DROP TABLE IF EXISTS Agent_Stats;
+DROP TABLE IF EXISTS Map_Stats;
+DROP TABLE IF EXISTS Weapons;
+DROP TABLE IF EXISTS Weapon_Stats;
+DROP TABLE IF EXISTS Player_Aggregates;
+DROP TABLE IF EXISTS Player_Monthly;
+DROP TABLE IF EXISTS Player_Daily;
+DROP TABLE IF EXISTS Map_Agent_Tier;
+DROP TABLE IF EXISTS Player_Main_Agent;
+
+CREATE TABLE Maps (
+    map_id INTEGER PRIMARY KEY,
+    map_name VARCHAR(20)
+);
+
+CREATE TABLE Agents (
+    agent_id INTEGER PRIMARY KEY,
+    agent_name VARCHAR(20)
+);
+
+CREATE TABLE Weapons (
+    weapon_id INTEGER PRIMARY KEY,
+    weapon_name VARCHAR(20)
+);
+
+CREATE TABLE Player (
+    player_id VARCHAR(50) PRIMARY KEY,
+    current_tier_id INTEGER
+);
+
+CREATE TABLE User (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50),
+    player_id VARCHAR(50),
+    pro_lookalike VARCHAR(50),
+    password_hash VARCHAR(256)
+);
+
+CREATE UNIQUE INDEX uq_user_username ON User (username);
+
+CREATE TABLE Game (
+    game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    map_id INTEGER,
+    date_info VARCHAR(20),
+    riot_id VARCHAR(50),
+    played_at DATETIME
+);
+
+CREATE INDEX idx_game_played_at ON Game (played_at);
+CREATE UNIQUE INDEX uq_game_riot_id ON Game (riot_id);
+
+CREATE TABLE Player_Stats (
+    game_id INTEGER,
+    player_id VARCHAR(50),
+    team_side VARCHAR(2),
+    team_id INTEGER,
+    tier_id INTEGER,
+    agent_id INTEGER,
+    average_combat_score REAL,
+    kills INTEGER,
+    deaths INTEGER,
+    assists INTEGER,
+    kill_assist_trade_survive_ratio REAL,
+    average_damage_per_round REAL,
+    headshot_ratio REAL,
+    first_kills INTEGER,
+    first_deaths INTEGER,
+    won BOOLEAN
+);
+
+CREATE INDEX idx_player_stats_player_game ON Player_Stats (player_id, game_id);
+
+CREATE TABLE Agent_Stats (
+    agent_id INTEGER,
+    map_id INTEGER,
+    tier_id INTEGER,
+    kd REAL,
+    kills REAL,
+    deaths REAL,
+    assists REAL,
+    win_rate REAL,
+    pick_rate REAL,
+    acs REAL,
+    first_blood REAL,
+    num_matches INTEGER,
+    PRIMARY KEY (agent_id, map_id, tier_id)
+);
+
+CREATE TABLE Map_Stats (
+    map_id INTEGER,
+    tier_id INTEGER,
+    win_rate_attacks REAL,
+    PRIMARY KEY (map_id, tier_id)
+);
+
+CREATE TABLE Weapon_Stats (
+    map_id INTEGER,
+    tier_id INTEGER,
+    weapon_id INTEGER,
+    body_shot_p REAL,
+    leg_shot_p REAL,
+    head_shot_p REAL,
+    dmg_per_round REAL,
+    kill_per_match REAL,
+    PRIMARY KEY (map_id, tier_id, weapon_id)
+);
+
+CREATE TABLE Player_Aggregates (
+    player_id VARCHAR(50) NOT NULL,
+    agent_id INTEGER NOT NULL DEFAULT 0,
+    map_id INTEGER NOT NULL DEFAULT 0,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills REAL NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths REAL NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists REAL NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score REAL NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio REAL NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round REAL NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio REAL NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills REAL NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths REAL NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_won REAL NOT NULL DEFAULT 0,
+    n_won INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, agent_id, map_id)
+);
+
+CREATE TABLE Player_Monthly (
+    player_id VARCHAR(50) NOT NULL,
+    month DATE NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills REAL NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths REAL NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists REAL NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score REAL NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio REAL NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round REAL NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio REAL NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills REAL NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths REAL NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_won REAL NOT NULL DEFAULT 0,
+    n_won INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, month)
+);
+
+CREATE TABLE Player_Daily (
+    player_id VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills REAL NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths REAL NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists REAL NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score REAL NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio REAL NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round REAL NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio REAL NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills REAL NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths REAL NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_won REAL NOT NULL DEFAULT 0,
+    n_won INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, day)
+);
+
+CREATE TABLE Map_Agent_Tier (
+    map_id INTEGER NOT NULL,
+    agent_id INTEGER NOT NULL,
+    tier_id INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    sum_kills REAL NOT NULL DEFAULT 0,
+    n_kills INTEGER NOT NULL DEFAULT 0,
+    sum_deaths REAL NOT NULL DEFAULT 0,
+    n_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_assists REAL NOT NULL DEFAULT 0,
+    n_assists INTEGER NOT NULL DEFAULT 0,
+    sum_average_combat_score REAL NOT NULL DEFAULT 0,
+    n_average_combat_score INTEGER NOT NULL DEFAULT 0,
+    sum_kill_assist_trade_survive_ratio REAL NOT NULL DEFAULT 0,
+    n_kill_assist_trade_survive_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_average_damage_per_round REAL NOT NULL DEFAULT 0,
+    n_average_damage_per_round INTEGER NOT NULL DEFAULT 0,
+    sum_headshot_ratio REAL NOT NULL DEFAULT 0,
+    n_headshot_ratio INTEGER NOT NULL DEFAULT 0,
+    sum_first_kills REAL NOT NULL DEFAULT 0,
+    n_first_kills INTEGER NOT NULL DEFAULT 0,
+    sum_first_deaths REAL NOT NULL DEFAULT 0,
+    n_first_deaths INTEGER NOT NULL DEFAULT 0,
+    sum_won REAL NOT NULL DEFAULT 0,
+    n_won INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (map_id, agent_id, tier_id)
+);
+
+CREATE TABLE Player_Main_Agent (
+    player_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    agent_id INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_player_main_agent_agent ON Player_Main_Agent (agent_id, games);
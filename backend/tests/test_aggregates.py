@@ -0,0 +1,159 @@
+import asyncio
+import sqlite3
+from datetime import date
+
+import aggregates
+from database import engine
+from ingest import DimensionCache, ingest_matches
+from test_ingest import run_ingest
+
+
+def run_check():
+    async def check():
+        async with engine.connect() as connection:
+            return await aggregates.check(connection)
+
+    return asyncio.run(check())
+
+
+def test_ingest_updates_aggregates(db, make_match):
+    dimensions = DimensionCache()
+    player = make_match.player
+    run_ingest(dimensions, [make_match("a"), make_match("b", map_name="Bind")])
+    run_ingest(
+        dimensions,
+        [make_match("c", players=[player("red0", "Red", "Sova", kills=30)])],
+    )
+
+    assert run_check() == []
+    with sqlite3.connect(db) as connection:
+        rows = connection.execute(
+            "select agent_id, map_id, games, sum_kills, n_kills, n_first_kills from Player_Aggregates where player_id = 'red0#na1' order by agent_id, map_id"
+        ).fetchall()
+    assert rows == [
+        (0, 0, 3, 60, 3, 0),
+        (0, 1, 2, 45, 2, 0),
+        (0, 2, 1, 15, 1, 0),
+        (1, 0, 2, 30, 2, 0),
+        (2, 0, 1, 30, 1, 0),
+    ]
+    with sqlite3.connect(db) as connection:
+        assert connection.execute(
+            "select month, games, sum_kills from Player_Monthly where player_id = 'red0#na1'"
+        ).fetchall() == [("2024-07-01", 3, 60)]
+
+    def main_agent():
+        with sqlite3.connect(db) as connection:
+            return connection.execute(
+                "select agent_id, games from Player_Main_Agent where player_id = 'red0#na1'"
+            ).fetchone()
+
+    assert main_agent() == (1, 2)
+    run_ingest(
+        dimensions,
+        [
+            make_match(matchid, players=[player("red0", "Red", "Sova")])
+            for matchid in ("d", "e")
+        ],
+    )
+    assert main_agent() == (2, 3)
+    assert run_check() == []
+
+
+def test_rebuild_and_check(db, make_match, rebuild_aggregates):
+    run_ingest(DimensionCache(), [make_match("a")])
+    with sqlite3.connect(db) as connection:
+        # a backfill that bypasses ingest
+        connection.execute(
+            "insert into Player_Stats (game_id, player_id, agent_id, kills, first_kills) values (1, 'red0#na1', 1, 5, 2)"
+        )
+        connection.execute(
+            "insert into Player_Aggregates (player_id, agent_id, map_id, games) values ('ghost#na1', 0, 0, 1)"
+        )
+
+    mismatches = {m["key"]: m for m in run_check()}
+    assert set(mismatches) == {
+        ("red0#na1", 0, 0),
+        ("red0#na1", 1, 0),
+        ("red0#na1", 0, 1),
+        ("red0#na1", "2024-07-01"),
+        ("red0#na1", "2024-07-14"),
+        ("red0#na1",),
+        ("ghost#na1", 0, 0),
+    }
+    assert mismatches[("ghost#na1", 0, 0)]["expected"] is None
+
+    rebuild_aggregates()
+    assert run_check() == []
+
+
+def test_daily_totals_and_windows(db, make_match):
+    def on_day(matchid, day, kills):
+        match = make_match(
+            matchid, players=[make_match.player("red0", "Red", kills=kills)]
+        )
+        match.metadata.game_start += (day - 14) * 86400  # 2024-07-<day>
+        return match
+
+    dimensions = DimensionCache()
+    # later days first, so older games have to be folded into existing totals
+    run_ingest(dimensions, [on_day("a", 16, 10)])
+    run_ingest(dimensions, [on_day("b", 14, 20), on_day("c", 16, 30)])
+    run_ingest(dimensions, [on_day("d", 15, 40)])
+
+    assert run_check() == []
+    with sqlite3.connect(db) as connection:
+        assert connection.execute(
+            "select day, games, sum_kills from Player_Daily order by day"
+        ).fetchall() == [
+            ("2024-07-14", 1, 20),
+            ("2024-07-15", 2, 60),
+            ("2024-07-16", 4, 100),
+        ]
+
+    async def windows():
+        async with engine.connect() as connection:
+            return await aggregates.window_totals(
+                connection,
+                "red0#na1",
+                ["overall", "1d", "2d", "season", "2g", "30d"],
+                today=date(2024, 7, 16),
+                season_start=date(2024, 7, 15),
+            )
+
+    totals = asyncio.run(windows())
+    assert {t: (row["games"], row["sum_kills"]) for t, row in totals.items()} == {
+        "overall": (4, 100),
+        "1d": (2, 40),
+        "2d": (3, 80),
+        "season": (3, 80),
+        "2g": (2, 70),  # the two most recently ingested: d and c
+        "30d": (4, 100),
+    }
+
+
+def test_concurrent_ingests_share_a_day(db, make_match):
+    dimensions = DimensionCache()
+    matches = [
+        make_match(matchid, players=[make_match.player("red0", "Red", kills=kills)])
+        for matchid, kills in (("a", 10), ("b", 20))
+    ]
+
+    async def ingest(match):
+        async with engine.begin() as connection:
+            await ingest_matches(connection, dimensions, [match])
+
+    async def both():
+        # the first ingest of the day fills the dimension tables alone
+        await ingest(matches[0])
+        await asyncio.gather(
+            ingest(make_match("c", players=matches[0].players.all_players)),
+            ingest(matches[1]),
+        )
+
+    asyncio.run(both())
+    assert run_check() == []
+    with sqlite3.connect(db) as connection:
+        assert connection.execute(
+            "select day, games, sum_kills from Player_Daily"
+        ).fetchall() == [("2024-07-14", 3, 40)]
@@ -1,5 +1,7 @@
+import json
 import os
 import sqlite3
+from datetime import datetime, timedelta, timezone
 
 import sqlalchemy
 from fastapi.testclient import TestClient
@@ -18,3 +20,382 @@ def test_read_item():
     response = client.get("/items/5")
     assert response.status_code == 200
     assert response.json() == {"item_id": 5, "q": None}
+
+
+def test_player_stats(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, played_at) values (?, 1, ?)",
+            [(1, "2024-01-01 12:00:00"), (2, "2024-07-01 12:00:00")],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, average_combat_score, kills, deaths, assists, headshot_ratio, first_kills) values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (1, "chonk#na1", 1, 200, 20, 10, 4, 0.25, 2),
+                (2, "chonk#na1", 1, 300, 10, 20, 6, 0.35, 4),
+            ],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        response = client.get("/player-stats", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "playerID": "chonk#na1",
+        "games": 2,
+        "avgKillsPerGame": 15,
+        "avgDeathsPerGame": 15,
+        "avgAssistsPerGame": 5,
+        "avgCombatScorePerGame": 250,
+        "avgHeadShotRatio": 0.3,
+        "avgFirstBloodsPerGame": 3,
+    }
+
+
+def test_player_stats_windows(db, auth_headers, rebuild_aggregates):
+    today = datetime.now(timezone.utc)
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, played_at) values (?, 1, ?)",
+            [
+                (game_id, (today - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S"))
+                for game_id, days in [(1, 400), (2, 100), (3, 20), (4, 0)]
+            ],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, kills) values (?, 'chonk#na1', 1, ?)",
+            [(1, 10), (2, 20), (3, 30), (4, 40)],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        response = client.get(
+            "/player-stats",
+            params={"timespan": "overall,7d,3months,1year,3g"},
+            headers=auth_headers,
+        )
+        invalid = client.get(
+            "/player-stats", params={"timespan": "fortnight"}, headers=auth_headers
+        )
+    windows = response.json()["windows"]
+    assert {
+        span: (w["games"], w["avgKillsPerGame"]) for span, w in windows.items()
+    } == {
+        "overall": (4, 25),
+        "7d": (1, 40),
+        "3months": (2, 35),
+        "1year": (3, 30),
+        "3g": (3, 30),
+    }
+    assert invalid.status_code == 422
+
+
+def test_analyze_performance(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id) values (?, ?)", [(1, 1), (2, 2)]
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, average_combat_score, kills, deaths, assists) values (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (1, "chonk#na1", 1, 300, 20, 10, 4),
+                (2, "chonk#na1", 1, 100, 10, 20, 6),
+            ],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        response = client.get(
+            "/analyze_performance", params={"map_name": "Ascent"}, headers=auth_headers
+        )
+    assert response.json() == {
+        "kowalski_analysis": "[('chonk#na1', 'Ascent', 300.0, 20.0, 10.0, 4.0, 1, 200.0, 15.0, 15.0, 5.0, 2, '↑', '↑', '↑', '↓')]"
+    }
+
+
+def test_performance_breakdown(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id) values (?, ?)", [(1, 1), (2, 2)]
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, average_combat_score, kills, deaths, assists) values (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (1, "chonk#na1", 1, 300, 20, 10, 4),
+                (2, "chonk#na1", 1, 100, 10, 20, 6),
+            ],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        first = client.get("/performance_breakdown", headers=auth_headers).json()
+        with sqlite3.connect(db) as connection:
+            connection.execute("update Player_Aggregates set games = 4")
+        # cached until this player's next ingest
+        performance = client.app.state.performance
+        performance.on_ingest([{"pid": "someone#na1"}])
+        cached = client.get("/performance_breakdown", headers=auth_headers).json()
+        performance.on_ingest([{"pid": "chonk#na1"}])
+        performance.ttl = 0
+        fresh = client.get("/performance_breakdown", headers=auth_headers).json()
+        # an ingest on another instance: this one only notices once it expires
+        with sqlite3.connect(db) as connection:
+            connection.execute("update Player_Aggregates set games = 5")
+        expired = client.get("/performance_breakdown", headers=auth_headers).json()
+
+    assert first == {
+        "player_id": "chonk#na1",
+        "overall": {"matches": 2, "acs": 200, "kills": 15, "deaths": 15, "assists": 5},
+        "maps": {
+            "Ascent": {
+                "matches": 1,
+                "acs": 300,
+                "kills": 20,
+                "deaths": 10,
+                "assists": 4,
+                "trend": {"acs": "↑", "kills": "↑", "deaths": "↑", "assists": "↓"},
+            },
+            "Bind": {
+                "matches": 1,
+                "acs": 100,
+                "kills": 10,
+                "deaths": 20,
+                "assists": 6,
+                "trend": {"acs": "↓", "kills": "↓", "deaths": "↓", "assists": "↑"},
+            },
+        },
+    }
+    assert cached == first
+    assert fresh["overall"]["matches"] == 4
+    assert expired["overall"]["matches"] == 5
+    assert performance.stats == {"hits": 1, "misses": 3}
+
+
+def test_player_monthly_stats(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, played_at) values (?, 1, ?)",
+            [
+                (1, "2024-06-30 23:00:00"),
+                (2, "2024-07-01 01:00:00"),
+                (3, "2024-07-20 12:00:00"),
+            ],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, kills, deaths, assists, average_combat_score, headshot_ratio) values (?, 'chonk#na1', 1, ?, 10, 5, 200, 0.333)",
+            [(1, 10), (2, 20), (3, 25)],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        response = client.get("/player-monthly-stats", headers=auth_headers)
+    assert [
+        (m["month"], m["avgKillsPerGame"], m["avgFirstBloodsPerGame"])
+        for m in response.json()
+    ] == [
+        ("2024-06-01", 10, None),
+        ("2024-07-01", 22.5, None),
+    ]
+    assert response.json()[0]["avgHeadShotRatio"] == 0.33
+
+
+def test_map_agent_tier_cube(db, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, played_at) values (?, ?, '2024-07-01 12:00:00')",
+            [(1, 1), (2, 1), (3, 2)],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, average_combat_score, won) values (?, ?, ?, ?, ?, ?)",
+            [
+                (1, "p1", 1, 21, 250, 1),
+                (1, "p2", 2, 21, 200, 1),
+                (1, "p3", 3, 21, 200, 0),
+                (1, "p4", 1, 12, 100, 0),
+                (2, "p5", 3, 21, 210, 1),
+                (2, "p6", 1, 21, 200, 0),
+                (2, "p7", 5, 21, 190, 0),
+                (3, "p8", 5, 21, 300, 1),
+                # loaded before Player_Stats.won existed
+                (2, "p9", 4, 21, 180, None),
+            ],
+        )
+        connection.execute(
+            "insert into Agent_Stats (agent_id, map_id, tier_id, win_rate) values (4, 1, 21, 47.5)"
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        recommendations = client.get(
+            "/agent_recommendations", params={"map_name": "Ascent", "tier_id": 21}
+        )
+        top = client.get("/top_agent_map")
+        top_regular = client.get("/top_agent_map", params={"min_games": 2})
+        cube = client.get("/maps/Ascent/cube")
+        unknown = client.get("/maps/Nowhere/cube")
+
+    assert recommendations.json() == {
+        "agent_recommendations": "[('Sova', 100.0), ('Jett', 50.0), ('Omen', 50.0), ('Killjoy', 47.5), ('Raze', 0.0)]"
+    }
+    assert top.json() == {
+        "Ascent": [{"agent_name": "Omen", "max_acs": 205}],
+        "Bind": [{"agent_name": "Raze", "max_acs": 300}],
+    }
+    assert top_regular.json() == {"Ascent": [{"agent_name": "Omen", "max_acs": 205}]}
+    assert cube.json()["map_name"] == "Ascent"
+    assert [
+        (c["agent_name"], c["tier_id"], c["picks"], c["win_rate"], c["acs"])
+        for c in cube.json()["cells"]
+    ] == [
+        ("Jett", 12, 1, 0, 100),
+        ("Jett", 21, 2, 50, 225),
+        ("Killjoy", 21, 1, 47.5, 180),
+        ("Omen", 21, 2, 50, 205),
+        ("Raze", 21, 1, 0, 190),
+        ("Sova", 21, 1, 100, 200),
+    ]
+    assert unknown.status_code == 404
+
+
+def test_main_agent_endpoints(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id) values (?, ?, ?)",
+            [
+                (1, "chonk#na1", 2),
+                (2, "chonk#na1", 2),
+                (3, "chonk#na1", 1),
+                (1, "sova#na1", 2),
+                (2, "sova#na1", 2),
+                (3, "sova#na1", 2),
+                (1, "jett#na1", 1),
+            ],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        agent = client.get("/most_played_agent", headers=auth_headers)
+        players = client.get("/player_most_played_agent", headers=auth_headers)
+    assert agent.json() == {"most_played_agent": "Sova"}
+    assert players.json() == {
+        "player_most_played_agent": "[('sova#na1',), ('chonk#na1',)]"
+    }
+
+
+def test_dashboard(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, played_at) values (?, 1, '2024-07-01 12:00:00')",
+            [(1,), (2,)],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, average_combat_score, kills, deaths, assists) values (?, 'chonk#na1', 2, ?, 10, 10, 5)",
+            [(1, 200), (2, 300)],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        full = client.get("/dashboard", headers=auth_headers)
+        separate = {
+            "player_stats": client.get("/player-stats", headers=auth_headers),
+            "most_played_agent": client.get("/most_played_agent", headers=auth_headers),
+            "most_played_map": client.get("/most_played_map", headers=auth_headers),
+            "pro_lookalike": client.get("/pro_lookalike", headers=auth_headers),
+            "matches": client.get("/matches", headers=auth_headers),
+        }
+        some = client.get(
+            "/dashboard",
+            params={"fields": "most_played_map,user", "timespan": "season"},
+            headers=auth_headers,
+        )
+        unknown = client.get(
+            "/dashboard", params={"fields": "user,secrets"}, headers=auth_headers
+        )
+
+    assert full.status_code == 200
+    for name, response in separate.items():
+        assert full.json()[name] == response.json()
+    assert full.json()["user"]["player_id"] == "chonk#na1"
+    assert "password_hash" not in full.json()["user"]
+    assert some.json() == {
+        "most_played_map": {"most_played_map": "Ascent"},
+        "user": full.json()["user"],
+    }
+    assert unknown.status_code == 422
+
+
+def test_homepage_stats(db):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Agent_Stats (agent_id, map_id, tier_id, kd, win_rate, pick_rate, acs, num_matches) values (?, ?, 21, ?, ?, 0.2, 200, 10)",
+            [(1, 1, 1.2, 0.55), (1, 2, 1.0, 0.45), (2, 1, 0.9, 0.6)],
+        )
+        connection.execute("insert into Weapons values (1, 'Vandal')")
+        connection.execute(
+            "insert into Weapon_Stats (map_id, tier_id, weapon_id) values (1, 21, 1)"
+        )
+        connection.execute("insert into Map_Stats values (3, 21, 0.5)")
+
+    with TestClient(app) as client:
+        first = client.get("/homepage-stats").json()
+        with sqlite3.connect(db) as connection:
+            connection.execute("update Agent_Stats set kd = 2 where agent_id = 2")
+        # served from the snapshot until a refresh
+        assert client.get("/homepage-stats").json() == first
+
+        async def ingest_happened():
+            homepage = client.app.state.homepage
+            homepage.on_ingest([{"tid": 12}])
+            await homepage.rebuild_task
+
+        client.portal.call(ingest_happened)  # type: ignore
+        second = client.get("/homepage-stats").json()
+
+    assert first["best_agent"] == {"agent_name": "Jett", "kd": 1.1}
+    assert first["best_weapon"] == {"weapon_name": "Vandal", "game_count": 1}
+    assert first["best_map"] == {"map_name": "Haven", "game_count": 1}
+    assert [a["agent_name"] for a in first["top_agents"]] == ["Sova", "Jett"]
+    assert second["best_agent"] == {"agent_name": "Sova", "kd": 2}
+    assert second["data_version"] == first["data_version"] + 1
+    assert second["computed_at"] > first["computed_at"]
+
+
+def test_matches_pagination_and_export(db, auth_headers):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, date_info) values (?, 1, '2024-07-01')",
+            [(game_id,) for game_id in range(1, 8)],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, kills, deaths) values (?, ?, 2, ?, 10)",
+            [(game_id, "chonk#na1", game_id) for game_id in range(1, 8)]
+            + [(1, "sova#na1", 30)],
+        )
+
+    with TestClient(app) as client:
+        first = client.get("/matches", params={"limit": 3}, headers=auth_headers)
+        cursor = first.headers["X-Next-Cursor"]
+        second = client.get(
+            "/matches", params={"limit": 3, "after": cursor}, headers=auth_headers
+        )
+        last = client.get(
+            "/matches",
+            params={"limit": 3, "after": second.headers["X-Next-Cursor"]},
+            headers=auth_headers,
+        )
+        newest = client.get(
+            "/matches", params={"limit": 2, "order": "desc"}, headers=auth_headers
+        )
+        ndjson = client.get("/matches/export", headers=auth_headers)
+        csv = client.get(
+            "/matches/export", params={"format": "csv"}, headers=auth_headers
+        )
+
+    assert [m["game_id"] for m in first.json()] == [1, 2, 3]
+    assert first.json()[0]["agent_name"] == "Sova"
+    assert first.json()[0]["map_name"] == "Ascent"
+    assert cursor == "3"
+    assert [m["kills"] for m in second.json()] == [4, 5, 6]
+    assert [m["game_id"] for m in last.json()] == [7]
+    assert "X-Next-Cursor" not in last.headers
+    assert [m["game_id"] for m in newest.json()] == [7, 6]
+
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [row["game_id"] for row in exported] == list(range(1, 8))
+    assert exported[6]["kills"] == 7 and exported[6]["date_info"] == "2024-07-01"
+    lines = csv.text.splitlines()
+    assert lines[0].startswith("game_id,date_info,map_name")
+    assert len(lines) == 8
@@ -0,0 +1,162 @@
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+
+import jwt
+import pytest
+from auth import (
+    PasswordPool,
+    PasswordPoolBusy,
+    create_access_token,
+    get_password_hash,
+    get_user,
+    register_user,
+)
+from config import get_settings
+from database import engine
+from fastapi.testclient import TestClient
+from main import app
+
+MIGRATIONS = Path(__file__).parents[1] / "migrations"
+
+
+def test_user_cache(db, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_usernames", {"chonk"})
+    with TestClient(app) as client:
+        first = client.get("/users/me", headers=auth_headers)
+        second = client.get("/users/me", headers=auth_headers)
+        stats = client.get("/admin/user_cache", headers=auth_headers).json()
+        deleted = client.post("/delete_user", headers=auth_headers)
+        after = client.get("/users/me", headers=auth_headers)
+
+    assert first.json() == second.json()
+    assert first.json()["player_id"] == "chonk#na1"
+    assert stats == {
+        "hits": 2,
+        "misses": 1,
+        "claims": 0,
+        "size": 1,
+        "max_size": 10_000,
+    }
+    assert deleted.status_code == 200
+    # dropped from the cache along with the row
+    assert after.status_code == 401
+
+
+def test_player_claim(db, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_player_claim", True)
+    token = create_access_token({"sub": "chonk", "uid": 1, "pid": "chonk#na1"})
+    headers = {"Authorization": f"Bearer {token}"}
+    with sqlite3.connect(db) as connection:
+        connection.execute("delete from User")
+
+    with TestClient(app) as client:
+        claimed = client.get("/most_played_agent", headers=headers)
+        cache = client.app.state.user_cache
+        stats = dict(cache.stats)
+        cache.invalidate("chonk")
+        # a token from before the change goes back to the database
+        revoked = client.get("/most_played_agent", headers=headers)
+
+    assert claimed.status_code == 200
+    assert stats["claims"] == 1
+    assert revoked.status_code == 401
+
+
+def test_player_claim_login(db, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_player_claim", True)
+    with sqlite3.connect(db) as connection:
+        connection.execute("update User set pro_lookalike = 'TenZ'")
+        connection.execute(
+            "update User set password_hash = ?", (get_password_hash("hunter2"),)
+        )
+
+    with TestClient(app) as client:
+        token = client.post(
+            "/token", data={"username": "chonk", "password": "hunter2"}
+        ).json()["access_token"]
+        claimed = client.get(
+            "/users/me", headers={"Authorization": f"Bearer {token}"}
+        ).json()
+        claims = client.app.state.user_cache.stats["claims"]
+        from_database = client.get("/users/me", headers=auth_headers).json()
+
+    payload = jwt.decode(token, options={"verify_signature": False})
+    # claim tokens outlive a deletion on other instances, so they are short-lived
+    assert payload["exp"] - payload["iat"] == 10 * 60
+    assert claims == 1
+    assert claimed == from_database
+    assert claimed["pro_lookalike"] == "TenZ"
+
+
+def test_login_registers_once(db):
+    with TestClient(app) as client:
+        login = lambda password: client.post(  # noqa: E731
+            "/token", data={"username": "newbie", "password": password}
+        )
+        created = login("hunter2")
+        wrong = login("hunter3")
+        right = login("hunter2")
+
+    assert created.status_code == 200
+    assert wrong.status_code == 401
+    assert right.status_code == 200
+    with sqlite3.connect(db) as connection:
+        assert connection.execute("select player_id from Player").fetchall() == [
+            ("newbie",)
+        ]
+        assert connection.execute("select count(*) from User").fetchone() == (1,)
+
+
+def test_password_pool_sheds_load():
+    async def run():
+        pool = PasswordPool(workers=1, queue=1)
+        slow = [asyncio.create_task(pool.run(time.sleep, 0.1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run(time.sleep, 0)
+        await asyncio.gather(*slow)
+        # a slot is free again
+        await pool.run(time.sleep, 0)
+        pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_concurrent_signups(db):
+    with sqlite3.connect(db) as connection:
+        # User as it stood before the migrations, with a name registered twice
+        connection.executescript(
+            """
+            drop table User;
+            create table User (
+                user_id integer primary key autoincrement,
+                username varchar(50),
+                player_id varchar(50),
+                pro_lookalike varchar(50),
+                password_hash varchar(256)
+            );
+            insert into User (username, player_id, password_hash)
+            values ('twice', 'twice', 'first'), ('twice', 'twice', 'second');
+            """
+        )
+        connection.executescript(
+            (MIGRATIONS / "007_user_username_unique.sql").read_text()
+        )
+
+    async def run():
+        await asyncio.gather(
+            register_user(engine, "racer", "a"), register_user(engine, "racer", "b")
+        )
+        return await get_user(engine, "racer"), await get_user(engine, "twice")
+
+    racer, twice = asyncio.run(run())
+    with sqlite3.connect(db) as connection:
+        rows = connection.execute(
+            "select username, password_hash from User order by user_id"
+        ).fetchall()
+    assert rows[0] == ("twice", "first")
+    assert [username for username, _ in rows] == ["twice", "racer"]
+    assert racer.password_hash == rows[1][1]
+    assert twice.password_hash == "first"
@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+
+from database import engine
+from ingest import DimensionCache, bulk_refresh, ingest_matches
+
+
+async def run_ingest_async(dimensions, matches):
+    async with engine.begin() as connection:
+        report, _ = await ingest_matches(connection, dimensions, matches)
+    return report
+
+
+def run_ingest(dimensions, matches):
+    return asyncio.run(run_ingest_async(dimensions, matches))
+
+
+def test_ingest_matches(db, make_match):
+    dimensions = DimensionCache()
+    report = run_ingest(
+        dimensions,
+        [
+            make_match("a"),
+            make_match("b", map_name="Bind"),
+            make_match("c", mode="Unrated"),
+        ],
+    )
+
+    assert {r["matchid"]: r["status"] for r in report} == {
+        "a": "inserted",
+        "b": "inserted",
+        "c": "skipped",
+    }
+    assert dimensions.maps["Bind"] == 2
+    with sqlite3.connect(db) as connection:
+        assert connection.execute("select count(*) from Game").fetchone() == (2,)
+        assert connection.execute("select count(*) from Player_Stats").fetchone() == (
+            20,
+        )
+
+    report = run_ingest(dimensions, [make_match("a"), make_match("d")])
+    assert {r["matchid"]: r["status"] for r in report} == {
+        "a": "exists",
+        "d": "inserted",
+    }
+    with sqlite3.connect(db) as connection:
+        assert connection.execute("select count(*) from Player_Stats").fetchone() == (
+            30,
+        )
+
+
+def test_ingest_unknown_map(db, make_match):
+    report = run_ingest(DimensionCache(), [make_match("a", map_name="Abyss")])
+
+    assert report == [{"matchid": "a", "status": "unknown_dimension"}]
+    with sqlite3.connect(db) as connection:
+        assert connection.execute("select count(*) from Game").fetchone() == (0,)
+
+
+def test_bulk_refresh_writes_shared_matches_once(db, make_match):
+    class FakeHenrik:
+        stats = {"requests": 0, "cache_hits": 0}
+        histories = {
+            "a": [make_match("m1"), make_match("m2")],
+            "b": [make_match("m2"), make_match("m3")],
+            "c": [make_match("m1"), make_match("m3", mode="Unrated")],
+        }
+
+        async def get_match_history(self, region, name, tag, game_mode):
+            self.stats["requests"] += 1
+            if name == "missing":
+                raise ValueError("not found")
+            return self.histories[name]
+
+    dimensions = DimensionCache()
+    report = asyncio.run(
+        bulk_refresh(
+            FakeHenrik(),
+            lambda matches: run_ingest_async(dimensions, matches),
+            ["a#na1", "b#na1", "c#na1", "missing#na1"],
+        )
+    )
+
+    assert report["errors"] == {"missing#na1": "not found"}
+    assert report["api_requests"] == 4
+    assert report["fetched"] == 6
+    assert report["unique"] == 3
+    assert report["deduplicated"] == 3
+    assert report["inserted"] == 3
+    assert report["player_stats"] == 30
+    with sqlite3.connect(db) as connection:
+        assert connection.execute("select count(*) from Game").fetchone() == (3,)
+
+
+def test_ingest_match_written_concurrently(db, make_match):
+    class RacingDimensions(DimensionCache):
+        async def resolve(self, connection, map_names, agent_names):
+            await super().resolve(connection, map_names, agent_names)
+            # another worker commits match "a" between the existence check and the insert
+            with sqlite3.connect(db) as other:
+                other.execute("insert into Game (map_id, riot_id) values (1, 'a')")
+
+    report = run_ingest(RacingDimensions(), [make_match("a"), make_match("b")])
+
+    assert {r["matchid"]: r["status"] for r in report} == {
+        "a": "exists",
+        "b": "inserted",
+    }
+    with sqlite3.connect(db) as connection:
+        assert connection.execute("select count(*) from Game").fetchone() == (2,)
+        assert connection.execute(
+            "select count(distinct game_id), count(*) from Player_Stats"
+        ).fetchone() == (1, 10)
+        assert connection.execute(
+            "select games from Player_Aggregates where player_id = 'red0#na1' and agent_id = 0 and map_id = 0"
+        ).fetchone() == (1,)
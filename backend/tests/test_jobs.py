@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+
+from jobs import JobQueue
+
+
+def test_job_queue(tmp_path):
+    calls = []
+
+    async def handler(player_id, progress):
+        await progress("fetching")
+        calls.append(player_id)
+        if player_id == "bad#na1":
+            raise ValueError("no such player")
+        return {"matches": []}
+
+    async def run():
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        first = await queue.enqueue("chonk#na1")
+        assert await queue.enqueue("chonk#na1") == first
+        failing = await queue.enqueue("bad#na1")
+        assert (await queue.stats())["queue_depth"] == 2
+
+        queue.start(handler, workers=2)
+        for _ in range(100):
+            stats = await queue.stats()
+            if stats["queue_depth"] == 0 and stats["running"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        done, failed = await queue.get(first), await queue.get(failing)
+        stats = await queue.stats()
+        await queue.stop()
+        return done, failed, stats
+
+    done, failed, stats = asyncio.run(run())
+
+    assert sorted(calls) == ["bad#na1", "chonk#na1"]
+    assert done["status"] == "done" and done["result"] == {"matches": []}
+    assert failed["status"] == "failed" and failed["error"] == "no such player"
+    assert stats["done"] == 1 and stats["failed"] == 1
+
+
+def test_job_queue_recovers_running_jobs(tmp_path):
+    async def run():
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        job_id = await queue.enqueue("chonk#na1")
+        await queue.claim()
+        queue.connection.close()
+        return await JobQueue(str(tmp_path / "jobs.db")).get(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "pending"
+
+
+def test_job_worker_survives_errors_and_prunes(tmp_path):
+    calls = []
+
+    async def handler(player_id, progress):
+        calls.append(player_id)
+        return {"matches": []}
+
+    async def run():
+        queue = JobQueue(str(tmp_path / "jobs.db"), retention=0, retry_delay=0.01)
+        claim = queue.claim
+        errors = [sqlite3.OperationalError("database is locked")]
+
+        async def flaky_claim():
+            if errors:
+                raise errors.pop()
+            return await claim()
+
+        queue.claim = flaky_claim
+        job_id = await queue.enqueue("chonk#na1")
+        queue.start(handler, workers=1)
+        # done, then deleted once the idle worker prunes
+        for _ in range(100):
+            if calls and await queue.get(job_id) is None:
+                break
+            await asyncio.sleep(0.01)
+        job, stats = await queue.get(job_id), await queue.stats()
+        await queue.stop()
+        return job, stats
+
+    job, stats = asyncio.run(run())
+
+    assert calls == ["chonk#na1"]
+    assert job is None
+    assert stats["workers"] == 1 and stats["done"] == 0
@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+
+from database import engine
+from lookalike import ProIndex, SimilarityIndex, match_pros
+
+COLUMNS = "game_id, player_id, agent_id, tier_id, average_combat_score, deaths, assists, kill_assist_trade_survive_ratio, average_damage_per_round, headshot_ratio, first_kills, first_deaths"
+
+
+def test_match_pros(db, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            f"insert into Player_Stats ({COLUMNS}) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                # two Jett pros: an entry fragger and a passive one
+                (1, "TenZ", 1, 21, 280, 14, 3, 0.7, 170, 0.30, 4, 3),
+                (2, "TenZ", 1, 21, 260, 15, 2, 0.7, 160, 0.28, 5, 3),
+                (1, "Boaster", 1, 21, 180, 16, 8, 0.8, 120, 0.18, 1, 1),
+                (3, "Sova pro", 2, 21, 240, 14, 3, 0.7, 150, 0.30, 4, 3),
+                # users; ingested rows carry no KAST or first kills/deaths
+                (4, "fragger#na1", 1, 12, 275, 14, 2, None, 168, 0.31, None, None),
+                (5, "fragger#na1", 2, 12, 200, 14, 5, None, 130, 0.20, None, None),
+                (6, "fragger#na1", 1, 12, 265, 15, 3, None, 160, 0.29, None, None),
+                (7, "support#na1", 1, 12, 170, 17, 9, None, 115, 0.17, None, None),
+            ],
+        )
+    rebuild_aggregates()
+
+    async def run():
+        index = ProIndex(engine)
+        return await match_pros(index, ["fragger#na1", "support#na1", "nobody#na1"])
+
+    assert asyncio.run(run()) == {
+        "fragger#na1": "TenZ",
+        "support#na1": "Boaster",
+        "nobody#na1": None,
+    }
+
+
+def test_similarity_index(db, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            f"insert into Player_Stats ({COLUMNS}) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (1, "me#na1", 1, 12, 250, 14, 3, 0.7, 160, 0.28, 3, 2),
+                (2, "me#na1", 1, 12, 260, 15, 3, 0.7, 165, 0.29, 3, 2),
+                (1, "twin#na1", 1, 12, 255, 14, 3, 0.7, 162, 0.28, 3, 2),
+                # filtered by the tier of their latest game, not their best
+                (2, "close#na1", 2, 16, 240, 15, 4, 0.7, 150, 0.26, 3, 2),
+                (3, "close#na1", 2, 14, 235, 15, 4, 0.7, 150, 0.25, 2, 2),
+                (4, "far#na1", 1, 12, 120, 18, 10, 0.6, 90, 0.10, 0, 3),
+            ],
+        )
+    rebuild_aggregates()
+
+    async def run(brute_force_limit):
+        index = SimilarityIndex(engine)
+        index.BRUTE_FORCE_LIMIT = brute_force_limit
+        await index.ready()
+        ids = lambda found: [n["player_id"] for n in found["results"]]  # noqa: E731
+        return (
+            ids(index.neighbours("me#na1", k=2)),
+            ids(index.neighbours("me#na1", k=2, page=1)),
+            ids(index.neighbours("me#na1", agent_id=1)),
+            ids(index.neighbours("me#na1", tier=14)),
+            ids(index.neighbours("me#na1", min_games=2)),
+            index.neighbours("nobody#na1"),
+        )
+
+    expected = (
+        ["twin#na1", "close#na1"],
+        ["far#na1"],
+        ["twin#na1", "far#na1"],
+        ["close#na1"],
+        ["close#na1"],
+        None,
+    )
+    # brute force over the filtered rows and the tree walk agree
+    assert asyncio.run(run(50_000)) == expected
+    assert asyncio.run(run(0)) == expected
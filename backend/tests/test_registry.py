@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+from config import get_settings
+from fastapi.testclient import TestClient
+from main import app
+from registry import BUILTIN, ModelRegistry, publish, read_manifest
+
+
+def artifact(tmp_path, name, intercept):
+    model = json.loads(open("model.json").read())
+    model["intercept"] = intercept
+    path = tmp_path / name
+    path.write_text(json.dumps(model))
+    return path
+
+
+def test_registry_swaps_and_rejects_bad_checksums(tmp_path):
+    directory = tmp_path / "models"
+
+    async def run():
+        registry = ModelRegistry(directory, "model.json")
+        await registry.ready()
+        loaded = [registry.model.version]
+
+        publish(directory, artifact(tmp_path, "a.json", 1.0), "v1")
+        registry.schedule_rebuild()
+        await registry.rebuild_task
+        loaded.append((registry.model.version, registry.model.intercept))
+
+        # published but not yet active, then tampered with
+        publish(directory, artifact(tmp_path, "b.json", 2.0), "v2", activate=False)
+        (directory / "v2.json").write_text(open("model.json").read())
+        with pytest.raises(ValueError):
+            await registry.activate("v2")
+        with pytest.raises(KeyError):
+            await registry.activate("v3")
+        loaded.append(registry.model.version)
+
+        await registry.activate(BUILTIN)
+        loaded.append(registry.model.version)
+        return loaded
+
+    assert asyncio.run(run()) == [BUILTIN, ("v1", 1.0), "v1", BUILTIN]
+    assert read_manifest(directory)["active"] is None
+    with pytest.raises(ValueError):
+        publish(directory, artifact(tmp_path, "c.json", 3.0), "v1")
+
+
+def test_model_admin_endpoints(db, auth_headers, tmp_path, monkeypatch):
+    directory = tmp_path / "models"
+    monkeypatch.setattr(get_settings(), "admin_usernames", {"chonk"})
+    monkeypatch.setattr(get_settings(), "win_model_registry", str(directory))
+    publish(directory, artifact(tmp_path, "a.json", 1.0), "v1")
+
+    with TestClient(app) as client:
+        score = lambda: client.post(  # noqa: E731
+            "/score_matches", json={"matches": [{}]}, headers=auth_headers
+        ).json()
+        first = score()
+        publish(directory, artifact(tmp_path, "b.json", 2.0), "v2")
+        client.portal.call(client.app.state.models.build)  # type: ignore
+        second = score()
+        rolled_back = client.post("/admin/models/v1/activate", headers=auth_headers)
+        third = score()
+        unknown = client.post("/admin/models/v9/activate", headers=auth_headers)
+        listed = client.get("/admin/models", headers=auth_headers)
+
+    assert [s["model_version"] for s in (first, second, third)] == ["v1", "v2", "v1"]
+    assert rolled_back.json()["loaded"] == "v1"
+    assert unknown.status_code == 404
+    versions = listed.json()["versions"]
+    assert [v["version"] for v in versions] == [BUILTIN, "v1", "v2"]
+    assert [v["active"] for v in versions] == [False, True, False]
+    assert all(len(v["sha256"]) == 64 for v in versions)
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from riot_api import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HenrikAPIError,
+    HenrikClient,
+    retry_after,
+)
+
+
+def match_payload(matchid):
+    player = {
+        "name": "chonk",
+        "tag": "na1",
+        "team": "Red",
+        "character": "Jett",
+        "currenttier": 21,
+        "damage_made": 3000,
+        "stats": {"score": 4800, "kills": 20, "deaths": 10, "assists": 3},
+    }
+    return {
+        "metadata": {
+            "matchid": matchid,
+            "map": "Ascent",
+            "mode": "Competitive",
+            "game_start": 1721000000,
+            "rounds_played": 24,
+        },
+        "players": {"all_players": [player]},
+        "teams": {"red": {"has_won": True}, "blue": {"has_won": False}},
+        "rounds": [{"winning_team": "Red"}],
+    }
+
+
+@pytest.fixture
+def henrik():
+    """Local stand-in for api.henrikdev.xyz; queue statuses in `failures`."""
+    state = {"hits": [], "failures": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["hits"].append(self.path)
+            if state["failures"]:
+                self.send_response(state["failures"].pop(0))
+                self.send_header("retry-after", "0")
+                self.end_headers()
+                self.wfile.write(b'{"errors": []}')
+                return
+            if self.path.startswith("/valorant/v3/matches/na/chonk/na1"):
+                body = {"status": 200, "data": [match_payload("a"), match_payload("b")]}
+            elif self.path.startswith("/valorant/v2/match/"):
+                body = {"status": 200, "data": match_payload(self.path.split("/")[-1])}
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}"
+    yield state
+    server.shutdown()
+
+
+def client(henrik, tmp_path, **kwargs):
+    return HenrikClient(
+        "key", base_url=henrik["url"], cache_dir=str(tmp_path), backoff=0, **kwargs
+    )
+
+
+def test_match_history_is_cached(henrik, tmp_path):
+    async def run():
+        api = client(henrik, tmp_path)
+        first = await api.get_match_history("na", "chonk", "na1")
+        second = await api.get_match_history("na", "chonk", "na1")
+        match = await api.get_match("a")
+        await api.aclose()
+        return first, second, match
+
+    first, second, match = asyncio.run(run())
+
+    assert [m.metadata.matchid for m in first] == ["a", "b"]
+    assert second == first
+    assert match == first[0]
+    assert len(henrik["hits"]) == 1
+
+
+def test_retries_then_opens_circuit(henrik, tmp_path):
+    async def run():
+        api = client(henrik, tmp_path, breaker=CircuitBreaker(threshold=3))
+        henrik["failures"] = [429, 503]
+        match = await api.get_match("c")
+        henrik["failures"] = [500] * 4
+        with pytest.raises(CircuitOpenError):
+            await api.get_match("d")
+        hits = len(henrik["hits"])
+        with pytest.raises(CircuitOpenError):
+            await api.get_match("e")
+        await api.aclose()
+        return match, hits
+
+    match, hits = asyncio.run(run())
+
+    assert match.metadata.matchid == "c"
+    assert hits == 6
+    assert len(henrik["hits"]) == hits
+
+
+def test_client_errors_are_not_retried(henrik, tmp_path):
+    async def run():
+        api = client(henrik, tmp_path)
+        with pytest.raises(HenrikAPIError) as error:
+            await api.get_match_history("na", "nobody", "na1")
+        await api.aclose()
+        return error.value
+
+    assert asyncio.run(run()).status == 404
+    assert len(henrik["hits"]) == 1
+
+
+def test_half_open_trial_is_released(henrik, tmp_path):
+    async def run():
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        api = client(henrik, tmp_path, retries=0, breaker=breaker)
+        real_get = api.http.get
+
+        async def redirect_loop(*args, **kwargs):
+            raise httpx.TooManyRedirects("redirect loop")
+
+        api.http.get = redirect_loop
+        with pytest.raises(HenrikAPIError):
+            await api.get_match("a")
+        assert breaker.opened_at is not None
+
+        # the half-open trial is cancelled while it waits for a token
+        api.bucket.drain(60)
+        trial = asyncio.create_task(api.get_match("a"))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert not breaker.trial_running
+
+        api.bucket.tokens = 1
+        api.http.get = real_get
+        match = await api.get_match("a")
+        await api.aclose()
+        return match, breaker
+
+    match, breaker = asyncio.run(run())
+
+    assert match.metadata.matchid == "a"
+    assert breaker.opened_at is None
+
+
+def test_retry_after():
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert retry_after("3", 1.0) == 3.0
+    assert 28 < retry_after(format_datetime(later, usegmt=True), 1.0) <= 30
+    assert retry_after("Thu, 01 Jan 1970 00:00:00 GMT", 1.0) == 0.0
+    assert retry_after("soon", 1.5) == 1.5
+    assert retry_after(None, 1.5) == 1.5
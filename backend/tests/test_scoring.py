@@ -0,0 +1,119 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from main import app
+from scoring import WinModel, feature_columns, load_pipeline
+
+LINES = [
+    {
+        "agent": "Jett",
+        "side": "t",
+        "tier": 21,
+        "kills": 20,
+        "deaths": 12,
+        "assists": 4,
+        "average_damage_per_round": 160.0,
+        "first_kills": 3,
+        "first_deaths": 1,
+        "kill_assist_trade_survive_ratio": 75.0,
+        "headshot_ratio": 25.0,
+    },
+    # unknown agent, missing side and numbers
+    {
+        "agent": "Nobody",
+        "kills": 5,
+        "deaths": 18,
+        "kill_assist_trade_survive_ratio": 40.0,
+        "headshot_ratio": 10.0,
+    },
+]
+
+
+def test_win_model_matches_pipeline(tmp_path):
+    pipeline = load_pipeline("model.pkl")
+    compiled = WinModel.from_pipeline(pipeline)
+    compiled.save(tmp_path / "model.json")
+    model = WinModel.load(tmp_path / "model.json")
+    columns = feature_columns(LINES, model)
+    probabilities, terms = model.predict(columns)
+
+    # what /model_matches used to feed the pipeline
+    frame = pd.DataFrame(columns)
+    for column in ("kill_assist_trade_survive_ratio", "headshot_ratio"):
+        frame[column] = frame[column].astype(str)
+    expected = pipeline.predict_proba(frame)[:, 1]
+
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-12)
+    assert probabilities.tolist() == compiled.predict(columns)[0].tolist()
+    # the shipped artifact is the current model.pkl's
+    assert (tmp_path / "model.json").read_text() == open("model.json").read()
+    assert columns["kills_deaths"] == [8, -13]
+    assert terms[1, model.features.index("agent")] == 0
+    np.testing.assert_allclose(
+        model.intercept + terms.sum(axis=1), np.log(expected / (1 - expected))
+    )
+
+
+def test_score_matches(db, auth_headers):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id) values (?, 1)", [(1,), (2,)]
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, team_side, tier_id, kills, deaths, assists, average_damage_per_round, headshot_ratio) values (?, ?, 1, 't', 21, 20, 12, 4, 160, 25)",
+            [(1, "chonk#na1"), (2, "chonk#na1"), (2, "sova#na1")],
+        )
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/score_matches",
+            json={"matches": LINES, "game_ids": [2, 3]},
+            headers=auth_headers,
+        )
+        page = client.get("/model_matches", headers=auth_headers)
+
+    body = response.json()
+    assert body["features"][-2:] == ["agent", "side"]
+    assert [score["game_id"] for score in body["scores"]] == [None, None, 2]
+    first = body["scores"][0]
+    assert first["win_probability"] > body["scores"][1]["win_probability"]
+    logit = body["intercept"] + sum(first["contributions"])
+    assert np.isclose(1 / (1 + np.exp(-logit)), first["win_probability"])
+    assert page.json() == [body["scores"][2]["win_probability"]] * 2
+
+
+def test_stored_rows_score_like_scraped_lines(db, auth_headers):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, riot_id) values (?, 1, ?)",
+            [(1, "abc"), (2, None)],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, team_side, tier_id, kills, deaths, assists, average_damage_per_round, kill_assist_trade_survive_ratio, headshot_ratio) values (?, 'chonk#na1', 1, 't', 21, 20, 12, 4, 160, ?, ?)",
+            # ingested (a fraction, no KAST) and loaded from the scraper's CSVs
+            [(1, None, 0.25), (2, 75, 25)],
+        )
+    # the same games as CSV lines, with "75%" and "25%" parsed
+    line = {
+        "agent": "Jett",
+        "side": "t",
+        "tier": 21,
+        "kills": 20,
+        "deaths": 12,
+        "assists": 4,
+        "average_damage_per_round": 160.0,
+        "headshot_ratio": 25.0,
+    }
+    lines = [line, {**line, "kill_assist_trade_survive_ratio": 75.0}]
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/score_matches",
+            json={"matches": lines, "game_ids": [1, 2]},
+            headers=auth_headers,
+        )
+
+    scores = [score["win_probability"] for score in response.json()["scores"]]
+    np.testing.assert_allclose(scores[2:], scores[:2], rtol=1e-12)
@@ -0,0 +1,140 @@
+import asyncio
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pyarrow.dataset as ds
+from database import engine
+from snapshot import Snapshot, read
+from train import read_player_data
+
+CSV = Path(__file__).parents[2] / "cs411_ml" / "csv5.txt"
+
+
+def scraper_output(directory: Path):
+    directory.mkdir()
+    shutil.copy(CSV, directory / "5player.csv")
+    (directory / "5games.csv").write_text(
+        "game_id,map_name,date_info\n"
+        "16032,Ascent,2024-06-30 23:10:00\n"
+        "16033,Bind,2024-07-01 01:00:00\n"
+        "16034,Haven,1720000000\n"
+    )
+
+
+def test_snapshot_from_csvs(tmp_path):
+    scraper_output(tmp_path / "scraped")
+    root = tmp_path / "snapshot"
+
+    first = Snapshot(root).append_csvs(
+        tmp_path / "scraped" / "5games.csv",
+        tmp_path / "scraped" / "5player.csv",
+        chunksize=7,
+    )
+    # a second run appends nothing
+    again = Snapshot(root).append_csvs(
+        tmp_path / "scraped" / "5games.csv", tmp_path / "scraped" / "5player.csv"
+    )
+
+    assert first == (3, 60)
+    assert again == (0, 0)
+    assert sorted(p.name for p in (root / "player_stats").iterdir()) == [
+        "month=2024-06",
+        "month=2024-07",
+    ]
+    games = read(root, "game").to_pandas().sort_values("game_id")
+    assert games["month"].tolist() == ["2024-06", "2024-07", "2024-07"]
+    assert str(games["played_at"].iloc[2]) == "2024-07-03 09:46:40"
+
+    july = read(
+        root,
+        "player_stats",
+        ["game_id", "kill_assist_trade_survive_ratio", "kills_deaths", "tier"],
+        ds.field("month") == "2024-07",
+    ).to_pandas()
+    assert set(july["game_id"]) == {16033, 16034}
+    assert set(july["tier"]) == {21}
+
+    everything = read(root, "player_stats").to_pandas()
+    first_row = everything[everything["game_id"] == 16032].iloc[0]
+    assert first_row["kill_assist_trade_survive_ratio"] in (83, 89)
+    assert len(read_player_data([root])) == 60
+
+
+def test_snapshot_from_database(db, tmp_path):
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, date_info, played_at) values (?, 1, ?, ?)",
+            [
+                (1, "2024-06-01 12:00:00", "2024-06-01 12:00:00"),
+                (2, "2024-07-01 12:00:00", "2024-07-01 12:00:00"),
+            ],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, kills, deaths, won) values (?, ?, 1, ?, 20, 15, ?)",
+            [(1, "a#na1", 21, 1), (1, "b#na1", None, 0), (2, "a#na1", 21, 1)],
+        )
+
+    async def export():
+        snapshot = Snapshot(tmp_path)
+        await snapshot.append_database(engine, batch=1)
+        return snapshot.state
+
+    assert asyncio.run(export()) == {"database_game_id": 2}
+    with sqlite3.connect(db) as connection:
+        connection.execute(
+            "insert into Game (game_id, map_id, played_at) values (3, 2, '2024-07-02 12:00:00')"
+        )
+        connection.execute(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, kills, deaths, won) values (3, 'a#na1', 2, 21, 5, 10, 0)"
+        )
+    assert asyncio.run(export()) == {"database_game_id": 3}
+
+    rows = (
+        read(tmp_path, "player_stats").to_pandas().sort_values(["game_id", "player_id"])
+    )
+    assert rows["game_id"].tolist() == [1, 1, 2, 3]
+    assert rows["tier"].tolist() == [21, 0, 21, 21]
+    assert rows["agent"].tolist() == ["Jett", "Jett", "Jett", "Sova"]
+    assert rows["kills_deaths"].tolist() == [5, 5, 5, -5]
+    assert rows["won"].tolist() == [True, False, True, False]
+    assert (
+        read(tmp_path, "game", ["map_name"])["map_name"].to_pylist().count("Bind") == 1
+    )
+
+
+def test_snapshot_ratios_share_one_unit(db, tmp_path):
+    scraper_output(tmp_path / "scraped")
+    with sqlite3.connect(db) as connection:
+        connection.executemany(
+            "insert into Game (game_id, map_id, riot_id, played_at) values (?, 1, ?, '2024-07-01 12:00:00')",
+            [(1, "abc"), (2, None)],
+        )
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, kill_assist_trade_survive_ratio, headshot_ratio, won) values (?, 'a#na1', 1, 21, ?, ?, 1)",
+            [
+                # ingested from the Henrik API: a fractional headshot ratio, no KAST
+                (1, None, 0.25),
+                # loaded from the scraper's CSVs: already percentages
+                (2, 75, 25),
+            ],
+        )
+
+    snapshot = Snapshot(tmp_path / "snapshot")
+    snapshot.append_csvs(
+        tmp_path / "scraped" / "5games.csv", tmp_path / "scraped" / "5player.csv"
+    )
+    asyncio.run(snapshot.append_database(engine))
+
+    rows = read(tmp_path / "snapshot", "player_stats").to_pandas()
+    ingested = rows[rows["game_id"] == 1].iloc[0]
+    loaded = rows[rows["game_id"] == 2].iloc[0]
+    scraped = rows[rows["game_id"] > 2]
+    assert ingested["headshot_ratio"] == 25
+    assert (loaded["kill_assist_trade_survive_ratio"], loaded["headshot_ratio"]) == (
+        75,
+        25,
+    )
+    # percentages from the scraper's "83%" too, not fractions
+    assert scraped["kill_assist_trade_survive_ratio"].between(1, 100).all()
+    assert scraped["headshot_ratio"].max() > 1
@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+
+import numpy as np
+from database import engine
+from fastapi.testclient import TestClient
+from ingest import DimensionCache, ingest_matches
+from main import app
+from synergy import SynergyIndex
+
+
+def test_synergy_index(db, make_match):
+    with sqlite3.connect(db) as connection:
+        # an old scraped game: no result, and a row per half for x
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, team_side) values (100, ?, ?, 21, ?)",
+            [("x#na1", 1, "t"), ("x#na1", 1, "ct"), ("y#na1", 3, "t")],
+        )
+
+    async def run():
+        index = SynergyIndex(engine)
+        await index.ready()
+        async with engine.begin() as connection:
+            _, rows = await ingest_matches(
+                connection, DimensionCache(), [make_match("a")]
+            )
+        index.on_ingest(rows)
+        rebuilt = SynergyIndex(engine)
+        await rebuilt.ready()
+        # streamed in batches that split games
+        batched = SynergyIndex(engine, batch=3)
+        await batched.ready()
+        return index, rebuilt, batched
+
+    index, rebuilt, batched = asyncio.run(run())
+    # added after the build, the counts match a build from scratch
+    for other in (rebuilt, batched):
+        assert np.array_equal(index.solo, other.solo)
+        assert np.array_equal(index.pairs, other.pairs)
+
+    found = index.synergies(1, 21)
+    assert (found["agent_name"], found["games"], found["win_rate"]) == ("Jett", 3, 0.5)
+    assert [
+        (s["agent_name"], s["games"], s["teammate_games"], s["wins"], s["win_rate"])
+        for s in found["synergies"]
+    ] == [
+        ("Omen", 5, 2, 1, 0.5),
+        ("Sova", 4, 2, 1, 0.5),
+        ("Killjoy", 4, 2, 1, 0.5),
+        ("Raze", 4, 2, 1, 0.5),
+        ("Jett", 2, 0, 0, None),
+    ]
+    assert index.synergies(1, 12)["synergies"] == []
+    assert index.synergies(99, 21)["games"] == 0
+
+
+def test_agent_synergies(db, auth_headers, rebuild_aggregates):
+    with sqlite3.connect(db) as connection:
+        connection.execute("insert into Game (game_id, map_id) values (1, 1)")
+        connection.executemany(
+            "insert into Player_Stats (game_id, player_id, agent_id, tier_id, won) values (1, ?, ?, 21, ?)",
+            [("chonk#na1", 1, 1), ("mate#na1", 2, 1), ("foe#na1", 3, 0)],
+        )
+    rebuild_aggregates()
+    with TestClient(app) as client:
+        default = client.get("/agent_synergies", headers=auth_headers)
+        limited = client.get(
+            "/agent_synergies",
+            params={"agent_name": "Omen", "limit": 1},
+            headers=auth_headers,
+        )
+        unknown = client.get(
+            "/agent_synergies", params={"agent_name": "Nobody"}, headers=auth_headers
+        )
+
+    # the player's most-played agent at their current tier
+    assert default.json() == {
+        "agent_synergies": {
+            "agent_name": "Jett",
+            "tier": 21,
+            "games": 1,
+            "win_rate": 1.0,
+            "synergies": [
+                {
+                    "agent_name": "Sova",
+                    "games": 1,
+                    "teammate_games": 1,
+                    "wins": 1,
+                    "win_rate": 1.0,
+                },
+                {
+                    "agent_name": "Omen",
+                    "games": 1,
+                    "teammate_games": 0,
+                    "wins": 0,
+                    "win_rate": None,
+                },
+            ],
+        }
+    }
+    assert [
+        s["agent_name"] for s in limited.json()["agent_synergies"]["synergies"]
+    ] == ["Jett"]
+    assert unknown.status_code == 404
@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+
+import numpy as np
+from scoring import WinModel, feature_columns, load_pipeline
+from train import read_player_data, train
+
+CSV = Path(__file__).parents[2] / "cs411_ml" / "csv5.txt"
+
+
+def test_read_player_data():
+    data = read_player_data([CSV], chunksize=7)
+
+    assert len(data) == 60
+    first = data.iloc[0]
+    # 16032,artn,RR,True,Brimstone,1.32,235,11,6,12,+5,83%,147,8%,0,2,t,21,7
+    assert first["kill_assist_trade_survive_ratio"] == 83
+    assert first["headshot_ratio"] == 8
+    assert first["kills_deaths"] == 5
+    assert (first["agent"], first["side"], first["won"]) == ("Brimstone", "t", True)
+
+
+def test_train_writes_model_and_metrics(tmp_path):
+    metrics = train([CSV], tmp_path, cs=(0.1, 1.0), folds=2, jobs=2)
+
+    assert metrics["rows"] == {"train": 48, "test": 12}
+    assert {c["params"]["classifier__C"] for c in metrics["search"]["candidates"]} == {
+        0.1,
+        1.0,
+    }
+    assert set(metrics["stages"]) == {"read", "search", "evaluate", "export"}
+    assert (
+        json.loads((tmp_path / "metrics.json").read_text())["accuracy"]
+        == (metrics["accuracy"])
+    )
+
+    # the compiled model scores exactly like the pipeline it came from
+    pipeline = load_pipeline(tmp_path / "model.pkl")
+    model = WinModel.load(tmp_path / "model.json")
+    data = read_player_data([CSV])
+    columns = feature_columns(data.to_dict("records"), model)
+    np.testing.assert_allclose(
+        model.predict(columns)[0], pipeline.predict_proba(data)[:, 1], rtol=1e-12
+    )
@@ -186,13 +186,37 @@ const Home = (): React.ReactElement => {
     }
 
     const response = await fetch(config.apiUrl + "/update_user_data", {
-      headers: { Authorization: "Bearer " + localStorage.token ,method: "POST"},
+      method: "POST",
+      headers: { Authorization: "Bearer " + localStorage.token },
     });
 
     const data = await response.json();
 
-    if (data.success === true) {
+    let job = { status: "pending" };
+    while (data.success === true && (job.status === "pending" || job.status === "running")) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const jobResponse = await fetch(config.apiUrl + "/jobs/" + data.job_id, {
+        headers: { Authorization: "Bearer " + localStorage.token },
+      });
+      if (jobResponse.status === 404) {
+        // jobs are queued on the instance that accepted them; this poll
+        // reached another one, which cannot tell how the refresh went
+        job = { status: "unknown" };
+        break;
+      }
+      job = await jobResponse.json();
+    }
+
+    if (job.status === "done") {
       window.location.reload();
+    } else if (job.status === "unknown") {
+      toast({
+        title: "Update queued",
+        description: "Your new matches will show up once the refresh finishes.",
+        status: "info",
+        position: "top",
+        duration: 5000,
+      });
     } else {
       toast({
         title: "Update failed",
@@ -133,14 +133,12 @@ const Lookup = () => {
                     data = await response.json();
                     console.log('Agent Synergies Response:', data); // Log the response data
                     
-                    // Manually parse the agent_synergies response
-                    const synergiesString = data.agent_synergies;
-                    const parsedSynergies = synergiesString
-                        .slice(1, -1) // Remove the square brackets
-                        .split("), (") // Split by "), ("
-                        .map((item: string) => item.replace(/[\(\)'"]/g, "").trim().replace(/,$/, "")); // Remove parentheses, quotes, trim spaces, and trailing commas
-
-                    console.log('Parsed Agent Synergies:', parsedSynergies); // Log the parsed data
+                    const synergies = data.agent_synergies?.synergies ?? [];
+                    const parsedSynergies = synergies.map((synergy: any) =>
+                        synergy.win_rate === null
+                            ? `${synergy.agent_name} (${synergy.games} games)`
+                            : `${synergy.agent_name} (${synergy.games} games, ${Math.round(synergy.win_rate * 100)}% win rate as teammates)`
+                    );
 
                     setOutput(parsedSynergies);
                     break;
@@ -175,9 +175,14 @@ interface PlayerStats {
 //   },
 // ];
 
+const TIME_SPANS = ["overall", "3months", "6months", "1year"];
+
 const PlayerStats: React.FC = () => {
   const [timeSpan, setTimeSpan] = useState<String>("overall");
   const [stats, setStats] = useState<PlayerStats | null>(null);
+  const [windows, setWindows] = useState<Record<string, PlayerStats> | null>(
+    null
+  );
   const [mostPlayedAgent, setMostPlayedAgent] = useState<String>("");
   const [mostPlayedMap, setMostPlayedMap] = useState<String>("");
   const [proLookalike, setProLookalike] = useState<String>("");
@@ -187,11 +192,12 @@ const PlayerStats: React.FC = () => {
   const [modalTitle, setModalTitle] = useState<string>("");
   const [modalDataKey, setModalDataKey] = useState<string>("");
 
-  const fetchStats = async (timeSpan: String) => {
+  // every section and time span in one request, so switching spans needs no refetch
+  const fetchStats = async () => {
     setLoading(true);
     try {
       const response = await fetch(
-        `${config.apiUrl}/player-stats?timespan=${timeSpan}`,
+        `${config.apiUrl}/dashboard?fields=player_stats,most_played_agent,pro_lookalike,most_played_map&timespan=${TIME_SPANS.join(",")}`,
         {
           headers: { Authorization: "Bearer " + localStorage.token },
         }
@@ -200,36 +206,15 @@ const PlayerStats: React.FC = () => {
         throw new Error("Network response was not ok");
       }
       const data = await response.json();
-      setStats(data);
-
-      const agentResponse = await fetch(`${config.apiUrl}/most_played_agent`, {
-        headers: { Authorization: "Bearer " + localStorage.token },
-      });
-
-      const proResponse = await fetch(`${config.apiUrl}/pro_lookalike`, {
-        headers: { Authorization: "Bearer " + localStorage.token },
-      });
-
-      if (!response.ok) {
-        throw new Error("Network response was not ok");
+      const stats = data.player_stats;
+      const byTimeSpan: Record<string, PlayerStats> = {};
+      for (const span of TIME_SPANS) {
+        byTimeSpan[span] = { ...stats.windows[span], playerID: stats.playerID };
       }
-      const agentData = await agentResponse.json();
-      setMostPlayedAgent(agentData.most_played_agent);
-
-      const mapResponse = await fetch(`${config.apiUrl}/most_played_map`, {
-        headers: { Authorization: "Bearer " + localStorage.token },
-      });
-      if (!response.ok) {
-        throw new Error("Network response was not ok");
-      }
-      const mapData = await mapResponse.json();
-      setMostPlayedMap(mapData.most_played_map);
-    
-      // todo
-      const proData = await proResponse.json();
-      setProLookalike(proData.best_match);
-
-      setStats(data);
+      setWindows(byTimeSpan);
+      setMostPlayedAgent(data.most_played_agent.most_played_agent);
+      setMostPlayedMap(data.most_played_map.most_played_map);
+      setProLookalike(data.pro_lookalike.best_match);
     } catch (error) {
       console.error("Error fetching player stats:", error);
     } finally {
@@ -253,14 +238,20 @@ const PlayerStats: React.FC = () => {
         }
     };
 
+  useEffect(() => {
+    fetchStats();
+  }, []);
+
   useEffect(() => {
     // if (mockStats[timeSpan]) {
     //   setStats(mockStats[timeSpan]);
     // } else {
-    fetchStats(timeSpan);
+    if (windows) {
+      setStats(windows[timeSpan as string]);
+    }
     // }
     // setStats(mockStats[timeSpan]);
-  }, [timeSpan]);
+  }, [timeSpan, windows]);
 
   const handleGraphOpen = (dataKey: string, title: string) => {
     fetchGraphData(); // Fetch the graph data when opening the graph modal
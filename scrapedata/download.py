@@ -1,54 +1,280 @@
+"""Download vlr.gg match pages for scrape.py.
+
+Results pages are walked for match links, then every match page is saved
+as <out>/<match id>.html. Requests share one connection pool, at most
+--concurrency at a time, spaced by a delay that doubles whenever vlr.gg
+answers 429/503 (or asks for longer with Retry-After) and eases back to
+--delay as requests succeed.
+
+<out>/manifest.jsonl records every URL fetched, the file it was saved to
+and its ETag/Last-Modified, one JSON object per line, appended as pages
+arrive; pages that still fail after every retry are recorded too. A re-run
+skips match pages already downloaded and retries the ones that failed, so
+an interrupted run resumes where it stopped; results pages, and with
+--refresh match pages too, are re-requested conditionally and only
+rewritten if changed.
+
+    python download.py --start 1 --end 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
 import re
 import time
-from collections import defaultdict
 from datetime import datetime, timezone
+from pathlib import Path
 
-import requests
+import httpx
 from selectolax.parser import HTMLParser
 
+BASE_URL = "https://www.vlr.gg"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:52.0) Gecko/20100101 Firefox/52.0",
+}
+
+
+class Politeness:
+    """At most `concurrency` requests in flight, started at least `delay` apart."""
+
+    def __init__(self, concurrency: int, min_delay: float, max_delay: float = 60.0):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self.next_at = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        start = max(now, self.next_at)
+        self.next_at = start + self.delay
+        await asyncio.sleep(start - now)
+
+    def slow_down(self, retry_after: float | None = None):
+        # with --delay 0 there is nothing to double, so back off by a second
+        backoff = self.delay * 2 or 1.0
+        self.delay = min(self.max_delay, max(backoff, retry_after or 0))
+        self.next_at = max(self.next_at, time.monotonic() + self.delay)
+
+    def speed_up(self):
+        self.delay = max(self.min_delay, self.delay * 0.9)
+
+
+class Manifest:
+    """url -> {"file", "etag", "last_modified", "fetched_at"}; later lines win.
+
+    `failed` holds the URLs whose latest line is a failure, to retry.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries = {}
+        self.failed = {}
+        if path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # cut short by an interrupted run
+                if "error" in entry:
+                    self.failed[entry["url"]] = entry
+                else:
+                    self.entries[entry["url"]] = entry
+                    self.failed.pop(entry["url"], None)
+        self.file = open(path, "a")
+
+    def get(self, url: str) -> dict | None:
+        return self.entries.get(url)
+
+    def record(self, url: str, file: str, response: httpx.Response):
+        # a 304 need not repeat the validators
+        previous = self.entries.get(url, {})
+        entry = {
+            "url": url,
+            "file": file,
+            "etag": response.headers.get("etag", previous.get("etag")),
+            "last_modified": response.headers.get(
+                "last-modified", previous.get("last_modified")
+            ),
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.entries[url] = entry
+        self.failed.pop(url, None)
+        self.write(entry)
+
+    def record_failure(self, url: str, error: str):
+        entry = {
+            "url": url,
+            "error": error,
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.failed[url] = entry
+        self.write(entry)
+
+    def write(self, entry: dict):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def match_file(path: str) -> str:
+    """/12345/team-a-vs-team-b-... -> 12345.html, stable however the results shift."""
+    match = re.match(r"/(\d+)/", path)
+    if match:
+        return f"{match[1]}.html"
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", path.strip("/")) + ".html"
+
+
+class Downloader:
+    def __init__(
+        self,
+        out: Path,
+        base_url: str = BASE_URL,
+        concurrency: int = 4,
+        delay: float = 0.3,
+        retries: int = 5,
+    ):
+        self.out = out
+        self.out.mkdir(parents=True, exist_ok=True)
+        (self.out / "results").mkdir(exist_ok=True)
+        self.manifest = Manifest(self.out / "manifest.jsonl")
+        self.concurrency = concurrency
+        self.politeness = Politeness(concurrency, delay)
+        self.retries = retries
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=HEADERS,
+            limits=httpx.Limits(max_connections=concurrency),
+            timeout=30,
+            follow_redirects=True,
+        )
+        self.stats = {"fetched": 0, "not_modified": 0, "skipped": 0, "failed": 0}
+
+    async def fetch(self, url: str, file: Path) -> str:
+        """The page at `url`, from `file` if the server says it has not changed."""
+        entry = self.manifest.get(url)
+        headers = {}
+        if entry is not None and file.exists():
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        for attempt in range(self.retries + 1):
+            async with self.politeness.semaphore:
+                await self.politeness.wait()
+                try:
+                    response = await self.client.get(url, headers=headers)
+                except httpx.TransportError:
+                    self.politeness.slow_down()
+                    continue
+            if response.status_code in (429, 503):
+                retry_after = response.headers.get("retry-after")
+                self.politeness.slow_down(
+                    float(retry_after)
+                    if retry_after and retry_after.isdigit()
+                    else None
+                )
+                continue
+            if response.status_code >= 500:
+                self.politeness.slow_down()
+                continue
+            self.politeness.speed_up()
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                if url in self.manifest.failed:
+                    self.manifest.record(url, file.name, response)
+                return file.read_text()
+            response.raise_for_status()
+            # written whole or not at all, so a resumed run never sees half a page
+            temporary = file.with_name(f".{file.name}")
+            temporary.write_text(response.text)
+            os.replace(temporary, file)
+            self.manifest.record(url, file.name, response)
+            self.stats["fetched"] += 1
+            return response.text
+        raise httpx.HTTPError(f"{url}: gave up after {self.retries + 1} attempts")
+
+    def fail(self, url: str, error: Exception):
+        # recorded, so the next run tries it again
+        self.stats["failed"] += 1
+        self.manifest.record_failure(url, str(error))
+        print(error)
+
+    async def match_paths(self, start: int, end: int) -> list[str]:
+        """Match links on results pages start..end, up to the first empty page."""
+
+        async def page(number: int):
+            url = f"/matches/results?page={number}"
+            try:
+                html = await self.fetch(url, self.out / "results" / f"{number}.html")
+            except httpx.HTTPError as e:
+                self.fail(url, e)
+                return None
+            return [
+                item.attributes["href"]
+                for item in HTMLParser(html).css("a.wf-module-item")
+            ]
+
+        paths = []
+        # a window of pages at a time, so a large `end` costs at most one
+        # window of requests past the last page
+        for first in range(start, end + 1, self.concurrency):
+            window = range(first, min(first + self.concurrency, end + 1))
+            for links in await asyncio.gather(*map(page, window)):
+                if links is None:
+                    continue  # failed; its matches are found on the next run
+                if not links:
+                    return list(dict.fromkeys(paths))
+                paths += links
+        return list(dict.fromkeys(paths))
+
+    async def download_match(self, path: str, refresh: bool):
+        file = self.out / match_file(path)
+        if not refresh and self.manifest.get(path) and file.exists():
+            self.stats["skipped"] += 1
+            return
+        try:
+            await self.fetch(path, file)
+        except httpx.HTTPError as e:
+            self.fail(path, e)
+
+    async def run(self, start: int, end: int, refresh: bool = False):
+        paths = await self.match_paths(start, end)
+        # match pages that failed last time, even if no results page listed them now
+        paths += [
+            url
+            for url in self.manifest.failed
+            if not url.startswith("/matches/results")
+        ]
+        paths = list(dict.fromkeys(paths))
+        await asyncio.gather(*(self.download_match(path, refresh) for path in paths))
+        return paths
+
+    async def aclose(self):
+        await self.client.aclose()
+        self.manifest.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--end", type=int, default=500)
+    parser.add_argument("--out", type=Path, default=Path("downloadpgs"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--refresh", action="store_true")
+    args = parser.parse_args()
+
+    downloader = Downloader(args.out, concurrency=args.concurrency, delay=args.delay)
+    try:
+        paths = await downloader.run(args.start, args.end, args.refresh)
+    finally:
+        await downloader.aclose()
+    print(f"{len(paths)} matches: {downloader.stats}")
+
 
-def vlr_match_results_in_depth(startpg, endpg):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:52.0) Gecko/20100101 Firefox/52.0",
-    }
-    with requests.Session() as session:
-        pgcount = startpg
-        session.headers.update(headers)
-        params = {"page": str(pgcount)}
-        url = "https://www.vlr.gg/matches/results"
-        result = []
-
-        resp = session.get(url, params=params)
-        html = HTMLParser(resp.text)
-        status = resp.status_code
-        if status != 200:
-            raise Exception("API response: {}".format(status))
-        while status == 200:
-            print(params)
-            if not html.css("a.wf-module-item"):
-                break
-            if endpg and endpg < pgcount:
-                break
-            for item in html.css("a.wf-module-item"):
-                url_path = item.attributes["href"]
-
-                result.append(url_path)
-
-            pgcount += 1
-            params["page"] = str(pgcount)
-            print(params)
-            resp = session.get(url, params=params)
-            html = HTMLParser(resp.text)
-            status = resp.status_code
-            time.sleep(0.1)
-
-        for idx, game in enumerate(result):
-            resp = session.get(f"https://www.vlr.gg{game}", headers=headers)
-            print(f"https://www.vlr.gg{game}")
-            with open(f"./downloadpgs/{idx}.html", "w") as curr:
-                curr.write(resp.text)
-            time.sleep(0.3)
-
-
-vlr_match_results_in_depth(1, 500)
-print("done!")
+if __name__ == "__main__":
+    asyncio.run(main())
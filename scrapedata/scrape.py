@@ -1,4 +1,5 @@
 import csv
+import glob
 import multiprocessing
 import os
 import time
@@ -206,12 +207,11 @@ def extract_team_info(soup):
     return teams_info
 
 
-def do(start, end, idxfile):
+def do(paths, idxfile):
     all_player_data = []
     all_game_table_data = []
-    for x in range(start, end + 1):
-        # print(f"./downloadpgs/{x}.html")
-        with open(f"./downloadpgs/{x}.html") as fp:
+    for path in paths:
+        with open(path) as fp:
             soup = BeautifulSoup(fp, "html.parser")
 
             date_info = soup.find("div", class_="moment-tz-convert")
@@ -267,73 +267,20 @@ def do(start, end, idxfile):
         spamwriter.writerows(all_game_table_data)
 
 
-start_time = time.time()
-t1 = multiprocessing.Process(
-    target=do,
-    args=(
-        0,
-        4166,
-        1,
-    ),
-)
-t2 = multiprocessing.Process(
-    target=do,
-    args=(
-        4167,
-        8332,
-        2,
-    ),
-)
-t3 = multiprocessing.Process(
-    target=do,
-    args=(
-        8333,
-        12498,
-        3,
-    ),
-)
-t4 = multiprocessing.Process(
-    target=do,
-    args=(
-        12498,
-        16664,
-        4,
-    ),
-)
-t5 = multiprocessing.Process(
-    target=do,
-    args=(
-        16665,
-        20830,
-        5,
-    ),
-)
-t6 = multiprocessing.Process(
-    target=do,
-    args=(
-        20831,
-        24999,
-        6,
-    ),
-)
-
-
-t1.start()
-t2.start()
-t3.start()
-t4.start()
-t5.start()
-t6.start()
-
-t1.join()
-t2.join()
-t3.join()
-t4.join()
-t5.join()
-t6.join()
-
-print("--- %s seconds ---" % (time.time() - start_time))
+if __name__ == "__main__":
+    start_time = time.time()
+    # download.py names pages by match id; split them over six workers
+    pages = sorted(glob.glob("./downloadpgs/*.html"))
+    workers = [
+        multiprocessing.Process(target=do, args=(pages[i::6], i + 1)) for i in range(6)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    print("--- %s seconds ---" % (time.time() - start_time))
 
 # start_time = time.time()
-# do(0, 60)
+# do(sorted(glob.glob("./downloadpgs/*.html"))[:60], 0)
 # print("--- %s seconds ---" % (time.time() - start_time))
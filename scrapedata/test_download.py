@@ -0,0 +1,179 @@
+"""Run with pytest against a local fixture server standing in for vlr.gg."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from download import Downloader, match_file
+
+RESULTS = {
+    1: ["/101/a-vs-b-final", "/102/c-vs-d-semi"],
+    2: ["/103/e-vs-f-groups", "/104/g-vs-h-groups"],
+}
+
+
+class Site(BaseHTTPRequestHandler):
+    hits: dict = {}
+    failing: set = set()
+    throttle: set = set()
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.01)
+            self.respond()
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def respond(self):
+        if self.path in self.throttle:
+            self.throttle.discard(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if self.path in self.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        if self.path.startswith("/matches/results?page="):
+            page = int(self.path.rsplit("=", 1)[1])
+            links = "".join(
+                f'<a class="wf-module-item" href="{link}">x</a>'
+                for link in RESULTS.get(page, [])
+            )
+            body = f"<html><body>{links}</body></html>"
+        else:
+            body = f"<html><body>match {self.path}</body></html>"
+        etag = f'"{hash(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Site)
+    Site.hits, Site.failing, Site.throttle = {}, set(), set()
+    Site.max_in_flight = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def run(out, base_url, refresh=False):
+    async def go():
+        downloader = Downloader(out, base_url, concurrency=2, delay=0.01, retries=2)
+        try:
+            await downloader.run(1, 5, refresh)
+        finally:
+            await downloader.aclose()
+        return downloader
+
+    return asyncio.run(go())
+
+
+def test_match_file():
+    assert match_file("/101/a-vs-b-final") == "101.html"
+    assert match_file("/event/x y") == "event_x_y.html"
+
+
+def test_download_resumes_and_revalidates(site, tmp_path):
+    Site.failing.add("/104/g-vs-h-groups")
+    Site.throttle.add("/101/a-vs-b-final")
+
+    first = run(tmp_path, site)
+    assert first.stats["failed"] == 1
+    assert first.politeness.delay > 0.01  # backed off after the 429
+    assert sorted(p.name for p in tmp_path.glob("*.html")) == [
+        "101.html",
+        "102.html",
+        "103.html",
+    ]
+    assert Site.max_in_flight <= 2
+    # stopped after the window holding the first empty page
+    assert "/matches/results?page=3" in Site.hits
+    assert "/matches/results?page=5" not in Site.hits
+
+    # the server recovers; only the missing page is fetched
+    Site.failing.clear()
+    second = run(tmp_path, site)
+    assert second.stats["fetched"] == 1
+    assert second.stats["skipped"] == 3
+    assert Site.hits["/102/c-vs-d-semi"] == 1
+    assert (tmp_path / "104.html").read_text() == (
+        "<html><body>match /104/g-vs-h-groups</body></html>"
+    )
+    # results pages were revalidated rather than downloaded again
+    assert second.stats["not_modified"] == 4
+
+    third = run(tmp_path, site, refresh=True)
+    assert third.stats == {"fetched": 0, "not_modified": 8, "skipped": 0, "failed": 0}
+
+    entries = [json.loads(line) for line in open(tmp_path / "manifest.jsonl")]
+    assert [entry["url"] for entry in entries if "error" in entry] == [
+        "/104/g-vs-h-groups"
+    ]
+    fetched = [entry for entry in entries if "error" not in entry]
+    files = {entry["url"]: entry["file"] for entry in fetched}
+    assert files["/103/e-vs-f-groups"] == "103.html"
+    assert all(entry["etag"] for entry in fetched)
+
+
+def test_failed_results_page_is_retried(site, tmp_path):
+    Site.failing.add("/matches/results?page=2")
+
+    # the matches from the other pages are still downloaded
+    first = run(tmp_path, site)
+    assert first.stats["failed"] == 1
+    assert sorted(p.name for p in tmp_path.glob("*.html")) == ["101.html", "102.html"]
+    assert list(first.manifest.failed) == ["/matches/results?page=2"]
+
+    Site.failing.clear()
+    second = run(tmp_path, site)
+    assert second.stats["failed"] == 0
+    assert sorted(p.name for p in tmp_path.glob("*.html")) == [
+        "101.html",
+        "102.html",
+        "103.html",
+        "104.html",
+    ]
+    assert second.manifest.failed == {}
+
+
+def test_failed_match_is_retried_outside_the_range(site, tmp_path):
+    Site.failing.add("/104/g-vs-h-groups")
+    run(tmp_path, site)
+
+    async def go():
+        downloader = Downloader(tmp_path, site, delay=0.01, retries=0)
+        try:
+            # page 2, which lists the match, is not walked this time
+            await downloader.run(1, 1)
+        finally:
+            await downloader.aclose()
+        return downloader
+
+    Site.failing.clear()
+    second = asyncio.run(go())
+    assert second.stats["fetched"] == 1
+    assert (tmp_path / "104.html").exists()